@@ -4,11 +4,33 @@ Copyright © 2019 Jean-Christophe Bos & HC² (www.hc2.fr)
 """
 
 
-from   _thread  import allocate_lock, start_new_thread, stack_size
+from   _thread  import allocate_lock, start_new_thread, stack_size, get_ident
 from   time     import sleep
 from   select   import select
 import socket
-import ssl
+import struct
+
+try :
+    import os
+except :
+    import uos as os
+
+try :
+    from errno import EAGAIN, EINPROGRESS, ECONNREFUSED
+except :
+    EAGAIN       = 11
+    EINPROGRESS  = 115
+    ECONNREFUSED = 111
+
+try :
+    from collections import OrderedDict
+except :
+    OrderedDict = dict
+
+try :
+    from heapq import heappush, heappop, heapify
+except :
+    from uheapq import heappush, heappop, heapify
 
 try :
     from time import perf_counter
@@ -17,6 +39,41 @@ except :
     def perf_counter() :
         return ticks_ms() / 1000
 
+# ============================================================================
+# ===( XSSL )=================================================================
+# ============================================================================
+
+class _XSSLNotLoaded(Exception) :
+    # Never raised, stands for the ssl exceptions until "ssl" is imported,
+    pass
+
+class _XSSL :
+
+    # "ssl" costs time and memory to import, it is only loaded when TLS is
+    # started on a connection,
+    Module      = None
+    SSLError    = _XSSLNotLoaded
+    SSLEOFError = _XSSLNotLoaded
+
+    @staticmethod
+    def Import() :
+        if _XSSL.Module is None :
+            try :
+                import ssl
+            except :
+                import ussl as ssl
+            _XSSL.SSLError    = getattr(ssl, 'SSLError', _XSSLNotLoaded)
+            _XSSL.SSLEOFError = getattr(ssl, 'SSLEOFError', _XSSLNotLoaded)
+            _XSSL.Module      = ssl
+        return _XSSL.Module
+
+    @staticmethod
+    def IsSSLSocket(sock) :
+        ssl = _XSSL.Module
+        return ( ssl is not None          and \
+                 hasattr(ssl, 'SSLSocket') and \
+                 isinstance(sock, ssl.SSLSocket) )
+
 # ============================================================================
 # ===( XAsyncSocketsPool )====================================================
 # ============================================================================
@@ -27,16 +84,58 @@ class XAsyncSocketsPoolException(Exception) :
 class XAsyncSocketsPool :
 
     _CHECK_SEC_INTERVAL = 1.0
+    _PROFILE_BUCKETS    = 32
+    _ID_FD_BITS         = 24
+    _FLAG_READ          = 0x01
+    _FLAG_WRITE         = 0x02
+    _FLAG_HANDLING      = 0x04
 
     def __init__(self) :
-        self._processing   = None
-        self._microWorkers = None
-        self._opLock       = allocate_lock()
-        self._asyncSockets = { }
-        self._readList     = [ ]
-        self._writeList    = [ ]
-        self._handlingList = [ ]
-        self._udpSockEvt   = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._processing    = None
+        self._microWorkers  = None
+        self._dnsResolver   = None
+        self._nextExpireSec = None
+        self._opLock        = allocate_lock()
+        self._fdTable       = [ ]
+        self._fdFlags       = bytearray()
+        self._socketsGen    = 0
+        self._socketsCount  = 0
+        self._handlingCount = 0
+        self._readList      = [ ]
+        self._writeList     = [ ]
+        self._udpSockEvt    = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._onMetrics     = None
+        self._metricsSec    = 10
+        self._loopsCount    = 0
+        self._pollSec       = 0.0
+        self._processSec    = 0.0
+        self._eventsCount   = 0
+        self._maxTickEvents = 0
+        self._wakeUpsCount  = 0
+        self._timeoutsCount = 0
+        self._closedIO      = { }
+        self._profiling     = False
+        self._profLock      = allocate_lock()
+        self._profiles      = { }
+        self._slowCbSec     = 0.1
+        self._onSlowCb      = None
+        self._aioLoop       = None
+        self._aioThreadID   = None
+        self._aioTimer      = None
+        self._aioMetricsSec = None
+        self._aioReaders    = { }
+        self._aioWriters    = { }
+        self._loopThreadID  = None
+        self._autoCork      = False
+        self._corkedSockets = [ ]
+        self._aioFlushing   = False
+        self._trace         = None
+        self._callsLock     = allocate_lock()
+        self._soonCalls     = [ ]
+        self._timers        = [ ]
+        self._timersSeq     = 0
+        self._timersDead    = 0
+        self._callsCount    = 0
         for i in range(30) :
             self._udpSockEvtAddr = ('127.0.0.1', 54321+i)
             try :
@@ -44,143 +143,684 @@ class XAsyncSocketsPool :
                 break
             except :
                 pass
+        else :
+            # All these ports are used (other pools or processes), the wake
+            # ups must not be sent to one of them,
+            try :
+                self._udpSockEvt.bind(('127.0.0.1', 0))
+                self._udpSockEvtAddr = self._udpSockEvt.getsockname()
+            except :
+                pass
+
+    # ------------------------------------------------------------------------
+
+    def _fdGrow(self, fd) :
+        # Must be called with "_opLock" acquired,
+        size = len(self._fdTable)
+        if fd >= size :
+            n = max(fd + 1, 2 * size, 64) - size
+            self._fdTable.extend([None] * n)
+            self._fdFlags.extend(bytes(n))
 
     # ------------------------------------------------------------------------
 
     def _addSocket(self, socket, asyncSocket) :
         if socket and asyncSocket :
+            fd = socket.fileno()
+            if fd >= 0 :
+                with self._opLock :
+                    self._fdGrow(fd)
+                    entry = self._fdTable[fd]
+                    if entry is not None :
+                        if entry[0] is asyncSocket :
+                            return False
+                        # The fd has been reused, the old socket is closed,
+                        self._fdRelease(fd, entry)
+                    # The generation in the ID guards against fd reuse,
+                    self._socketsGen     += 1
+                    self._socketsCount   += 1
+                    self._fdTable[fd]     = (asyncSocket, socket, self._socketsGen)
+                    asyncSocket._socketID = (self._socketsGen << XAsyncSocketsPool._ID_FD_BITS) | fd
+                    return True
+        return False
+
+    # ------------------------------------------------------------------------
+
+    def _fdRelease(self, fd, entry) :
+        # Must be called with "_opLock" acquired,
+        asyncSocket, socket, gen = entry
+        flags                 = self._fdFlags[fd]
+        self._fdTable[fd]     = None
+        self._fdFlags[fd]     = 0
+        self._socketsCount   -= 1
+        asyncSocket._socketID = None
+        if flags & XAsyncSocketsPool._FLAG_READ :
+            self._readList.remove(socket)
+            if self._aioLoop :
+                self._aioWatch(socket, self._aioReaders, False)
+        if flags & XAsyncSocketsPool._FLAG_WRITE :
+            self._writeList.remove(socket)
+            if self._aioLoop :
+                self._aioWatch(socket, self._aioWriters, False)
+
+    # ------------------------------------------------------------------------
+
+    def _fdEntry(self, socketID) :
+        fd = socketID & ((1 << XAsyncSocketsPool._ID_FD_BITS) - 1)
+        if fd < len(self._fdTable) :
+            entry = self._fdTable[fd]
+            if entry is not None and entry[0]._socketID == socketID :
+                return fd, entry
+        return fd, None
+
+    # ------------------------------------------------------------------------
+
+    def _removeSocket(self, asyncSocket) :
+        socketID = asyncSocket._socketID
+        if socketID is not None :
             with self._opLock :
-                if socket not in self._asyncSockets :
-                    self._asyncSockets[socket] = asyncSocket
+                fd, entry = self._fdEntry(socketID)
+                if entry is not None and entry[0] is asyncSocket :
+                    self._fdRelease(fd, entry)
                     return True
         return False
 
     # ------------------------------------------------------------------------
 
-    def _removeSocket(self, socket) :
-        if socket :
+    def _watchSocket(self, socket, flag) :
+        fd = socket.fileno()
+        if fd >= 0 :
             with self._opLock :
-                if socket in self._asyncSockets :
-                    del self._asyncSockets[socket]
-                if socket in self._readList :
-                    self._readList.remove(socket)
-                if socket in self._writeList :
-                    self._writeList.remove(socket)
-                return True
+                return self._watchFd(socket, fd, flag)
         return False
 
     # ------------------------------------------------------------------------
 
-    def _socketListAdd(self, socket, socketsList) :
-        with self._opLock :
-            if socket not in socketsList :
-                socketsList.append(socket)
-                return True
+    def _watchFd(self, socket, fd, flag) :
+        # Must be called with "_opLock" acquired,
+        self._fdGrow(fd)
+        flags = self._fdFlags[fd]
+        if not flags & flag :
+            self._fdFlags[fd] = flags | flag
+            if flag == XAsyncSocketsPool._FLAG_READ :
+                self._readList.append(socket)
+                if self._aioLoop :
+                    self._aioWatch(socket, self._aioReaders, True)
+            elif flag == XAsyncSocketsPool._FLAG_WRITE :
+                self._writeList.append(socket)
+                if self._aioLoop :
+                    self._aioWatch(socket, self._aioWriters, True)
+            return True
         return False
 
     # ------------------------------------------------------------------------
 
-    def _socketListRemove(self, socket, socketsList) :
-        with self._opLock :
-            if socket in socketsList :
-                socketsList.remove(socket)
-                return True
+    def _unwatchSocket(self, socket, flag) :
+        fd = socket.fileno()
+        if fd >= 0 :
+            with self._opLock :
+                if fd < len(self._fdFlags) :
+                    flags = self._fdFlags[fd]
+                    if flags & flag :
+                        self._fdFlags[fd] = flags & ~flag
+                        if flag == XAsyncSocketsPool._FLAG_READ :
+                            self._readList.remove(socket)
+                            if self._aioLoop :
+                                self._aioWatch(socket, self._aioReaders, False)
+                        elif flag == XAsyncSocketsPool._FLAG_WRITE :
+                            self._writeList.remove(socket)
+                            if self._aioLoop :
+                                self._aioWatch(socket, self._aioWriters, False)
+                        return True
         return False
 
     # ------------------------------------------------------------------------
 
+    def _isWatched(self, socket, flag) :
+        fd = socket.fileno()
+        return ( fd >= 0 and fd < len(self._fdFlags) and \
+                 (self._fdFlags[fd] & flag) != 0 )
+
+    # ------------------------------------------------------------------------
+
+    def _unwatchAll(self) :
+        # Must be called with "_opLock" acquired,
+        self._readList.clear()
+        self._writeList.clear()
+        for fd in range(len(self._fdFlags)) :
+            self._fdFlags[fd] &= XAsyncSocketsPool._FLAG_HANDLING
+
+    # ------------------------------------------------------------------------
+
+    def _unhandledSockets(self, socketsList) :
+        flags   = self._fdFlags
+        sockets = [ ]
+        for sock in list(socketsList) :
+            fd = sock.fileno()
+            if fd >= 0 and not flags[fd] & XAsyncSocketsPool._FLAG_HANDLING :
+                sockets.append(sock)
+        return sockets
+
+    # ------------------------------------------------------------------------
+
+    def _forgetClosedSockets(self) :
+        # Sockets closed while waiting on them make "select" fail,
+        closed = [ sock for sock in self._readList + self._writeList if sock.fileno() < 0 ]
+        for sock in closed :
+            self._forgetSocket(sock)
+        return (len(closed) > 0)
+
+    # ------------------------------------------------------------------------
+
+    def _forgetSocket(self, socket) :
+        # For a socket that is not registered (or no more),
+        with self._opLock :
+            for socketsList, fds in ( (self._readList,  self._aioReaders),
+                                      (self._writeList, self._aioWriters) ) :
+                if socket in socketsList :
+                    socketsList.remove(socket)
+                    if self._aioLoop :
+                        self._aioWatch(socket, fds, False)
+            fd = socket.fileno()
+            if fd >= 0 and fd < len(self._fdFlags) and self._fdTable[fd] is None :
+                self._fdFlags[fd] = 0
+
+    # ------------------------------------------------------------------------
+
     def _sendUDPSockEvent(self) :
+        if self._aioLoop :
+            # The asyncio loop is directly notified by "_aioWatch",
+            return
+        if get_ident() == self._loopThreadID :
+            # Lists are read again by the loop before waiting,
+            return
+        self._wakeUpsCount += 1
         self._udpSockEvt.sendto(b'\xFF', self._udpSockEvtAddr)
 
     # ------------------------------------------------------------------------
 
-    def _processWaitEvents(self) :
+    def _aioCall(self, func, *args) :
+        if get_ident() == self._aioThreadID :
+            func(*args)
+        else :
+            self._aioLoop.call_soon_threadsafe(func, *args)
 
-        def jobExceptionalCondition(args) :
-            if args[0].OnExceptionalCondition() :
-                self._removeSocket(args[1])
-            self._socketListRemove(args[1], self._handlingList)
+    # ------------------------------------------------------------------------
 
-        def jobReadyForWriting(args) :
-            if args[0].OnReadyForWriting() :
-                self._removeSocket(args[1])
-            self._socketListRemove(args[1], self._handlingList)
+    def _aioWatch(self, socket, fds, watch) :
+        # Must be called with "_opLock" acquired,
+        loop = self._aioLoop
+        if watch :
+            fd          = socket.fileno()
+            fds[socket] = fd
+            if fds is self._aioReaders :
+                self._aioCall(loop.add_reader, fd, self._aioOnReady, socket, 'OnReadyForReading')
+            else :
+                self._aioCall(loop.add_writer, fd, self._aioOnReady, socket, 'OnReadyForWriting')
+        else :
+            # The socket can be already closed, its saved fd is used,
+            fd = fds.pop(socket, None)
+            if fd is not None :
+                if fds is self._aioReaders :
+                    self._aioCall(loop.remove_reader, fd)
+                else :
+                    self._aioCall(loop.remove_writer, fd)
 
-        def jobReadyForReading(args) :
-            if args[0].OnReadyForReading() :
-                self._removeSocket(args[1])
-            self._socketListRemove(args[1], self._handlingList)
+    # ------------------------------------------------------------------------
 
-        self._processing = True
+    def _aioOnReady(self, socket, eventName) :
+        if eventName == 'OnReadyForReading' :
+            if not self._isWatched(socket, XAsyncSocketsPool._FLAG_READ) :
+                return
+        elif not self._isWatched(socket, XAsyncSocketsPool._FLAG_WRITE) :
+            return
+        self._eventsCount += 1
+        try :
+            self._handleSocketEvent(socket, eventName)
+        except :
+            pass
+
+    # ------------------------------------------------------------------------
+
+    def _aioScheduleTick(self) :
+        if not self._aioLoop :
+            return
+        if self._aioTimer :
+            self._aioTimer.cancel()
+        sec     = perf_counter()
+        waitSec = XAsyncSocketsPool._CHECK_SEC_INTERVAL
+        if self._nextExpireSec is not None :
+            waitSec = min(waitSec, max(0, self._nextExpireSec - sec))
+        if self._soonCalls :
+            waitSec = 0
+        elif self._timers :
+            waitSec = min(waitSec, max(0, self._timers[0][0] - sec))
+        if self._onMetrics and self._aioMetricsSec is not None :
+            waitSec = min(waitSec, max(0, self._aioMetricsSec + self._metricsSec - sec))
+        self._aioTimer = self._aioLoop.call_later(waitSec, self._aioTick)
+
+    # ------------------------------------------------------------------------
+
+    def _aioTick(self) :
+        self._aioTimer    = None
+        self._loopsCount += 1
+        sec = perf_counter()
+        try :
+            self._processExpiredSockets(sec)
+        except :
+            pass
+        if self._soonCalls or (self._timers and self._timers[0][0] <= sec) :
+            self._runCalls(sec)
+        if self._onMetrics :
+            # The time of the last event is kept, so that a new interval
+            # is applied at once,
+            if self._aioMetricsSec is None :
+                self._aioMetricsSec = sec
+            elif sec >= self._aioMetricsSec + self._metricsSec :
+                self._aioMetricsSec = sec
+                try :
+                    self._onMetrics(self, self.GetMetrics())
+                except :
+                    pass
+        self._aioScheduleTick()
+
+    # ------------------------------------------------------------------------
+
+    def _aioDetach(self) :
+        for asyncSocket in self.GetAllAsyncSockets() :
+            try :
+                asyncSocket.Close()
+            except :
+                pass
+        with self._opLock :
+            for sock in list(self._aioReaders) :
+                self._aioWatch(sock, self._aioReaders, False)
+            for sock in list(self._aioWriters) :
+                self._aioWatch(sock, self._aioWriters, False)
+            self._unwatchAll()
+        if self._aioTimer :
+            self._aioTimer.cancel()
+            self._aioTimer = None
+        self._aioLoop     = None
+        self._aioThreadID = None
+        self._processing  = None
+
+    # ------------------------------------------------------------------------
+
+    def _aioCreateFuture(self) :
+        import asyncio
+        try :
+            loop = asyncio.get_running_loop()
+        except :
+            loop = self._aioLoop or asyncio.get_event_loop()
+        return loop.create_future()
+
+    # ------------------------------------------------------------------------
+
+    def _aioSetFutureResult(self, future, result, isException=False) :
+        def setResult() :
+            if not future.done() :
+                if isException :
+                    future.set_exception(result)
+                else :
+                    future.set_result(result)
+        loop = future.get_loop()
+        if loop is self._aioLoop and get_ident() == self._aioThreadID :
+            # Already in the asyncio loop thread, no thread hop,
+            setResult()
+        else :
+            loop.call_soon_threadsafe(setResult)
+
+    # ------------------------------------------------------------------------
+
+    def _addClosedIO(self, asyncSocket) :
+        name = type(asyncSocket).__name__
+        with self._opLock :
+            io = self._closedIO.get(name)
+            if io is None :
+                io = self._closedIO[name] = [0, 0, 0, 0]
+            io[0] += asyncSocket.BytesRecv
+            io[1] += asyncSocket.BytesSent
+            io[2] += asyncSocket.MessagesRecv
+            io[3] += asyncSocket.MessagesSent
+
+    # ------------------------------------------------------------------------
+
+    def _notifyExpireTimeSec(self, expireTimeSec) :
+        wakeUp = False
+        with self._opLock :
+            if self._nextExpireSec is None or expireTimeSec < self._nextExpireSec :
+                self._nextExpireSec = expireTimeSec
+                # Wakes up the loop only if it would otherwise wait beyond this deadline,
+                wakeUp = ( expireTimeSec < perf_counter() + XAsyncSocketsPool._CHECK_SEC_INTERVAL )
+        if wakeUp and self._processing :
+            if self._aioLoop :
+                self._aioCall(self._aioScheduleTick)
+            else :
+                self._sendUDPSockEvent()
+
+    # ------------------------------------------------------------------------
+
+    def _processExpiredSockets(self, timeSec) :
+        with self._opLock :
+            self._nextExpireSec = None
+        nextExpireSec = None
+        for asyncSocket in self.GetAllAsyncSockets() :
+            expireTimeSec = asyncSocket.ExpireTimeSec
+            if expireTimeSec :
+                if timeSec > expireTimeSec :
+                    self._timeoutsCount += 1
+                    if self._trace :
+                        self._trace._record( timeSec, asyncSocket._socket.fileno(),
+                                             XAsyncTrace.EXPIRE, 0, 0.0 )
+                    asyncSocket.OnExpireTimeout()
+                elif nextExpireSec is None or expireTimeSec < nextExpireSec :
+                    nextExpireSec = expireTimeSec
+        if nextExpireSec is not None :
+            with self._opLock :
+                if self._nextExpireSec is None or nextExpireSec < self._nextExpireSec :
+                    self._nextExpireSec = nextExpireSec
+
+    # ------------------------------------------------------------------------
+
+    def _wakeUpForCalls(self) :
+        # The loop waits again with the new deadline (or without waiting),
+        if self._processing :
+            if self._aioLoop :
+                self._aioCall(self._aioScheduleTick)
+            else :
+                self._sendUDPSockEvent()
+
+    # ------------------------------------------------------------------------
+
+    def _runCalls(self, timeSec) :
+        with self._callsLock :
+            calls           = self._soonCalls
+            self._soonCalls = [ ]
+            timers          = self._timers
+            while timers and timers[0][0] <= timeSec :
+                handle = heappop(timers)[2]
+                if handle._cancelled :
+                    self._timersDead -= 1
+                else :
+                    calls.append(handle)
+            for handle in calls :
+                handle._done = True
+        for handle in calls :
+            if not handle._cancelled :
+                self._callsCount += 1
+                try :
+                    handle._fn(handle._arg)
+                except :
+                    pass
+                handle._fn  = None
+                handle._arg = None
+
+    # ------------------------------------------------------------------------
+
+    def _cancelCall(self, handle) :
+        with self._callsLock :
+            if handle._done or handle._cancelled :
+                return False
+            handle._cancelled = True
+            if handle._whenSec is not None :
+                # Cancelled timers are left in the heap until they are many,
+                self._timersDead += 1
+                if self._timersDead > 64 and 2 * self._timersDead > len(self._timers) :
+                    self._timers     = [ t for t in self._timers if not t[2]._cancelled ]
+                    self._timersDead = 0
+                    heapify(self._timers)
+        handle._fn  = None
+        handle._arg = None
+        return True
+
+    # ------------------------------------------------------------------------
+
+    def _profileEvent(self, asyncSocket, eventName, handler) :
+        callback = asyncSocket._getEventCallback(eventName) if self._onSlowCb else None
+        startSec = perf_counter()
+        try :
+            return handler()
+        finally :
+            durationSec = perf_counter() - startSec
+            key         = (type(asyncSocket).__name__, eventName)
+            # Log-scale bucket index : [2^(i-1), 2^i[ microseconds,
+            us     = int(durationSec * 1000000)
+            bucket = 0
+            while us and bucket < XAsyncSocketsPool._PROFILE_BUCKETS - 1 :
+                us     >>= 1
+                bucket  += 1
+            with self._profLock :
+                profile = self._profiles.get(key)
+                if profile is None :
+                    profile = self._profiles[key] = [0, 0.0, 0.0, [0] * XAsyncSocketsPool._PROFILE_BUCKETS]
+                profile[0]         += 1
+                profile[1]         += durationSec
+                profile[3][bucket] += 1
+                if durationSec > profile[2] :
+                    profile[2] = durationSec
+            if durationSec >= self._slowCbSec and self._onSlowCb :
+                if callback :
+                    callbackName = getattr(callback, '__name__', str(callback))
+                else :
+                    callbackName = None
+                try :
+                    self._onSlowCb(self, asyncSocket, eventName, callbackName, durationSec)
+                except :
+                    pass
+
+    # ------------------------------------------------------------------------
+
+    def _inLoopThread(self) :
+        ident = get_ident()
+        return ( ident == self._loopThreadID or \
+                 (self._aioLoop is not None and ident == self._aioThreadID) )
+
+    # ------------------------------------------------------------------------
+
+    def _requestWriting(self, asyncSocket) :
+        # With "AutoCork", sends made in the loop thread are written once
+        # at the end of the loop tick instead of waiting for "select",
+        if self._autoCork and not self._microWorkers and self._inLoopThread() :
+            with self._opLock :
+                if asyncSocket in self._corkedSockets :
+                    return
+                self._corkedSockets.append(asyncSocket)
+                if self._aioLoop and not self._aioFlushing :
+                    self._aioFlushing = True
+                    self._aioLoop.call_soon(self._flushCorkedSockets)
+        else :
+            self.NotifyNextReadyForWriting(asyncSocket, True)
+
+    # ------------------------------------------------------------------------
+
+    def _requestWritingBatch(self, asyncSockets) :
+        # Same as "_requestWriting" for many sockets, with the lock taken
+        # once and one wake-up at most,
+        if self._autoCork and not self._microWorkers and self._inLoopThread() :
+            with self._opLock :
+                corked = set(self._corkedSockets)
+                for asyncSocket in asyncSockets :
+                    if asyncSocket not in corked :
+                        self._corkedSockets.append(asyncSocket)
+                if self._aioLoop and not self._aioFlushing :
+                    self._aioFlushing = True
+                    self._aioLoop.call_soon(self._flushCorkedSockets)
+        else :
+            watched = False
+            with self._opLock :
+                for asyncSocket in asyncSockets :
+                    socket = asyncSocket._socket
+                    fd     = socket.fileno() if socket else -1
+                    if fd >= 0 and self._watchFd(socket, fd, XAsyncSocketsPool._FLAG_WRITE) :
+                        watched = True
+            if watched :
+                self._sendUDPSockEvent()
+
+    # ------------------------------------------------------------------------
+
+    def _flushCorkedSockets(self) :
+        with self._opLock :
+            asyncSockets        = self._corkedSockets
+            self._corkedSockets = [ ]
+            self._aioFlushing   = False
+        for asyncSocket in asyncSockets :
+            try :
+                asyncSocket._flushSending()
+            except :
+                pass
+
+    # ------------------------------------------------------------------------
+
+    def _jobSocketEvent(self, args) :
+        asyncSocket, sock, eventName = args
+        socketID = asyncSocket._socketID
+        trace    = self._trace
+        if trace :
+            fd       = sock.fileno()
+            startSec = perf_counter()
+        if self._profiling :
+            ret = self._profileEvent(asyncSocket, eventName, getattr(asyncSocket, eventName))
+        else :
+            ret = getattr(asyncSocket, eventName)()
+        if trace :
+            trace._record(startSec, fd, XAsyncTrace._EVENT_CODES[eventName], 0, perf_counter() - startSec)
+        if ret and asyncSocket._socketID == socketID :
+            # Not if the object has been recycled for a new connection,
+            self._removeSocket(asyncSocket)
+        self._unwatchSocket(sock, XAsyncSocketsPool._FLAG_HANDLING)
+        with self._opLock :
+            self._handlingCount -= 1
+        if self._microWorkers :
+            # The socket can be waited again by the loop,
+            self._sendUDPSockEvent()
+
+    # ------------------------------------------------------------------------
+
+    def _handleSocketEvent(self, sock, eventName) :
+        fd    = sock.fileno()
+        entry = self._fdTable[fd] if fd >= 0 and fd < len(self._fdTable) else None
+        if entry is None or entry[1] is not sock :
+            self._forgetSocket(sock)
+            sock.close()
+            return
+        asyncSocket = entry[0]
+        with self._opLock :
+            flags = self._fdFlags[fd]
+            if flags & XAsyncSocketsPool._FLAG_HANDLING :
+                return
+            flags |= XAsyncSocketsPool._FLAG_HANDLING
+            self._handlingCount += 1
+            if eventName == 'OnReadyForWriting' and flags & XAsyncSocketsPool._FLAG_WRITE :
+                flags &= ~XAsyncSocketsPool._FLAG_WRITE
+                self._writeList.remove(sock)
+                if self._aioLoop :
+                    self._aioWatch(sock, self._aioWriters, False)
+            self._fdFlags[fd] = flags
+        if self._microWorkers :
+            self._microWorkers.AddJob(self._jobSocketEvent, (asyncSocket, sock, eventName))
+        else :
+            self._jobSocketEvent((asyncSocket, sock, eventName))
+
+    # ------------------------------------------------------------------------
+
+    def _processWaitEvents(self) :
+
+        self._processing   = True
+        self._loopThreadID = get_ident()
         
-        self._socketListAdd(self._udpSockEvt, self._readList)
+        self._watchSocket(self._udpSockEvt, XAsyncSocketsPool._FLAG_READ)
 
-        timeSec       = perf_counter()
-        udpSockEvtBuf = bytearray(32)
+        timeSec        = perf_counter()
+        lastMetricsSec = timeSec
+        udpSockEvtBuf  = bytearray(32)
         
         while self._processing :
             try :
+                pollStartSec = perf_counter()
+                waitSec      = XAsyncSocketsPool._CHECK_SEC_INTERVAL
+                if self._nextExpireSec is not None :
+                    waitSec = min(waitSec, max(0, self._nextExpireSec - pollStartSec))
+                if self._soonCalls :
+                    waitSec = 0
+                elif self._timers :
+                    waitSec = min(waitSec, max(0, self._timers[0][0] - pollStartSec))
+                if self._onMetrics :
+                    # A new interval is applied at once, from the last event,
+                    waitSec = min(waitSec, max(0, lastMetricsSec + self._metricsSec - pollStartSec))
+                readList  = self._readList
+                writeList = self._writeList
+                if self._handlingCount :
+                    # Sockets handled by worker threads are not waited,
+                    readList  = self._unhandledSockets(readList)
+                    writeList = self._unhandledSockets(writeList)
                 try :
-                    rd, wr, ex = select( self._readList,
-                                         self._writeList,
-                                         self._readList,
-                                         XAsyncSocketsPool._CHECK_SEC_INTERVAL )
+                    rd, wr, ex = select( readList,
+                                         writeList,
+                                         readList,
+                                         waitSec )
                 except KeyboardInterrupt :
                     break
                 except :
-                    sleep(XAsyncSocketsPool._CHECK_SEC_INTERVAL)
+                    if not self._forgetClosedSockets() :
+                        sleep(XAsyncSocketsPool._CHECK_SEC_INTERVAL)
                     continue
                 if not self._processing :
                     break
-                for socketsList in ex, wr, rd :
+                processStartSec    = perf_counter()
+                events             = len(rd) + len(wr) + len(ex)
+                trace              = self._trace
+                if trace :
+                    trace._record( pollStartSec, -1, XAsyncTrace.POLL,
+                                   events, processStartSec - pollStartSec )
+                self._pollSec     += processStartSec - pollStartSec
+                self._loopsCount  += 1
+                self._eventsCount += events
+                if events > self._maxTickEvents :
+                    self._maxTickEvents = events
+                for socketsList, eventName in ( (ex, 'OnExceptionalCondition'),
+                                                (wr, 'OnReadyForWriting'),
+                                                (rd, 'OnReadyForReading') ) :
                     for sock in socketsList :
                         if sock == self._udpSockEvt :
                             self._udpSockEvt.recv_into(udpSockEvtBuf)
                         else :
-                            asyncSocket = self._asyncSockets.get(sock)
-                            if asyncSocket and asyncSocket.GetSocketObj() == sock and sock.fileno() != -1 :
-                                if self._socketListAdd(sock, self._handlingList) :
-                                    if socketsList is rd :
-                                        if self._microWorkers :
-                                            self._microWorkers.AddJob(jobReadyForReading, (asyncSocket, sock))
-                                        else :
-                                            jobReadyForReading((asyncSocket, sock))
-                                    elif socketsList is wr :
-                                        self._socketListRemove(sock, self._writeList)
-                                        if self._microWorkers :
-                                            self._microWorkers.AddJob(jobReadyForWriting, (asyncSocket, sock))
-                                        else :
-                                            jobReadyForWriting((asyncSocket, sock))
-                                    else :
-                                        self._removeSocket(sock)
-                                        if self._microWorkers :
-                                            self._microWorkers.AddJob(jobExceptionalCondition, (asyncSocket, sock))
-                                        else :
-                                            jobExceptionalCondition((asyncSocket, sock))
-                            else :
-                                self._removeSocket(sock)
-                                sock.close()
+                            self._handleSocketEvent(sock, eventName)
                 sec = perf_counter()
-                if sec > timeSec + XAsyncSocketsPool._CHECK_SEC_INTERVAL :
+                self._processSec += sec - processStartSec
+                if sec > timeSec + XAsyncSocketsPool._CHECK_SEC_INTERVAL or \
+                   ( self._nextExpireSec is not None and sec >= self._nextExpireSec ) :
                     timeSec = sec
-                    for asyncSocket in list(self._asyncSockets.values()) :
-                        if asyncSocket.ExpireTimeSec and \
-                           timeSec > asyncSocket.ExpireTimeSec :
-                            asyncSocket._close(XClosedReason.Timeout)
+                    self._processExpiredSockets(timeSec)
+                if self._onMetrics and sec >= lastMetricsSec + self._metricsSec :
+                    lastMetricsSec = sec
+                    try :
+                        self._onMetrics(self, self.GetMetrics())
+                    except :
+                        pass
+                if self._soonCalls or (self._timers and self._timers[0][0] <= sec) :
+                    self._runCalls(sec)
+                if self._corkedSockets :
+                    self._flushCorkedSockets()
+                if trace :
+                    trace._record( processStartSec, -1, XAsyncTrace.TICK,
+                                   events, perf_counter() - processStartSec )
             except :
                 pass
 
+        self._loopThreadID = None
+
         if self._microWorkers :
             self._microWorkers.StopAll()
             self._microWorkers = None
-        for asyncSocket in list(self._asyncSockets.values()) :
+        for asyncSocket in self.GetAllAsyncSockets() :
             try :
                 asyncSocket.Close()
             except :
                 pass
 
-        self._readList.clear()
-        self._writeList.clear()
+        with self._opLock :
+            self._unwatchAll()
 
         self._processing = None
 
@@ -196,21 +836,111 @@ class XAsyncSocketsPool :
     # ------------------------------------------------------------------------
 
     def RemoveAsyncSocket(self, asyncSocket) :
-        try :
-            socket = asyncSocket.GetSocketObj()
-        except :
+        if not isinstance(asyncSocket, XAsyncSocket) :
             raise XAsyncSocketsPoolException('RemoveAsyncSocket : "asyncSocket" is incorrect.')
-        return self._removeSocket(socket)
+        return self._removeSocket(asyncSocket)
 
     # ------------------------------------------------------------------------
 
     def GetAllAsyncSockets(self) :
-        return list(self._asyncSockets.values())
+        return [ entry[0] for entry in self._fdTable if entry is not None ]
 
     # ------------------------------------------------------------------------
 
     def GetAsyncSocketByID(self, id) :
-        return self._asyncSockets.get(id, None)
+        try :
+            fd, entry = self._fdEntry(id)
+        except :
+            return None
+        return entry[0] if entry is not None else None
+
+    # ------------------------------------------------------------------------
+
+    def GetMetrics(self) :
+        with self._opLock :
+            io = { }
+            for name, counters in self._closedIO.items() :
+                io[name] = list(counters)
+        socketsByClass = { }
+        slotsCount     = 0
+        slotsUsed      = 0
+        rejected       = { }
+        for asyncSocket in self.GetAllAsyncSockets() :
+            name = type(asyncSocket).__name__
+            socketsByClass[name] = socketsByClass.get(name, 0) + 1
+            if isinstance(asyncSocket, XAsyncTCPServer) :
+                for slot in asyncSocket._bufSlots.Slots :
+                    slotsCount += 1
+                    if not slot.Available :
+                        slotsUsed += 1
+                for reason, count in asyncSocket.RejectedCounts.items() :
+                    rejected[reason] = rejected.get(reason, 0) + count
+            else :
+                counters = io.get(name)
+                if counters is None :
+                    counters = io[name] = [0, 0, 0, 0]
+                counters[0] += asyncSocket.BytesRecv
+                counters[1] += asyncSocket.BytesSent
+                counters[2] += asyncSocket.MessagesRecv
+                counters[3] += asyncSocket.MessagesSent
+        for name in io :
+            bytesRecv, bytesSent, msgsRecv, msgsSent = io[name]
+            io[name] = { 'bytesRecv'    : bytesRecv,
+                         'bytesSent'    : bytesSent,
+                         'messagesRecv' : msgsRecv,
+                         'messagesSent' : msgsSent }
+        microWorkers = self._microWorkers
+        return { 'loopsCount'        : self._loopsCount,
+                 'pollSec'           : self._pollSec,
+                 'processSec'        : self._processSec,
+                 'eventsCount'       : self._eventsCount,
+                 'maxTickEvents'     : self._maxTickEvents,
+                 'wakeUpsCount'      : self._wakeUpsCount,
+                 'timeoutsCount'     : self._timeoutsCount,
+                 'callsCount'        : self._callsCount,
+                 'timersCount'       : len(self._timers) - self._timersDead,
+                 'socketsByClass'    : socketsByClass,
+                 'io'                : io,
+                 'bufSlotsCount'     : slotsCount,
+                 'bufSlotsUsed'      : slotsUsed,
+                 'rejectedClients'   : rejected,
+                 'workersJobsQueued' : microWorkers.JobsInQueue if microWorkers else 0,
+                 'workersJobsActive' : microWorkers.JobsInProcess if microWorkers else 0 }
+
+    # ------------------------------------------------------------------------
+
+    def GetCallbacksProfiles(self) :
+        profiles = { }
+        with self._profLock :
+            for (className, eventName), profile in self._profiles.items() :
+                count, totalSec, maxSec, buckets = profile
+                if className not in profiles :
+                    profiles[className] = { }
+                profiles[className][eventName] = { 'count'    : count,
+                                                   'totalSec' : totalSec,
+                                                   'maxSec'   : maxSec,
+                                                   'buckets'  : list(buckets) }
+        return profiles
+
+    # ------------------------------------------------------------------------
+
+    def ResetCallbacksProfiles(self) :
+        with self._profLock :
+            self._profiles.clear()
+
+    # ------------------------------------------------------------------------
+
+    def StartTrace(self, capacity=65536) :
+        trace       = XAsyncTrace(capacity)
+        self._trace = trace
+        return trace
+
+    # ------------------------------------------------------------------------
+
+    def StopTrace(self) :
+        trace       = self._trace
+        self._trace = None
+        return trace
 
     # ------------------------------------------------------------------------
 
@@ -220,10 +950,10 @@ class XAsyncSocketsPool :
         except :
             raise XAsyncSocketsPoolException('NotifyNextReadyForReading : "asyncSocket" is incorrect.')
         if notify :
-            if self._socketListAdd(socket, self._readList) :
+            if self._watchSocket(socket, XAsyncSocketsPool._FLAG_READ) :
                 self._sendUDPSockEvent()
         else :
-            self._socketListRemove(socket, self._readList)
+            self._unwatchSocket(socket, XAsyncSocketsPool._FLAG_READ)
 
     # ------------------------------------------------------------------------
 
@@ -233,10 +963,114 @@ class XAsyncSocketsPool :
         except :
             raise XAsyncSocketsPoolException('NotifyNextReadyForWriting : "asyncSocket" is incorrect.')
         if notify :
-            if self._socketListAdd(socket, self._writeList) :
+            if self._watchSocket(socket, XAsyncSocketsPool._FLAG_WRITE) :
                 self._sendUDPSockEvent()
         else :
-            self._socketListRemove(socket, self._writeList)
+            self._unwatchSocket(socket, XAsyncSocketsPool._FLAG_WRITE)
+
+    # ------------------------------------------------------------------------
+
+    def Broadcast(self, clients, data, maxPending=None, slowPolicy='skip') :
+        try :
+            if not len(data) :
+                raise Exception()
+            # One immutable buffer is shared by all the clients, each one
+            # sending it from its own offset,
+            view = memoryview(data if isinstance(data, bytes) else bytes(data))
+        except :
+            raise XAsyncSocketsPoolException('Broadcast : "data" is incorrect.')
+        if maxPending is not None and ( not isinstance(maxPending, int) or maxPending <= 0 ) :
+            raise XAsyncSocketsPoolException('Broadcast : "maxPending" is incorrect.')
+        if slowPolicy != 'skip' and slowPolicy != 'drop' :
+            raise XAsyncSocketsPoolException('Broadcast : "slowPolicy" is incorrect.')
+        blocks   = None
+        toWrite  = [ ]
+        dropped  = [ ]
+        count    = 0
+        for cli in clients :
+            if not isinstance(cli, XAsyncTCPClient) :
+                raise XAsyncSocketsPoolException('Broadcast : "clients" is incorrect.')
+            if cli._asyncSocketsPool is not self or cli._socketID is None or not cli._socketOpened :
+                continue
+            pending = cli.SendBufferedLen
+            if cli._sendBufFull if maxPending is None else pending >= maxPending :
+                if slowPolicy == 'drop' :
+                    dropped.append(cli)
+                continue
+            chunk = view
+            stage = cli._compression
+            if stage :
+                # Blocks do not depend on the previous ones, the same one
+                # is sent to the clients with the same compression,
+                key = (stage._pool, stage._minSize)
+                if blocks is None :
+                    blocks = { }
+                chunk = blocks.get(key)
+                if chunk is None :
+                    chunk       = memoryview(stage._encode(view))
+                    blocks[key] = chunk
+                else :
+                    stage._countBlock(len(view), chunk)
+            if cli._wrBufView :
+                if cli._wrChunks is None :
+                    cli._wrChunks = [ ]
+                cli._wrChunks.append(chunk)
+                cli._wrChunksLen += len(chunk)
+            else :
+                cli._wrBufView     = chunk
+                cli._onDataSent    = None
+                cli._onDataSentArg = None
+                if not cli._corkDepth :
+                    toWrite.append(cli)
+            cli._msgsSent += 1
+            count         += 1
+            if cli._sendHighWater is not None and not cli._sendBufFull and \
+               pending + len(chunk) >= cli._sendHighWater :
+                cli._sendBufFilled()
+        if toWrite :
+            self._requestWritingBatch(toWrite)
+        for cli in dropped :
+            cli.Close()
+        return count
+
+    # ------------------------------------------------------------------------
+
+    def CallSoon(self, fn, arg=None) :
+        if not callable(fn) :
+            raise XAsyncSocketsPoolException('CallSoon : "fn" is incorrect.')
+        handle = XAsyncCallHandle(self, None, fn, arg)
+        with self._callsLock :
+            self._soonCalls.append(handle)
+            # Only the first call of a batch wakes up the loop,
+            wakeUp = (len(self._soonCalls) == 1)
+        if wakeUp :
+            # Never run inline, even from the asyncio loop thread,
+            self._wakeUpForCalls()
+        return handle
+
+    # ------------------------------------------------------------------------
+
+    def CallLater(self, delaySec, fn, arg=None) :
+        if not isinstance(delaySec, (int, float)) or delaySec < 0 :
+            raise XAsyncSocketsPoolException('CallLater : "delaySec" is incorrect.')
+        return self.CallAt(perf_counter() + delaySec, fn, arg)
+
+    # ------------------------------------------------------------------------
+
+    def CallAt(self, whenSec, fn, arg=None) :
+        if not isinstance(whenSec, (int, float)) :
+            raise XAsyncSocketsPoolException('CallAt : "whenSec" is incorrect.')
+        if not callable(fn) :
+            raise XAsyncSocketsPoolException('CallAt : "fn" is incorrect.')
+        handle = XAsyncCallHandle(self, whenSec, fn, arg)
+        with self._callsLock :
+            self._timersSeq += 1
+            heappush(self._timers, (whenSec, self._timersSeq, handle))
+            # Only a new earliest deadline wakes up the loop,
+            wakeUp = (self._timers[0][2] is handle)
+        if wakeUp :
+            self._wakeUpForCalls()
+        return handle
 
     # ------------------------------------------------------------------------
 
@@ -262,9 +1096,41 @@ class XAsyncSocketsPool :
 
     # ------------------------------------------------------------------------
 
+    def AttachAsyncioLoop(self, loop=None) :
+        if self.WaitEventsProcessing :
+            raise XAsyncSocketsPoolException('AttachAsyncioLoop : "WaitEvents" is already in processing.')
+        try :
+            import asyncio
+            if loop is None :
+                try :
+                    loop = asyncio.get_running_loop()
+                except :
+                    loop = asyncio.get_event_loop()
+        except Exception as ex :
+            raise XAsyncSocketsPoolException('AttachAsyncioLoop : No asyncio loop (%s).' % ex)
+        if not hasattr(loop, 'add_reader') or not hasattr(loop, 'call_soon_threadsafe') :
+            raise XAsyncSocketsPoolException('AttachAsyncioLoop : This asyncio loop is not supported.')
+        with self._opLock :
+            self._aioLoop     = loop
+            self._aioThreadID = get_ident()
+            for sock in self._readList :
+                self._aioWatch(sock, self._aioReaders, True)
+            for sock in self._writeList :
+                self._aioWatch(sock, self._aioWriters, True)
+        self._processing = True
+        self._aioScheduleTick()
+
+    # ------------------------------------------------------------------------
+
     def StopWaitEvents(self) :
         if not self.WaitEventsProcessing :
             return
+        if self._aioLoop :
+            self._aioCall(self._aioDetach)
+            if get_ident() != self._aioThreadID :
+                while self.WaitEventsProcessing :
+                    sleep(0.010)
+            return
         self._processing = False
         self._sendUDPSockEvent()
         while self.WaitEventsProcessing :
@@ -276,11 +1142,222 @@ class XAsyncSocketsPool :
     def WaitEventsProcessing(self) :
         return (self._processing is not None)
 
-# ============================================================================
-# ===( XClosedReason )========================================================
-# ============================================================================
+    @property
+    def AsyncioLoop(self) :
+        return self._aioLoop
 
-class XClosedReason() :
+    @property
+    def AutoCork(self) :
+        return self._autoCork
+    @AutoCork.setter
+    def AutoCork(self, value) :
+        self._autoCork = bool(value)
+
+    @property
+    def OnMetrics(self) :
+        return self._onMetrics
+    @OnMetrics.setter
+    def OnMetrics(self, value) :
+        self._onMetrics = value
+
+    @property
+    def MetricsIntervalSec(self) :
+        return self._metricsSec
+    @MetricsIntervalSec.setter
+    def MetricsIntervalSec(self, value) :
+        if not isinstance(value, (int, float)) or value <= 0 :
+            raise XAsyncSocketsPoolException('MetricsIntervalSec : "value" must be greater than zero.')
+        self._metricsSec = value
+
+    @property
+    def Trace(self) :
+        return self._trace
+
+    @property
+    def CallbacksProfiling(self) :
+        return self._profiling
+    @CallbacksProfiling.setter
+    def CallbacksProfiling(self, value) :
+        self._profiling = bool(value)
+
+    @property
+    def SlowCallbackSec(self) :
+        return self._slowCbSec
+    @SlowCallbackSec.setter
+    def SlowCallbackSec(self, value) :
+        if not isinstance(value, (int, float)) or value < 0 :
+            raise XAsyncSocketsPoolException('SlowCallbackSec : "value" must be positive.')
+        self._slowCbSec = value
+
+    @property
+    def OnSlowCallback(self) :
+        return self._onSlowCb
+    @OnSlowCallback.setter
+    def OnSlowCallback(self, value) :
+        self._onSlowCb = value
+
+    @property
+    def DNSResolver(self) :
+        return self._dnsResolver
+    @DNSResolver.setter
+    def DNSResolver(self, value) :
+        if value is not None and not isinstance(value, XAsyncDNSResolver) :
+            raise XAsyncSocketsPoolException('DNSResolver : "value" is incorrect.')
+        self._dnsResolver = value
+
+# ============================================================================
+# ===( XAsyncCallHandle )=====================================================
+# ============================================================================
+
+class XAsyncCallHandle :
+
+    __slots__ = ( '_asyncSocketsPool', '_whenSec', '_fn', '_arg',
+                  '_cancelled', '_done' )
+
+    def __init__(self, asyncSocketsPool, whenSec, fn, arg) :
+        self._asyncSocketsPool = asyncSocketsPool
+        self._whenSec          = whenSec
+        self._fn               = fn
+        self._arg              = arg
+        self._cancelled        = False
+        self._done             = False
+
+    # ------------------------------------------------------------------------
+
+    def Cancel(self) :
+        return self._asyncSocketsPool._cancelCall(self)
+
+    # ------------------------------------------------------------------------
+
+    @property
+    def WhenSec(self) :
+        return self._whenSec
+
+    @property
+    def IsCancelled(self) :
+        return self._cancelled
+
+    @property
+    def IsDone(self) :
+        return self._done and not self._cancelled
+
+# ============================================================================
+# ===( XAsyncTrace )==========================================================
+# ============================================================================
+
+class XAsyncTraceException(Exception) :
+    pass
+
+class XAsyncTrace :
+
+    POLL   = 1
+    TICK   = 2
+    READ   = 3
+    WRITE  = 4
+    ERROR  = 5
+    RECV   = 6
+    SEND   = 7
+    EXPIRE = 8
+
+    EVENT_NAMES  = ( None, 'poll', 'tick', 'read', 'write', 'error', 'recv', 'send', 'expire' )
+    _EVENT_CODES = { 'OnReadyForReading'      : READ,
+                     'OnReadyForWriting'      : WRITE,
+                     'OnExceptionalCondition' : ERROR }
+
+    __slots__ = ( '_capacity', '_lock', '_count', '_wallOffsetSec',
+                  '_times', '_fds', '_types', '_bytes', '_durations' )
+
+    def __init__(self, capacity=65536) :
+        from time import time as wallTime
+        try :
+            from array import array
+        except :
+            from uarray import array
+        if not isinstance(capacity, int) or capacity <= 0 :
+            raise XAsyncTraceException('"capacity" must be an integer greater than zero.')
+        # Preallocated columns, an event is written in place without allocation,
+        self._capacity      = capacity
+        self._lock          = allocate_lock()
+        self._count         = 0
+        self._wallOffsetSec = wallTime() - perf_counter()
+        self._times         = array('d', [0.0] * capacity)
+        self._fds           = array('i', [0] * capacity)
+        self._types         = bytearray(capacity)
+        self._bytes         = array('l', [0] * capacity)
+        self._durations     = array('f', [0.0] * capacity)
+
+    # ------------------------------------------------------------------------
+
+    def _record(self, timeSec, fd, eventType, size, durationSec) :
+        with self._lock :
+            i = self._count % self._capacity
+            self._count        += 1
+            self._times[i]      = timeSec
+            self._fds[i]        = fd
+            self._types[i]      = eventType
+            self._bytes[i]      = size
+            self._durations[i]  = durationSec
+
+    # ------------------------------------------------------------------------
+
+    def GetEvents(self) :
+        with self._lock :
+            count = min(self._count, self._capacity)
+            start = self._count - count
+            cols  = ( self._times[:], self._fds[:], self._types[:],
+                      self._bytes[:], self._durations[:] )
+        times, fds, types, sizes, durations = cols
+        events = [ ]
+        for n in range(start, start + count) :
+            i = n % self._capacity
+            events.append( (times[i], fds[i], types[i], sizes[i], durations[i]) )
+        return events
+
+    # ------------------------------------------------------------------------
+
+    def Dump(self, filename) :
+        events = self.GetEvents()
+        try :
+            with open(filename, 'w') as f :
+                f.write( '# XAsyncTrace capacity=%d recorded=%d dropped=%d wallOffsetSec=%.6f\n'
+                         % ( self._capacity, self._count, self.Dropped, self._wallOffsetSec ) )
+                f.write('# timeSec fd event bytes durationSec\n')
+                for timeSec, fd, eventType, size, durationSec in events :
+                    f.write( '%.6f %d %s %d %.7f\n'
+                             % ( timeSec, fd, XAsyncTrace.EVENT_NAMES[eventType], size, durationSec ) )
+        except Exception as ex :
+            raise XAsyncTraceException('Dump : %s' % ex)
+        return len(events)
+
+    # ------------------------------------------------------------------------
+
+    def Clear(self) :
+        with self._lock :
+            self._count = 0
+
+    # ------------------------------------------------------------------------
+
+    @property
+    def Capacity(self) :
+        return self._capacity
+
+    @property
+    def Count(self) :
+        return min(self._count, self._capacity)
+
+    @property
+    def Dropped(self) :
+        return max(0, self._count - self._capacity)
+
+    @property
+    def WallOffsetSec(self) :
+        return self._wallOffsetSec
+
+# ============================================================================
+# ===( XClosedReason )========================================================
+# ============================================================================
+
+class XClosedReason() :
 
     Error        = 0x00
     ClosedByHost = 0x01
@@ -296,16 +1373,69 @@ class XAsyncSocketException(Exception) :
 
 class XAsyncSocket :
 
+    # Per-connection objects are kept compact, no instance dictionary,
+    __slots__ = ( '_asyncSocketsPool', '_socket', '_socketID',
+                  '_recvBufSlot', '_sendBufSlot', '_expireTimeSec',
+                  '_state', '_onClosed',
+                  '_bytesRecv', '_bytesSent', '_msgsRecv', '_msgsSent' )
+
+    @staticmethod
+    def _isUnixAddr(addr) :
+        # A Unix domain address is a path, or a name starting with a null
+        # byte in the abstract namespace (Linux),
+        return isinstance(addr, (str, bytes))
+
+    @staticmethod
+    def _getAddrFamily(addr) :
+        if XAsyncSocket._isUnixAddr(addr) :
+            if not hasattr(socket, 'AF_UNIX') :
+                raise XAsyncSocketException('Unix domain sockets are not supported on this system.')
+            return socket.AF_UNIX
+        return socket.AF_INET6 if ':' in addr[0] else socket.AF_INET
+
+    @staticmethod
+    def _addrHost(addr) :
+        return addr if XAsyncSocket._isUnixAddr(addr) else addr[0]
+
+    @staticmethod
+    def _bindSocket(sock, addr) :
+        try :
+            sock.bind(addr)
+            return
+        except OSError as ex :
+            if not XAsyncSocket._isUnixAddr(addr) or not addr or addr[0] in ('\0', 0) :
+                raise ex
+            bindEx = ex
+        # The path may have been left by a process that did not close its
+        # socket, it is removed only if nothing is bound to it anymore,
+        probe = socket.socket(socket.AF_UNIX, sock.type)
+        try :
+            probe.connect(addr)
+            stale = False
+        except OSError as ex :
+            stale = (ex.args[0] == ECONNREFUSED)
+        finally :
+            probe.close()
+        if not stale :
+            raise bindEx
+        os.remove(addr)
+        sock.bind(addr)
+
+    @staticmethod
+    def _removeUnixPath(addr) :
+        if XAsyncSocket._isUnixAddr(addr) and addr and addr[0] not in ('\0', 0) :
+            try :
+                os.remove(addr)
+            except :
+                pass
+
     def __init__(self, asyncSocketsPool, socket, recvBufSlot=None, sendBufSlot=None) :
         if type(self) is XAsyncSocket :
             raise XAsyncSocketException('XAsyncSocket is an abstract class and must be implemented.')
         self._asyncSocketsPool = asyncSocketsPool
-        self._socket           = socket
         self._recvBufSlot      = recvBufSlot
         self._sendBufSlot      = sendBufSlot
-        self._expireTimeSec    = None
-        self._state            = None
-        self._onClosed         = None
+        self._initState(socket)
         try :
             socket.settimeout(0)
             socket.setblocking(0)
@@ -318,15 +1448,35 @@ class XAsyncSocket :
 
     # ------------------------------------------------------------------------
 
+    def _initState(self, socket) :
+        self._socket        = socket
+        self._socketID      = None
+        self._expireTimeSec = None
+        self._state         = None
+        self._onClosed      = None
+        self._bytesRecv     = 0
+        self._bytesSent     = 0
+        self._msgsRecv      = 0
+        self._msgsSent      = 0
+
+    # ------------------------------------------------------------------------
+
     def _setExpireTimeout(self, timeoutSec) :
         try :
             if timeoutSec and timeoutSec > 0 :
-                self._expireTimeSec = perf_counter() + timeoutSec
+                self._setExpireTimeSec(perf_counter() + timeoutSec)
         except :
             raise XAsyncSocketException('"timeoutSec" is incorrect to set expire timeout.')
 
     # ------------------------------------------------------------------------
 
+    def _setExpireTimeSec(self, expireTimeSec) :
+        self._expireTimeSec = expireTimeSec
+        if expireTimeSec is not None :
+            self._asyncSocketsPool._notifyExpireTimeSec(expireTimeSec)
+
+    # ------------------------------------------------------------------------
+
     def _removeExpireTimeout(self) :
         self._expireTimeSec = None
 
@@ -338,12 +1488,8 @@ class XAsyncSocket :
                 self._socket.close()
             except :
                 pass
-            if self._recvBufSlot is not None :
-                self._recvBufSlot.Available = True
-                self._recvBufSlot = None
-            if self._sendBufSlot is not None :
-                self._sendBufSlot.Available = True
-                self._sendBufSlot = None
+            self._asyncSocketsPool._addClosedIO(self)
+            self._releaseBufSlots()
             if triggerOnClosed and self._onClosed :
                 try :
                     self._onClosed(self, closedReason)
@@ -354,6 +1500,23 @@ class XAsyncSocket :
 
     # ------------------------------------------------------------------------
 
+    def _releaseBufSlots(self) :
+        if self._recvBufSlot is not None :
+            self._recvBufSlot.Available = True
+            self._recvBufSlot = None
+        if self._sendBufSlot is not None :
+            self._sendBufSlot.Available = True
+            self._sendBufSlot = None
+
+    # ------------------------------------------------------------------------
+
+    def _getEventCallback(self, eventName) :
+        if eventName == 'OnExceptionalCondition' :
+            return self._onClosed
+        return None
+
+    # ------------------------------------------------------------------------
+
     def GetAsyncSocketsPool(self) :
         return self._asyncSocketsPool
 
@@ -385,14 +1548,35 @@ class XAsyncSocket :
 
     # ------------------------------------------------------------------------
 
+    def OnExpireTimeout(self) :
+        self._close(XClosedReason.Timeout)
+
+    # ------------------------------------------------------------------------
+
     @property
     def SocketID(self) :
-        return self._socket.fileno() if self._socket else None
+        return self._socketID
 
     @property
     def ExpireTimeSec(self) :
         return self._expireTimeSec
 
+    @property
+    def BytesRecv(self) :
+        return self._bytesRecv
+
+    @property
+    def BytesSent(self) :
+        return self._bytesSent
+
+    @property
+    def MessagesRecv(self) :
+        return self._msgsRecv
+
+    @property
+    def MessagesSent(self) :
+        return self._msgsSent
+
     @property
     def OnClosed(self) :
         return self._onClosed
@@ -416,15 +1600,31 @@ class XAsyncTCPServerException(Exception) :
 
 class XAsyncTCPServer(XAsyncSocket) :
 
+    __slots__ = ( '_srvAddr', '_bufSlots', '_onClientAccepted',
+                  '_aioLock', '_aioAccepted', '_aioFutures',
+                  '_admLock', '_maxConns', '_maxConnsPerIP', '_ratePerIP',
+                  '_burstPerIP', '_ipStates', '_connsCount', '_acceptPaused',
+                  '_rejected', '_onClientRejected', '_socketOptions',
+                  '_freeClients', '_freeClientsMax', '_recycledCount' )
+
+    _IP_STATES_MAX = 4096
+
     @staticmethod
-    def Create(asyncSocketsPool, srvAddr, srvBacklog=256, bufSlots=None) :
+    def Create(asyncSocketsPool, srvAddr, srvBacklog=256, bufSlots=None, socketOptions=None) :
+        try :
+            socketOptions = XSocketOptions._get(socketOptions)
+            family        = XAsyncSocket._getAddrFamily(srvAddr)
+        except Exception as ex :
+            raise XAsyncTCPServerException('Create : %s' % ex)
         try :
-            srvSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            srvSocket = socket.socket(family, socket.SOCK_STREAM)
         except :
             raise XAsyncTCPServerException('Create : Cannot open socket (no enought memory).')
         try :
             srvSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            srvSocket.bind(srvAddr)
+            if socketOptions :
+                socketOptions._apply(srvSocket, isListener=True)
+            XAsyncSocket._bindSocket(srvSocket, srvAddr)
             srvSocket.listen(srvBacklog)
         except :
             raise XAsyncTCPServerException('Create : Error to binding the TCP server on this address.')
@@ -434,6 +1634,7 @@ class XAsyncTCPServer(XAsyncSocket) :
                                            srvSocket,
                                            srvAddr,
                                            bufSlots )
+        xAsyncTCPServer._socketOptions = socketOptions
         asyncSocketsPool.NotifyNextReadyForReading(xAsyncTCPServer, True)
         return xAsyncTCPServer
 
@@ -445,31 +1646,222 @@ class XAsyncTCPServer(XAsyncSocket) :
             self._srvAddr          = srvAddr
             self._bufSlots         = bufSlots
             self._onClientAccepted = None
+            self._aioLock          = allocate_lock()
+            self._aioAccepted      = [ ]
+            self._aioFutures       = [ ]
+            self._admLock          = allocate_lock()
+            self._maxConns         = None
+            self._maxConnsPerIP    = None
+            self._ratePerIP        = None
+            self._burstPerIP       = None
+            self._ipStates         = { }
+            self._connsCount       = 0
+            self._acceptPaused     = False
+            self._rejected         = { }
+            self._onClientRejected = None
+            self._socketOptions    = None
+            self._freeClients      = [ ]
+            self._freeClientsMax   = 0
+            self._recycledCount    = 0
         except :
             raise XAsyncTCPServerException('Error to creating XAsyncTCPServer, arguments are incorrects.')
 
     # ------------------------------------------------------------------------
 
+    def _close(self, closedReason=XClosedReason.Error, triggerOnClosed=True) :
+        ret = super()._close(closedReason, triggerOnClosed)
+        if ret :
+            XAsyncSocket._removeUnixPath(self._srvAddr)
+            self.SetClientsRecycling(None)
+        if ret and self._aioFutures :
+            with self._aioLock :
+                futures          = self._aioFutures
+                self._aioFutures = [ ]
+            for future in futures :
+                self._asyncSocketsPool._aioSetFutureResult( future,
+                                                            XAsyncTCPServerException('Accept : Server closed.'),
+                                                            isException=True )
+        return ret
+
+    # ------------------------------------------------------------------------
+
+    def _aioOnClientAccepted(self, xAsyncTCPServer, xAsyncTCPClient) :
+        with self._aioLock :
+            future = None
+            while self._aioFutures and future is None :
+                future = self._aioFutures.pop(0)
+                if future.done() :
+                    future = None
+            if future is None :
+                self._aioAccepted.append(xAsyncTCPClient)
+                return
+        self._asyncSocketsPool._aioSetFutureResult(future, xAsyncTCPClient)
+
+    # ------------------------------------------------------------------------
+
+    def _getEventCallback(self, eventName) :
+        if eventName == 'OnReadyForReading' :
+            return self._onClientAccepted
+        return super()._getEventCallback(eventName)
+
+    # ------------------------------------------------------------------------
+
+    def _getBufSlots(self) :
+        # Stops polling the listener when the server is full (new clients
+        # wait in the backlog), resumed when an accepted client is closed,
+        with self._admLock :
+            if self._maxConns is None or self._connsCount < self._maxConns :
+                if self._freeClients :
+                    # A recycled client comes with its buffer slots,
+                    freeClient = self._freeClients.pop()
+                    return (freeClient._recvBufSlot, freeClient._sendBufSlot, freeClient)
+                recvBufSlot = self._bufSlots.GetAvailableSlot()
+                sendBufSlot = self._bufSlots.GetAvailableSlot()
+                if recvBufSlot and sendBufSlot :
+                    return (recvBufSlot, sendBufSlot, None)
+                if recvBufSlot :
+                    recvBufSlot.Available = True
+                if sendBufSlot :
+                    sendBufSlot.Available = True
+            if not self._acceptPaused :
+                self._acceptPaused = True
+                self._asyncSocketsPool.NotifyNextReadyForReading(self, False)
+        return (None, None, None)
+
+    # ------------------------------------------------------------------------
+
+    def _releaseAcceptSlots(self, recvBufSlot, sendBufSlot, freeClient) :
+        # Releases what "_getBufSlots" gave for a client not accepted,
+        if freeClient :
+            self._recycleClient(freeClient)
+        else :
+            recvBufSlot.Available = True
+            sendBufSlot.Available = True
+
+    # ------------------------------------------------------------------------
+
+    def _recycleClient(self, xAsyncTCPClient) :
+        with self._admLock :
+            if len(self._freeClients) < self._freeClientsMax :
+                self._freeClients.append(xAsyncTCPClient)
+                return
+        XAsyncSocket._releaseBufSlots(xAsyncTCPClient)
+
+    # ------------------------------------------------------------------------
+
+    def _resumeAccepting(self) :
+        with self._admLock :
+            if self._acceptPaused and self._socket :
+                self._acceptPaused = False
+                self._asyncSocketsPool.NotifyNextReadyForReading(self, True)
+
+    # ------------------------------------------------------------------------
+
+    def _admitClient(self, ip) :
+        with self._admLock :
+            if self._maxConnsPerIP is None and self._ratePerIP is None :
+                self._connsCount += 1
+                return None
+            state = self._ipStates.get(ip)
+            nowSec = perf_counter()
+            if state is None :
+                if len(self._ipStates) >= XAsyncTCPServer._IP_STATES_MAX :
+                    self._purgeIPStates(nowSec)
+                # [connections count, tokens, last refill time],
+                state = self._ipStates[ip] = [0, self._burstPerIP, nowSec]
+            if self._maxConnsPerIP is not None and state[0] >= self._maxConnsPerIP :
+                return 'maxConnectionsPerIP'
+            if self._ratePerIP is not None :
+                state[1] = min( self._burstPerIP,
+                                state[1] + (nowSec - state[2]) * self._ratePerIP )
+                state[2] = nowSec
+                if state[1] < 1 :
+                    return 'rateLimit'
+                state[1] -= 1
+            state[0]         += 1
+            self._connsCount += 1
+        return None
+
+    # ------------------------------------------------------------------------
+
+    def _purgeIPStates(self, nowSec) :
+        for ip in list(self._ipStates) :
+            count, tokens, lastSec = self._ipStates[ip]
+            if not count and ( self._ratePerIP is None or \
+                               tokens + (nowSec - lastSec) * self._ratePerIP >= self._burstPerIP ) :
+                del self._ipStates[ip]
+
+    # ------------------------------------------------------------------------
+
+    def _onClientClosed(self, xAsyncTCPClient) :
+        ip = XAsyncSocket._addrHost(xAsyncTCPClient.CliAddr)
+        if xAsyncTCPClient._recvBufSlot is not None :
+            # Its buffer slots have been kept to be recycled,
+            self._recycleClient(xAsyncTCPClient)
+        with self._admLock :
+            self._connsCount -= 1
+            state = self._ipStates.get(ip)
+            if state :
+                state[0] -= 1
+                if not state[0] and self._ratePerIP is None :
+                    del self._ipStates[ip]
+        self._resumeAccepting()
+
+    # ------------------------------------------------------------------------
+
+    def _rejectClient(self, cliSocket, cliAddr, reason) :
+        try :
+            # Closes with a RST rather than a FIN, no TIME_WAIT is kept,
+            cliSocket.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        except :
+            pass
+        try :
+            cliSocket.close()
+        except :
+            pass
+        with self._admLock :
+            self._rejected[reason] = self._rejected.get(reason, 0) + 1
+        if self._onClientRejected :
+            try :
+                self._onClientRejected(self, cliAddr, reason)
+            except Exception as ex :
+                raise XAsyncTCPServerException('Error when handling the "OnClientRejected" event : %s' % ex)
+
+    # ------------------------------------------------------------------------
+
     def OnReadyForReading(self) :
+        recvBufSlot, sendBufSlot, freeClient = self._getBufSlots()
+        if not recvBufSlot :
+            return
         try :
             cliSocket, cliAddr = self._socket.accept()
         except :
+            self._releaseAcceptSlots(recvBufSlot, sendBufSlot, freeClient)
             return
-        recvBufSlot = self._bufSlots.GetAvailableSlot()
-        sendBufSlot = self._bufSlots.GetAvailableSlot()
-        if not recvBufSlot or not sendBufSlot or not self._onClientAccepted :
-            if recvBufSlot :
-                recvBufSlot.Available = True
-            if sendBufSlot :
-                sendBufSlot.Available = True
-            cliSocket.close()
+        if self._onClientAccepted :
+            # Unix domain peers all share the same (empty) address,
+            reason = self._admitClient(XAsyncSocket._addrHost(cliAddr))
+        else :
+            reason = 'noHandler'
+        if reason :
+            self._releaseAcceptSlots(recvBufSlot, sendBufSlot, freeClient)
+            self._rejectClient(cliSocket, cliAddr, reason)
             return
-        asyncTCPCli = XAsyncTCPClient( self._asyncSocketsPool,
-                                       cliSocket,
-                                       self._srvAddr,
-                                       cliAddr,
-                                       recvBufSlot,
-                                       sendBufSlot )
+        if self._socketOptions :
+            self._socketOptions._apply(cliSocket)
+        if freeClient :
+            asyncTCPCli = freeClient
+            asyncTCPCli._recycle(cliSocket, cliAddr)
+            self._recycledCount += 1
+        else :
+            asyncTCPCli = XAsyncTCPClient( self._asyncSocketsPool,
+                                           cliSocket,
+                                           self._srvAddr,
+                                           cliAddr,
+                                           recvBufSlot,
+                                           sendBufSlot )
+            asyncTCPCli._acceptedBy    = self
+            asyncTCPCli._socketOptions = self._socketOptions
         try :
             self._onClientAccepted(self, asyncTCPCli)
         except Exception as ex :
@@ -478,10 +1870,93 @@ class XAsyncTCPServer(XAsyncSocket) :
 
     # ------------------------------------------------------------------------
 
+    def Accept(self) :
+        onClientAccepted = self._onClientAccepted
+        if onClientAccepted and onClientAccepted != self._aioOnClientAccepted :
+            raise XAsyncTCPServerException('Accept : "OnClientAccepted" event is already set.')
+        future = self._asyncSocketsPool._aioCreateFuture()
+        with self._aioLock :
+            self._onClientAccepted = self._aioOnClientAccepted
+            if not self._aioAccepted :
+                self._aioFutures.append(future)
+                return future
+            xAsyncTCPClient = self._aioAccepted.pop(0)
+        self._asyncSocketsPool._aioSetFutureResult(future, xAsyncTCPClient)
+        return future
+
+    # ------------------------------------------------------------------------
+
+    def SetAdmissionControl( self,
+                             maxConnections      = None,
+                             maxConnectionsPerIP = None,
+                             ratePerIP           = None,
+                             burstPerIP          = None ) :
+        for name, value in ( ('maxConnections',      maxConnections),
+                             ('maxConnectionsPerIP', maxConnectionsPerIP),
+                             ('ratePerIP',           ratePerIP),
+                             ('burstPerIP',          burstPerIP) ) :
+            if value is not None and (not isinstance(value, (int, float)) or value <= 0) :
+                raise XAsyncTCPServerException('SetAdmissionControl : "%s" is incorrect.' % name)
+        if ratePerIP is not None and burstPerIP is None :
+            burstPerIP = max(1, ratePerIP)
+        with self._admLock :
+            self._maxConns      = maxConnections
+            self._maxConnsPerIP = maxConnectionsPerIP
+            self._ratePerIP     = ratePerIP
+            self._burstPerIP    = burstPerIP
+            self._ipStates      = { }
+            for asyncSocket in self._asyncSocketsPool.GetAllAsyncSockets() :
+                if getattr(asyncSocket, '_acceptedBy', None) is self :
+                    ip    = XAsyncSocket._addrHost(asyncSocket.CliAddr)
+                    state = self._ipStates.get(ip)
+                    if state is None :
+                        state = self._ipStates[ip] = [0, burstPerIP, perf_counter()]
+                    state[0] += 1
+        self._resumeAccepting()
+
+    # ------------------------------------------------------------------------
+
+    def SetClientsRecycling(self, maxFreeClients) :
+        if maxFreeClients is not None and (not isinstance(maxFreeClients, int) or maxFreeClients < 0) :
+            raise XAsyncTCPServerException('SetClientsRecycling : "maxFreeClients" is incorrect.')
+        with self._admLock :
+            self._freeClientsMax = maxFreeClients or 0
+            freeClients          = self._freeClients[self._freeClientsMax:]
+            del self._freeClients[self._freeClientsMax:]
+        for xAsyncTCPClient in freeClients :
+            XAsyncSocket._releaseBufSlots(xAsyncTCPClient)
+
+    # ------------------------------------------------------------------------
+
     @property
     def SrvAddr(self) :
         return self._srvAddr
 
+    @property
+    def SocketOptions(self) :
+        return self._socketOptions
+
+    @property
+    def FreeClientsCount(self) :
+        return len(self._freeClients)
+
+    @property
+    def RecycledCount(self) :
+        return self._recycledCount
+
+    @property
+    def ConnectionsCount(self) :
+        return self._connsCount
+
+    @property
+    def IsAcceptingPaused(self) :
+        return self._acceptPaused
+
+    @property
+    def RejectedCounts(self) :
+        with self._admLock :
+            return dict(self._rejected)
+
     @property
     def OnClientAccepted(self) :
         return self._onClientAccepted
@@ -489,6 +1964,13 @@ class XAsyncTCPServer(XAsyncSocket) :
     def OnClientAccepted(self, value) :
         self._onClientAccepted = value
 
+    @property
+    def OnClientRejected(self) :
+        return self._onClientRejected
+    @OnClientRejected.setter
+    def OnClientRejected(self, value) :
+        self._onClientRejected = value
+
 # ============================================================================
 # ===( XAsyncTCPClient )======================================================
 # ============================================================================
@@ -498,13 +1980,33 @@ class XAsyncTCPClientException(Exception) :
 
 class XAsyncTCPClient(XAsyncSocket) :
 
+    __slots__ = ( '_srvAddr', '_cliAddr', '_onFailsToConnect', '_onConnected',
+                  '_onDataRecv', '_onDataRecvArg', '_onDataSent', '_onDataSentArg',
+                  '_sizeToRecv', '_rdLinePos', '_rdLineEncoding', '_rdBufView',
+                  '_rdIntoBuf', '_rdFDsMax',
+                  '_wrBufView', '_wrChunks', '_wrChunksLen', '_corkDepth',
+                  '_socketOpened', '_connUnhandled', '_raceDelaySec', '_connLock',
+                  '_connAddrs', '_connAttempts', '_connDeadlineSec', '_aioFutures',
+                  '_aioSendFutures', '_sendHighWater', '_sendLowWater',
+                  '_sendBufFull', '_pauseReadingOf', '_readingPaused',
+                  '_onSendBufFull', '_onSendBufDrained', '_acceptedBy',
+                  '_socketOptions', '_bridge', '_protocol', '_compression' )
+
+    _IOV_MAX = 64
+
     @staticmethod
     def Create( asyncSocketsPool,
                 srvAddr,
                 connectTimeout = 5,
                 recvBufLen     = 4096,
                 sendBufLen     = 4096,
-                connectAsync   = True ) :
+                connectAsync   = True,
+                raceDelaySec   = None,
+                socketOptions  = None ) :
+        try :
+            socketOptions = XSocketOptions._get(socketOptions)
+        except Exception as ex :
+            raise XAsyncTCPClientException('Create : %s' % ex)
         try :
             size        = max(256, recvBufLen)
             recvBufSlot = XBufferSlot(size=size, keepAlloc=True)
@@ -512,39 +2014,71 @@ class XAsyncTCPClient(XAsyncSocket) :
             sendBufSlot = XBufferSlot(size=size, keepAlloc=True)
         except :
             raise XAsyncTCPClientException('Create : Out of memory?')
+        if raceDelaySec is not None and (not connectAsync or raceDelaySec < 0) :
+            raise XAsyncTCPClientException('Create : "raceDelaySec" can only be used with a positive value in asynchronous mode.')
+        if not XAsyncSocket._isUnixAddr(srvAddr) and \
+           ( not isinstance(srvAddr, (tuple, list)) or len(srvAddr) < 2 or not isinstance(srvAddr[0], str) ) :
+            raise XAsyncTCPClientException('Create : "srvAddr" is incorrect.')
+        resolver = asyncSocketsPool.DNSResolver
+        try :
+            if XAsyncSocket._isUnixAddr(srvAddr) :
+                addrs = [ (XAsyncSocket._getAddrFamily(srvAddr), srvAddr) ]
+            elif XAsyncDNSResolver.IsIPAddress(srvAddr[0]) :
+                family = socket.AF_INET6 if ':' in srvAddr[0] else socket.AF_INET
+                addrs  = [ (family, srvAddr) ]
+            elif resolver :
+                if connectAsync :
+                    # None if not in cache, the name will be resolved asynchronously,
+                    addrs = resolver.GetCached(srvAddr[0], srvAddr[1])
+                else :
+                    addrs = resolver.ResolveSync(srvAddr[0], srvAddr[1])
+            else :
+                addrs = XAsyncDNSResolver._getAddrInfo(srvAddr[0], srvAddr[1], 0)
+        except XAsyncSocketException as ex :
+            raise XAsyncTCPClientException('Create : %s' % ex)
+        if addrs is not None and not addrs :
+            return None
+        if addrs and (raceDelaySec is None or len(addrs) == 1) :
+            family = addrs[0][0]
+        else :
+            family = socket.AF_INET
         try :
-            cliSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            cliSocket = socket.socket(family, socket.SOCK_STREAM)
         except :
             raise XAsyncTCPClientException('Create : Cannot open socket (no enought memory).')
+        if socketOptions :
+            socketOptions._apply(cliSocket, isOutbound=True)
         asyncTCPCli = XAsyncTCPClient( asyncSocketsPool,
                                        cliSocket,
                                        srvAddr,
                                        None,
                                        recvBufSlot,
                                        sendBufSlot )
+        asyncTCPCli._raceDelaySec  = raceDelaySec
+        asyncTCPCli._socketOptions = socketOptions
         ok = False
         try :
-            if connectAsync and hasattr(cliSocket, 'connect_ex') :
-                errno = cliSocket.connect_ex(srvAddr)
-                if errno == 0 or errno == 36 :
-                    asyncTCPCli._setExpireTimeout(connectTimeout)
-                    ok = True
+            if addrs is None :
+                asyncTCPCli._setExpireTimeout(connectTimeout)
+                resolver._startLookup( (srvAddr[0], srvAddr[1], 0),
+                                       asyncTCPCli._onAddrResolved,
+                                       None )
+                return asyncTCPCli
+            if raceDelaySec is not None and len(addrs) > 1 :
+                asyncTCPCli._setExpireTimeout(connectTimeout)
+                if asyncTCPCli._startConnectRace(addrs) :
+                    return asyncTCPCli
+            elif connectAsync and hasattr(cliSocket, 'connect_ex') :
+                ok = asyncTCPCli._connectEx(addrs[0][1], connectTimeout)
             else :
-                try :
-                    addr = socket.getaddrinfo( srvAddr[0],
-                                               srvAddr[1],
-                                               socket.AF_INET )
-                except :
-                    addr = socket.getaddrinfo( srvAddr[0],
-                                               srvAddr[1] )
-                addr = addr[0][-1]
+                addr = addrs[0][1]
                 if connectAsync :
                     asyncTCPCli._setExpireTimeout(connectTimeout)
                 else :
                     cliSocket.settimeout(connectTimeout)
                     cliSocket.setblocking(1)
                 try :
-                    cliSocket.connect(srvAddr)
+                    cliSocket.connect(addr)
                 except OSError as ex :
                     if not connectAsync or str(ex) != '119' :
                         raise ex
@@ -562,32 +2096,155 @@ class XAsyncTCPClient(XAsyncSocket) :
 
     # ------------------------------------------------------------------------
 
+    @staticmethod
+    def CreateFromSocket( asyncSocketsPool,
+                          cliSocket,
+                          recvBufLen    = 4096,
+                          sendBufLen    = 4096,
+                          socketOptions = None ) :
+        try :
+            socketOptions = XSocketOptions._get(socketOptions)
+        except Exception as ex :
+            raise XAsyncTCPClientException('CreateFromSocket : %s' % ex)
+        try :
+            srvAddr = cliSocket.getpeername()
+            cliAddr = cliSocket.getsockname()
+        except :
+            raise XAsyncTCPClientException('CreateFromSocket : "cliSocket" must be a connected stream socket.')
+        if type(cliSocket) is not socket.socket :
+            # May be wrapped by "ssl", that must be loaded to handle its errors,
+            try :
+                _XSSL.Import()
+            except :
+                pass
+        try :
+            size        = max(256, recvBufLen)
+            recvBufSlot = XBufferSlot(size=size, keepAlloc=True)
+            size        = max(256, sendBufLen)
+            sendBufSlot = XBufferSlot(size=size, keepAlloc=True)
+        except :
+            raise XAsyncTCPClientException('CreateFromSocket : Out of memory?')
+        if socketOptions :
+            socketOptions._apply(cliSocket)
+        asyncTCPCli = XAsyncTCPClient( asyncSocketsPool,
+                                       cliSocket,
+                                       srvAddr,
+                                       cliAddr,
+                                       recvBufSlot,
+                                       sendBufSlot )
+        asyncTCPCli._socketOptions = socketOptions
+        return asyncTCPCli
+
+    # ------------------------------------------------------------------------
+
     def __init__(self, asyncSocketsPool, cliSocket, srvAddr, cliAddr, recvBufSlot, sendBufSlot) :
         try :
             super().__init__(asyncSocketsPool, cliSocket, recvBufSlot, sendBufSlot)
-            self._srvAddr          = srvAddr
-            self._cliAddr          = cliAddr if cliAddr else ('0.0.0.0', 0)
-            self._onFailsToConnect = None
-            self._onConnected      = None
-            self._onDataRecv       = None
-            self._onDataRecvArg    = None
-            self._onDataSent       = None
-            self._onDataSentArg    = None
-            self._sizeToRecv       = None
-            self._rdLinePos        = None
-            self._rdLineEncoding   = None
-            self._rdBufView        = None
-            self._wrBufView        = None
-            self._socketOpened     = (cliAddr is not None)
+            self._srvAddr       = srvAddr
+            self._acceptedBy    = None
+            self._socketOptions = None
+            self._initConnState(cliAddr)
         except :
             raise XAsyncTCPClientException('Error to creating XAsyncTCPClient, arguments are incorrects.')
 
     # ------------------------------------------------------------------------
 
+    def _initConnState(self, cliAddr) :
+        self._cliAddr          = cliAddr if cliAddr is not None else ('0.0.0.0', 0)
+        self._onFailsToConnect = None
+        self._onConnected      = None
+        self._onDataRecv       = None
+        self._onDataRecvArg    = None
+        self._onDataSent       = None
+        self._onDataSentArg    = None
+        self._sizeToRecv       = None
+        self._rdLinePos        = None
+        self._rdLineEncoding   = None
+        self._rdBufView        = None
+        self._rdIntoBuf        = None
+        self._rdFDsMax         = None
+        self._wrBufView        = None
+        self._wrChunks         = None
+        self._wrChunksLen      = 0
+        self._corkDepth        = 0
+        self._socketOpened     = (cliAddr is not None)
+        self._connUnhandled    = False
+        self._raceDelaySec     = None
+        self._connLock         = None
+        self._connAddrs        = None
+        self._connAttempts     = None
+        self._connDeadlineSec  = None
+        self._aioFutures       = None
+        self._aioSendFutures   = None
+        self._sendHighWater    = None
+        self._sendLowWater     = None
+        self._sendBufFull      = False
+        self._pauseReadingOf   = None
+        self._readingPaused    = False
+        self._onSendBufFull    = None
+        self._onSendBufDrained = None
+        self._bridge           = None
+        self._protocol         = None
+        self._compression      = None
+
+    # ------------------------------------------------------------------------
+
+    def _recycle(self, cliSocket, cliAddr) :
+        # Reuses a closed accepted client and its buffer slots for a new
+        # connection, without the checks of a new object,
+        self._initState(cliSocket)
+        self._initConnState(cliAddr)
+        cliSocket.settimeout(0)
+        cliSocket.setblocking(0)
+        self._asyncSocketsPool.AddAsyncSocket(self)
+
+    # ------------------------------------------------------------------------
+
+    def _close(self, closedReason=XClosedReason.Error, triggerOnClosed=True) :
+        if self._connLock :
+            with self._connLock :
+                attempts           = self._connAttempts
+                self._connAttempts = None
+                self._connAddrs    = None
+            for attempt in (attempts or ()) :
+                attempt._close(triggerOnClosed=False)
+        ret = super()._close(closedReason, triggerOnClosed)
+        if ret and self._sendBufFull :
+            self._sendBufFull = False
+            if self._pauseReadingOf :
+                self._pauseReadingOf.ResumeReading()
+        if ret and self._aioFutures :
+            futures          = self._aioFutures
+            self._aioFutures = None
+            for future in futures :
+                self._asyncSocketsPool._aioSetFutureResult( future,
+                                                            XAsyncTCPClientException('Connection closed (reason %s).' % closedReason),
+                                                            isException=True )
+        if ret and self._bridge :
+            self._bridge._onClientClosed(self, closedReason)
+        if ret and self._protocol :
+            self._protocol._onClientClosed(closedReason)
+        if ret and self._acceptedBy :
+            # Last, the server can recycle this object for a new connection,
+            self._acceptedBy._onClientClosed(self)
+        return ret
+
+    # ------------------------------------------------------------------------
+
+    def _releaseBufSlots(self) :
+        # Kept when the server recycles its closed clients,
+        if not self._acceptedBy or not self._acceptedBy._freeClientsMax :
+            super()._releaseBufSlots()
+
+    # ------------------------------------------------------------------------
+
     def Close(self) :
         if self._wrBufView :
             try :
-                self._socket.send(self._wrBufView)
+                if self._wrChunks :
+                    self._socket.send(b''.join([self._wrBufView] + self._wrChunks))
+                else :
+                    self._socket.send(self._wrBufView)
             except :
                 pass
         try :
@@ -598,7 +2255,237 @@ class XAsyncTCPClient(XAsyncSocket) :
 
     # ------------------------------------------------------------------------
 
+    def _getEventCallback(self, eventName) :
+        if eventName == 'OnReadyForReading' :
+            return self._onDataRecv
+        if eventName == 'OnReadyForWriting' :
+            return self._onDataSent if self._socketOpened else self._onConnected
+        return super()._getEventCallback(eventName)
+
+    # ------------------------------------------------------------------------
+
+    def _connectEx(self, addr, connectTimeout) :
+        errno = self._socket.connect_ex(addr)
+        if errno == 0 or errno == 36 or errno == EINPROGRESS :
+            self._setExpireTimeout(connectTimeout)
+            return True
+        return False
+
+    # ------------------------------------------------------------------------
+
+    def _replaceSocket(self, newSocket) :
+        newSocket.settimeout(0)
+        newSocket.setblocking(0)
+        self._asyncSocketsPool.RemoveAsyncSocket(self)
+        try :
+            self._socket.close()
+        except :
+            pass
+        self._socket = newSocket
+        self._asyncSocketsPool.AddAsyncSocket(self)
+
+    # ------------------------------------------------------------------------
+
+    def _connected(self) :
+        if hasattr(self._socket, "getsockname") :
+            self._cliAddr = self._socket.getsockname()
+        self._removeExpireTimeout()
+        self._socketOpened = True
+        if self._isRecvPending() and not self._readingPaused :
+            self._asyncSocketsPool.NotifyNextReadyForReading(self, True)
+        if self._wrBufView and not self._corkDepth :
+            # Data given to send while connecting,
+            self._asyncSocketsPool.NotifyNextReadyForWriting(self, True)
+        with self._asyncSocketsPool._callsLock :
+            onConnected = self._onConnected
+            # The event may be set just after "Create", once connected,
+            self._connUnhandled = not onConnected
+        if onConnected :
+            self._callOnConnected(onConnected)
+
+    # ------------------------------------------------------------------------
+
+    def _callOnConnected(self, onConnected) :
+        try :
+            onConnected(self)
+        except Exception as ex :
+            raise XAsyncTCPClientException('Error when handling the "OnConnected" event : %s' % ex)
+
+    # ------------------------------------------------------------------------
+
+    def _lateConnected(self, onConnected) :
+        if self._socketID is not None :
+            self._callOnConnected(onConnected)
+
+    # ------------------------------------------------------------------------
+
+    def _failsToConnect(self) :
+        self._close(XClosedReason.Error, triggerOnClosed=False)
+        if self._onFailsToConnect :
+            try :
+                self._onFailsToConnect(self)
+            except Exception as ex :
+                raise XAsyncTCPClientException('Error when handling the "OnFailsToConnect" event : %s' % ex)
+
+    # ------------------------------------------------------------------------
+
+    def _onAddrResolved(self, resolver, addrs, arg) :
+        if self._socketOpened or self._connAttempts is not None or \
+           self._socket.fileno() == -1 :
+            return
+        ok = False
+        if addrs :
+            try :
+                if self._raceDelaySec is not None and len(addrs) > 1 :
+                    if self._startConnectRace(addrs) :
+                        return
+                else :
+                    family = addrs[0][0]
+                    if getattr(self._socket, 'family', socket.AF_INET) != family :
+                        newSocket = socket.socket(family, socket.SOCK_STREAM)
+                        if self._socketOptions :
+                            self._socketOptions._apply(newSocket, isOutbound=True)
+                        self._replaceSocket(newSocket)
+                    ok = self._connectEx(addrs[0][1], None)
+            except :
+                pass
+        if ok :
+            self._asyncSocketsPool.NotifyNextReadyForWriting(self, True)
+        else :
+            self._failsToConnect()
+
+    # ------------------------------------------------------------------------
+
+    def _startConnectRace(self, addrs) :
+        # Interleaves the address families as recommended by RFC 8305,
+        families = [ ]
+        byFamily = { }
+        for family, addr in addrs :
+            if family not in byFamily :
+                families.append(family)
+                byFamily[family] = [ ]
+            byFamily[family].append( (family, addr) )
+        ordered = [ ]
+        while len(ordered) < len(addrs) :
+            for family in families :
+                if byFamily[family] :
+                    ordered.append(byFamily[family].pop(0))
+        self._connLock        = allocate_lock()
+        self._connDeadlineSec = self._expireTimeSec
+        with self._connLock :
+            self._connAddrs    = ordered
+            self._connAttempts = [ ]
+            if self._startNextAttempt() :
+                return True
+            self._connAttempts = None
+        return False
+
+    # ------------------------------------------------------------------------
+
+    def _startNextAttempt(self) :
+        # Must be called with "_connLock" acquired,
+        while self._connAddrs :
+            family, addr = self._connAddrs.pop(0)
+            try :
+                attemptSocket = socket.socket(family, socket.SOCK_STREAM)
+                if self._socketOptions :
+                    self._socketOptions._apply(attemptSocket, isOutbound=True)
+                attempt = XAsyncTCPClient( self._asyncSocketsPool,
+                                           attemptSocket,
+                                           self._srvAddr,
+                                           None,
+                                           None,
+                                           None )
+            except :
+                continue
+            attempt._onConnected      = self._onAttemptConnected
+            attempt._onFailsToConnect = self._onAttemptFailed
+            try :
+                ok = attempt._connectEx(addr, None)
+            except :
+                ok = False
+            if ok :
+                self._connAttempts.append(attempt)
+                self._asyncSocketsPool.NotifyNextReadyForWriting(attempt, True)
+                expireTimeSec = self._connDeadlineSec
+                if self._connAddrs :
+                    nextAttemptSec = perf_counter() + self._raceDelaySec
+                    if expireTimeSec is None or nextAttemptSec < expireTimeSec :
+                        expireTimeSec = nextAttemptSec
+                self._setExpireTimeSec(expireTimeSec)
+                return True
+            attempt._close(triggerOnClosed=False)
+        return False
+
+    # ------------------------------------------------------------------------
+
+    def _onAttemptConnected(self, attempt) :
+        with self._connLock :
+            if self._connAttempts is None or attempt not in self._connAttempts :
+                attempt._close(triggerOnClosed=False)
+                return
+            self._connAttempts.remove(attempt)
+            losers             = self._connAttempts
+            self._connAttempts = None
+            self._connAddrs    = None
+        for loser in losers :
+            loser._close(triggerOnClosed=False)
+        # Takes the winning socket over from the attempt,
+        self._asyncSocketsPool.RemoveAsyncSocket(attempt)
+        self._replaceSocket(attempt.GetSocketObj())
+        self._connected()
+
+    # ------------------------------------------------------------------------
+
+    def _onAttemptFailed(self, attempt) :
+        with self._connLock :
+            if self._connAttempts is None or attempt not in self._connAttempts :
+                return
+            self._connAttempts.remove(attempt)
+            if self._startNextAttempt() or self._connAttempts :
+                return
+            self._connAttempts = None
+        self._failsToConnect()
+
+    # ------------------------------------------------------------------------
+
+    def OnExpireTimeout(self) :
+        if self._connLock and not self._socketOpened :
+            failed = False
+            with self._connLock :
+                if self._connAttempts is not None and \
+                   ( self._connDeadlineSec is None or perf_counter() < self._connDeadlineSec ) :
+                    if not self._startNextAttempt() :
+                        if self._connAttempts :
+                            self._setExpireTimeSec(self._connDeadlineSec)
+                        else :
+                            self._connAttempts = None
+                            failed             = True
+                    if not failed :
+                        return
+            if failed :
+                self._failsToConnect()
+                return
+        super().OnExpireTimeout()
+
+    # ------------------------------------------------------------------------
+
     def OnReadyForReading(self) :
+        if not self._socketOpened :
+            # Not yet connected (or waiting for the name resolution), the
+            # reading is armed again by "_connected",
+            self._asyncSocketsPool.NotifyNextReadyForReading(self, False)
+            return
+        if self._readingPaused :
+            # Ready in a wait started before "PauseReading",
+            self._asyncSocketsPool.NotifyNextReadyForReading(self, False)
+            return
+        if self._bridge :
+            self._bridge._onReadable(self)
+            return
+        if self._protocol :
+            self._recvToProtocol()
+            return
         while True :
             if self._rdLinePos is not None :
                 # In the context of reading a line,
@@ -606,12 +2493,12 @@ class XAsyncTCPClient(XAsyncSocket) :
                     try :
                         try :
                             b = self._socket.recv(1)
-                        except ssl.SSLError as sslErr :
-                            if sslErr.args[0] != ssl.SSL_ERROR_WANT_READ :
+                        except _XSSL.SSLError as sslErr :
+                            if sslErr.args[0] != _XSSL.Module.SSL_ERROR_WANT_READ :
                                 self._close()
                             return
                         except BlockingIOError as bioErr :
-                            if bioErr.errno != 35 :
+                            if bioErr.errno != 35 and bioErr.errno != EAGAIN :
                                 self._close()
                             return
                         except :
@@ -621,9 +2508,14 @@ class XAsyncTCPClient(XAsyncSocket) :
                         self._close()
                         return
                     if b :
+                        self._bytesRecv += 1
                         if b == b'\n' :
                             lineLen = self._rdLinePos 
                             self._rdLinePos = None
+                            self._msgsRecv += 1
+                            if self._asyncSocketsPool._trace :
+                                self._asyncSocketsPool._trace._record( perf_counter(), self._socket.fileno(),
+                                                                       XAsyncTrace.RECV, lineLen + 1, 0.0 )
                             self._asyncSocketsPool.NotifyNextReadyForReading(self, False)
                             self._removeExpireTimeout()
                             if self._onDataRecv :
@@ -655,15 +2547,18 @@ class XAsyncTCPClient(XAsyncSocket) :
             elif self._sizeToRecv :
                 # In the context of reading data,
                 recvBuf = self._rdBufView[-self._sizeToRecv:]
+                trace   = self._asyncSocketsPool._trace
+                if trace :
+                    startSec = perf_counter()
                 try :
                     try :
                         n = self._socket.recv_into(recvBuf)
-                    except ssl.SSLError as sslErr :
-                        if sslErr.args[0] != ssl.SSL_ERROR_WANT_READ :
+                    except _XSSL.SSLError as sslErr :
+                        if sslErr.args[0] != _XSSL.Module.SSL_ERROR_WANT_READ :
                             self._close()
                         return
                     except BlockingIOError as bioErr :
-                        if bioErr.errno != 35 :
+                        if bioErr.errno != 35 and bioErr.errno != EAGAIN :
                             self._close()
                         return
                     except :
@@ -678,10 +2573,19 @@ class XAsyncTCPClient(XAsyncSocket) :
                 if not n :
                     self._close(XClosedReason.ClosedByPeer)
                     return
+                if trace :
+                    trace._record( startSec, self._socket.fileno(),
+                                   XAsyncTrace.RECV, n, perf_counter() - startSec )
+                self._bytesRecv  += n
                 self._sizeToRecv -= n
                 if not self._sizeToRecv :
-                    data = self._rdBufView
+                    if self._rdIntoBuf is not None :
+                        data            = self._rdIntoBuf
+                        self._rdIntoBuf = None
+                    else :
+                        data = self._rdBufView
                     self._rdBufView = None
+                    self._msgsRecv += 1
                     self._asyncSocketsPool.NotifyNextReadyForReading(self, False)
                     self._removeExpireTimeout()
                     if self._onDataRecv :
@@ -691,6 +2595,37 @@ class XAsyncTCPClient(XAsyncSocket) :
                             raise XAsyncTCPClientException('Error when handling the "OnDataRecv" event : %s' % ex)
                     if not self.IsSSL or self._socket.pending() == 0 :
                         return
+            elif self._rdFDsMax :
+                # In the context of receiving file descriptors,
+                try :
+                    b, ancData, flags, addr = self._socket.recvmsg( 1, socket.CMSG_SPACE( self._rdFDsMax * \
+                                                                                         struct.calcsize('i') ) )
+                except BlockingIOError as bioErr :
+                    if bioErr.errno != 35 and bioErr.errno != EAGAIN :
+                        self._close()
+                    return
+                except :
+                    self._close()
+                    return
+                if not b :
+                    self._close(XClosedReason.ClosedByPeer)
+                    return
+                fds = [ ]
+                for cmsgLevel, cmsgType, cmsgData in ancData :
+                    if cmsgLevel == socket.SOL_SOCKET and cmsgType == socket.SCM_RIGHTS :
+                        count = len(cmsgData) // struct.calcsize('i')
+                        fds.extend(struct.unpack('%di' % count, cmsgData[:count * struct.calcsize('i')]))
+                self._rdFDsMax   = None
+                self._bytesRecv += 1
+                self._msgsRecv  += 1
+                self._asyncSocketsPool.NotifyNextReadyForReading(self, False)
+                self._removeExpireTimeout()
+                if self._onDataRecv :
+                    try :
+                        self._onDataRecv(self, fds, self._onDataRecvArg)
+                    except Exception as ex :
+                        raise XAsyncTCPClientException('Error when handling the "OnDataRecv" event : %s' % ex)
+                return
             else :
                 self._close(XClosedReason.ClosedByHost)
                 return True
@@ -701,33 +2636,41 @@ class XAsyncTCPClient(XAsyncSocket) :
         if not self._socketOpened :
             if hasattr(self._socket, "getsockopt") :
                 if self._socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) :
-                    self._close(XClosedReason.Error, triggerOnClosed=False)
-                    if self._onFailsToConnect :
-                        try :
-                            self._onFailsToConnect(self)
-                        except Exception as ex :
-                            raise XAsyncTCPClientException('Error when handling the "OnFailsToConnect" event : %s' % ex)
+                    self._failsToConnect()
                     return
-                self._cliAddr = self._socket.getsockname()
-                self._removeExpireTimeout()
-            self._socketOpened = True
-            if self._onConnected :
-                try :
-                    self._onConnected(self)
-                except Exception as ex :
-                    raise XAsyncTCPClientException('Error when handling the "OnConnected" event : %s' % ex)
+            self._connected()
             return
         if self._wrBufView :
+            trace = self._asyncSocketsPool._trace
+            if trace :
+                startSec = perf_counter()
             try :
-                n = self._socket.send(self._wrBufView)
+                if not self._wrChunks :
+                    n = self._socket.send(self._wrBufView)
+                elif self._canGatherWrite() :
+                    # Gather-write of the pending chunks without copying them,
+                    n = self._socket.sendmsg( [self._wrBufView] + \
+                                              self._wrChunks[:XAsyncTCPClient._IOV_MAX - 1] )
+                else :
+                    # Pending chunks are joined to be sent in one piece,
+                    self._wrBufView   = memoryview(b''.join([self._wrBufView] + self._wrChunks))
+                    self._wrChunks    = None
+                    self._wrChunksLen = 0
+                    n = self._socket.send(self._wrBufView)
             except Exception as ex :
-                if hasattr(ssl, 'SSLEOFError') and isinstance(ex, ssl.SSLEOFError) :
+                if isinstance(ex, _XSSL.SSLEOFError) :
                     self._close()
                     return True
                 else :
                     self._asyncSocketsPool.NotifyNextReadyForWriting(self, True)
                     return
-            self._wrBufView = self._wrBufView[n:]
+            if trace :
+                trace._record( startSec, self._socket.fileno(),
+                               XAsyncTrace.SEND, n, perf_counter() - startSec )
+            self._bytesSent += n
+            self._consumeSent(n)
+            if self._sendBufFull and self.SendBufferedLen <= self._sendLowWater :
+                self._sendBufDrained()
             if self._wrBufView :
                 self._asyncSocketsPool.NotifyNextReadyForWriting(self, True)
             elif self._onDataSent :
@@ -735,11 +2678,14 @@ class XAsyncTCPClient(XAsyncSocket) :
                     self._onDataSent(self, self._onDataSentArg)
                 except Exception as ex :
                     raise XAsyncTCPClientException('Error when handling the "OnDataSent" event : %s' % ex)
+        if self._bridge and not self._wrBufView :
+            # Bridged data is written after the data sent before,
+            self._bridge._onWritable(self)
 
     # ------------------------------------------------------------------------
 
     def AsyncRecvLine(self, lineEncoding='UTF-8', onLineRecv=None, onLineRecvArg=None, timeoutSec=None) :
-        if self._rdLinePos is not None or self._sizeToRecv :
+        if self._isRecvPending() :
             raise XAsyncTCPClientException('AsyncRecvLine : Already waiting asynchronous receive.')
         if self._socket :
             self._setExpireTimeout(timeoutSec)
@@ -747,14 +2693,15 @@ class XAsyncTCPClient(XAsyncSocket) :
             self._rdLineEncoding = lineEncoding
             self._onDataRecv     = onLineRecv
             self._onDataRecvArg  = onLineRecvArg
-            self._asyncSocketsPool.NotifyNextReadyForReading(self, True)
+            if not self._readingPaused :
+                self._asyncSocketsPool.NotifyNextReadyForReading(self, True)
             return True
         return False
 
     # ------------------------------------------------------------------------
 
     def AsyncRecvData(self, size=None, onDataRecv=None, onDataRecvArg=None, timeoutSec=None) :
-        if self._rdLinePos is not None or self._sizeToRecv :
+        if self._isRecvPending() :
             raise XAsyncTCPClientException('AsyncRecvData : Already waiting asynchronous receive.')
         if self._socket :
             if size is None :
@@ -772,7 +2719,37 @@ class XAsyncTCPClient(XAsyncSocket) :
             self._sizeToRecv    = size
             self._onDataRecv    = onDataRecv
             self._onDataRecvArg = onDataRecvArg
-            self._asyncSocketsPool.NotifyNextReadyForReading(self, True)
+            if not self._readingPaused :
+                self._asyncSocketsPool.NotifyNextReadyForReading(self, True)
+            return True
+        return False
+
+    # ------------------------------------------------------------------------
+
+    def AsyncRecvInto(self, buffer, onDataRecv=None, onDataRecvArg=None, timeoutSec=None) :
+        if self._isRecvPending() :
+            raise XAsyncTCPClientException('AsyncRecvInto : Already waiting asynchronous receive.')
+        try :
+            bufView = memoryview(buffer)
+            if getattr(bufView, 'readonly', False) or not getattr(bufView, 'c_contiguous', True) :
+                raise Exception()
+            if getattr(bufView, 'format', 'B') != 'B' or getattr(bufView, 'ndim', 1) != 1 :
+                # Items of several bytes or several dimensions (array, NumPy, ...)
+                # are filled as contiguous bytes,
+                bufView = bufView.cast('B')
+        except :
+            raise XAsyncTCPClientException('AsyncRecvInto : "buffer" must be a writable and contiguous buffer.')
+        if not len(bufView) :
+            raise XAsyncTCPClientException('AsyncRecvInto : "buffer" is empty.')
+        if self._socket :
+            self._setExpireTimeout(timeoutSec)
+            self._rdBufView     = bufView
+            self._rdIntoBuf     = buffer
+            self._sizeToRecv    = len(bufView)
+            self._onDataRecv    = onDataRecv
+            self._onDataRecvArg = onDataRecvArg
+            if not self._readingPaused :
+                self._asyncSocketsPool.NotifyNextReadyForReading(self, True)
             return True
         return False
 
@@ -780,16 +2757,31 @@ class XAsyncTCPClient(XAsyncSocket) :
 
     def AsyncSendData(self, data, onDataSent=None, onDataSentArg=None) :
         if self._socket :
+            if self._compression :
+                data = self._compression._encode(data)
             try :
                 if bytes([data[0]]) :
                     if self._wrBufView :
-                        self._wrBufView = memoryview(bytes(self._wrBufView) + data)
+                        # Queued without concatenation, copied only if mutable,
+                        chunk = memoryview(data if isinstance(data, bytes) else bytes(data))
+                        if self._wrChunks is None :
+                            # Allocated only once data is really pending,
+                            self._wrChunks = [ ]
+                        self._wrChunks.append(chunk)
+                        self._wrChunksLen += len(chunk)
                     else :
                         self._wrBufView = memoryview(data)
                     self._onDataSent    = onDataSent
                     self._onDataSentArg = onDataSentArg
-                    self._asyncSocketsPool.NotifyNextReadyForWriting(self, True)
+                    self._msgsSent     += 1
+                    if not self._corkDepth :
+                        self._asyncSocketsPool._requestWriting(self)
+                    if self._sendHighWater is not None and not self._sendBufFull and \
+                       self.SendBufferedLen >= self._sendHighWater :
+                        self._sendBufFilled()
                     return True
+            except XAsyncTCPClientException :
+                raise
             except :
                 pass
             raise XAsyncTCPClientException('AsyncSendData : "data" is incorrect.')
@@ -804,26 +2796,434 @@ class XAsyncTCPClient(XAsyncSocket) :
             if size is None :
                 size = self._sendBufSlot.Size
             if size > 0 and size <= self._sendBufSlot.Size :
+                if self._compression :
+                    return self.AsyncSendData( memoryview(self._sendBufSlot.Buffer)[:size],
+                                               onDataSent,
+                                               onDataSentArg )
                 self._wrBufView     = memoryview(self._sendBufSlot.Buffer)[:size]
                 self._onDataSent    = onDataSent
                 self._onDataSentArg = onDataSentArg
-                self._asyncSocketsPool.NotifyNextReadyForWriting(self, True)
+                self._msgsSent     += 1
+                if not self._corkDepth :
+                    self._asyncSocketsPool._requestWriting(self)
+                return True
+        return False
+
+    # ------------------------------------------------------------------------
+
+    def _isRecvPending(self) :
+        return ( self._rdLinePos is not None or \
+                 self._sizeToRecv            or \
+                 self._rdFDsMax is not None  or \
+                 self._bridge is not None    or \
+                 self._protocol is not None )
+
+    # ------------------------------------------------------------------------
+
+    def _isUnixSocket(self) :
+        return ( hasattr(socket, 'SCM_RIGHTS') and \
+                 getattr(self._socket, 'family', None) == socket.AF_UNIX and \
+                 not self.IsSSL )
+
+    # ------------------------------------------------------------------------
+
+    def AsyncRecvFDs(self, maxFDs=1, onFDsRecv=None, onFDsRecvArg=None, timeoutSec=None) :
+        if not self._isUnixSocket() :
+            raise XAsyncTCPClientException('AsyncRecvFDs : Only available on Unix domain sockets.')
+        if self._isRecvPending() :
+            raise XAsyncTCPClientException('AsyncRecvFDs : Already waiting asynchronous receive.')
+        if not isinstance(maxFDs, int) or maxFDs <= 0 :
+            raise XAsyncTCPClientException('AsyncRecvFDs : "maxFDs" is incorrect.')
+        if self._socket :
+            self._setExpireTimeout(timeoutSec)
+            self._rdFDsMax      = maxFDs
+            self._onDataRecv    = onFDsRecv
+            self._onDataRecvArg = onFDsRecvArg
+            if not self._readingPaused :
+                self._asyncSocketsPool.NotifyNextReadyForReading(self, True)
+            return True
+        return False
+
+    # ------------------------------------------------------------------------
+
+    def SendFDs(self, fds) :
+        if not self._isUnixSocket() :
+            raise XAsyncTCPClientException('SendFDs : Only available on Unix domain sockets.')
+        if self._wrBufView :
+            raise XAsyncTCPClientException('SendFDs : Data are already waiting to be sent.')
+        if self._compression :
+            raise XAsyncTCPClientException('SendFDs : Not available with compression.')
+        try :
+            fdsData = struct.pack('%di' % len(fds), *fds)
+            if not fdsData :
+                raise Exception()
+        except :
+            raise XAsyncTCPClientException('SendFDs : "fds" is incorrect.')
+        if self._socket and self._socketOpened :
+            # The descriptors are attached to a single byte of the stream,
+            # nothing is queued, on a full send buffer the caller retries,
+            try :
+                n = self._socket.sendmsg( [b'\x00'],
+                                          [ (socket.SOL_SOCKET, socket.SCM_RIGHTS, fdsData) ] )
+            except :
+                return False
+            if n == 1 :
+                self._bytesSent += 1
+                self._msgsSent  += 1
                 return True
         return False
 
     # ------------------------------------------------------------------------
 
+    def BridgeTo(self, xAsyncTCPClient, zeroCopy=True) :
+        if not isinstance(xAsyncTCPClient, XAsyncTCPClient) or xAsyncTCPClient is self :
+            raise XAsyncTCPClientException('BridgeTo : "xAsyncTCPClient" is incorrect.')
+        for cli in (self, xAsyncTCPClient) :
+            if cli._bridge :
+                raise XAsyncTCPClientException('BridgeTo : Already bridged.')
+            if cli._isRecvPending() :
+                raise XAsyncTCPClientException('BridgeTo : Already waiting asynchronous receive.')
+            if not cli._socketOpened or cli._socketID is None :
+                raise XAsyncTCPClientException('BridgeTo : Not connected.')
+        bridge = XTCPBridge(self, xAsyncTCPClient, zeroCopy)
+        self._bridge            = bridge
+        xAsyncTCPClient._bridge = bridge
+        for cli in (self, xAsyncTCPClient) :
+            cli._asyncSocketsPool.NotifyNextReadyForReading(cli, True)
+        return bridge
+
+    # ------------------------------------------------------------------------
+
+    def _recvToProtocol(self) :
+        # Bulk reads in the receive slot, parsed by the protocol layer,
+        recvBuf = memoryview(self._recvBufSlot.Buffer)
+        while self._protocol and not self._readingPaused :
+            trace = self._asyncSocketsPool._trace
+            if trace :
+                startSec = perf_counter()
+            try :
+                try :
+                    n = self._socket.recv_into(recvBuf)
+                except _XSSL.SSLError as sslErr :
+                    if sslErr.args[0] != _XSSL.Module.SSL_ERROR_WANT_READ :
+                        self._close()
+                    return
+                except BlockingIOError as bioErr :
+                    if bioErr.errno != 35 and bioErr.errno != EAGAIN :
+                        self._close()
+                    return
+                except :
+                    self._close()
+                    return
+            except :
+                try :
+                    n = self._socket.readinto(recvBuf)
+                except :
+                    self._close()
+                    return
+            if not n :
+                self._close(XClosedReason.ClosedByPeer)
+                return
+            if trace :
+                trace._record( startSec, self._socket.fileno(),
+                               XAsyncTrace.RECV, n, perf_counter() - startSec )
+            self._bytesRecv += n
+            self._protocol._onDataRecv(recvBuf[:n])
+            if self._socketID is None or not self.IsSSL or self._socket.pending() == 0 :
+                return
+
+    # ------------------------------------------------------------------------
+
+    def _startProtocol(self, protocol, methodName) :
+        if self._bridge :
+            raise XAsyncTCPClientException('%s : Already bridged.' % methodName)
+        if self._isRecvPending() :
+            raise XAsyncTCPClientException('%s : Already waiting asynchronous receive.' % methodName)
+        if not self._socketOpened or self._socketID is None :
+            raise XAsyncTCPClientException('%s : Not connected.' % methodName)
+        self._protocol = protocol
+        if not self._readingPaused :
+            self._asyncSocketsPool.NotifyNextReadyForReading(self, True)
+
+    # ------------------------------------------------------------------------
+
+    def StartHTTP( self,
+                   onRequest,
+                   onRequestArg  = None,
+                   maxHeadSize   = 8192,
+                   maxBodySize   = 1048576,
+                   keepAliveSec  = 15,
+                   maxPipelined  = 16 ) :
+        if not callable(onRequest) :
+            raise XAsyncTCPClientException('StartHTTP : "onRequest" is incorrect.')
+        for name, value in ( ('maxHeadSize',  maxHeadSize),
+                             ('maxBodySize',  maxBodySize),
+                             ('maxPipelined', maxPipelined) ) :
+            if not isinstance(value, int) or value <= 0 :
+                raise XAsyncTCPClientException('StartHTTP : "%s" is incorrect.' % name)
+        if keepAliveSec is not None and ( not isinstance(keepAliveSec, (int, float)) or keepAliveSec <= 0 ) :
+            raise XAsyncTCPClientException('StartHTTP : "keepAliveSec" is incorrect.')
+        httpConn = XHTTPConnection( self, onRequest, onRequestArg,
+                                    maxHeadSize, maxBodySize, keepAliveSec, maxPipelined )
+        self._startProtocol(httpConn, 'StartHTTP')
+        httpConn._waitRequest()
+        return httpConn
+
+    # ------------------------------------------------------------------------
+
+    def StartCompression( self,
+                          onDataRecv,
+                          onDataRecvArg   = None,
+                          minSize         = 256,
+                          compressionPool = None ) :
+        if not callable(onDataRecv) :
+            raise XAsyncTCPClientException('StartCompression : "onDataRecv" is incorrect.')
+        if not isinstance(minSize, int) or minSize < 0 :
+            raise XAsyncTCPClientException('StartCompression : "minSize" is incorrect.')
+        if compressionPool is None :
+            compressionPool = XCompressionPool.GetDefault()
+        elif not isinstance(compressionPool, XCompressionPool) :
+            raise XAsyncTCPClientException('StartCompression : "compressionPool" is incorrect.')
+        stage = XCompressionStage(self, onDataRecv, onDataRecvArg, minSize, compressionPool)
+        self._startProtocol(stage, 'StartCompression')
+        self._compression = stage
+        return stage
+
+    # ------------------------------------------------------------------------
+
+    def _canGatherWrite(self) :
+        return hasattr(self._socket, 'sendmsg') and not self.IsSSL
+
+    # ------------------------------------------------------------------------
+
+    def _consumeSent(self, n) :
+        wrBufView = self._wrBufView
+        while n >= len(wrBufView) and self._wrChunks :
+            n         -= len(wrBufView)
+            wrBufView  = self._wrChunks.pop(0)
+            self._wrChunksLen -= len(wrBufView)
+        self._wrBufView = wrBufView[n:]
+
+    # ------------------------------------------------------------------------
+
+    def _flushSending(self) :
+        if self._socket and self._wrBufView and not self._corkDepth :
+            if not self._socketOpened or \
+               self._asyncSocketsPool._isWatched(self._socket, XAsyncSocketsPool._FLAG_WRITE) :
+                # Will be written when the socket is ready,
+                return
+            self.OnReadyForWriting()
+
+    # ------------------------------------------------------------------------
+
+    def _setCorkOption(self, value) :
+        opt = getattr(socket, 'TCP_CORK', None) or getattr(socket, 'TCP_NOPUSH', None)
+        if opt :
+            try :
+                self._socket.setsockopt(getattr(socket, 'IPPROTO_TCP', 6), opt, value)
+            except :
+                pass
+
+    # ------------------------------------------------------------------------
+
+    def Cork(self) :
+        self._corkDepth += 1
+        if self._corkDepth == 1 :
+            self._setCorkOption(1)
+
+    # ------------------------------------------------------------------------
+
+    def Uncork(self) :
+        if self._corkDepth :
+            self._corkDepth -= 1
+            if not self._corkDepth :
+                self._setCorkOption(0)
+                if self._socket and self._wrBufView :
+                    self._asyncSocketsPool._requestWriting(self)
+
+    # ------------------------------------------------------------------------
+
+    def _sendBufFilled(self) :
+        self._sendBufFull = True
+        if self._pauseReadingOf :
+            self._pauseReadingOf.PauseReading()
+        if self._onSendBufFull :
+            try :
+                self._onSendBufFull(self)
+            except Exception as ex :
+                raise XAsyncTCPClientException('Error when handling the "OnSendBufferFull" event : %s' % ex)
+
+    # ------------------------------------------------------------------------
+
+    def _sendBufDrained(self) :
+        self._sendBufFull = False
+        if self._pauseReadingOf :
+            self._pauseReadingOf.ResumeReading()
+        if self._onSendBufDrained :
+            try :
+                self._onSendBufDrained(self)
+            except Exception as ex :
+                raise XAsyncTCPClientException('Error when handling the "OnSendBufferDrained" event : %s' % ex)
+
+    # ------------------------------------------------------------------------
+
+    def SetSendBufferWatermarks(self, highWater, lowWater=None, pauseReadingOf=None) :
+        if highWater is None :
+            self._sendHighWater  = None
+            self._sendLowWater   = None
+            if self._sendBufFull :
+                self._sendBufDrained()
+            self._pauseReadingOf = None
+            return
+        if not isinstance(highWater, int) or highWater <= 0 :
+            raise XAsyncTCPClientException('SetSendBufferWatermarks : "highWater" is incorrect.')
+        if lowWater is None :
+            lowWater = highWater // 2
+        elif not isinstance(lowWater, int) or lowWater < 0 or lowWater >= highWater :
+            raise XAsyncTCPClientException('SetSendBufferWatermarks : "lowWater" is incorrect.')
+        if pauseReadingOf is not None and not isinstance(pauseReadingOf, XAsyncTCPClient) :
+            raise XAsyncTCPClientException('SetSendBufferWatermarks : "pauseReadingOf" must be a XAsyncTCPClient.')
+        self._sendHighWater  = highWater
+        self._sendLowWater   = lowWater
+        self._pauseReadingOf = pauseReadingOf
+
+    # ------------------------------------------------------------------------
+
+    def PauseReading(self) :
+        if not self._readingPaused :
+            self._readingPaused = True
+            self._asyncSocketsPool.NotifyNextReadyForReading(self, False)
+
+    # ------------------------------------------------------------------------
+
+    def ResumeReading(self) :
+        if self._readingPaused :
+            self._readingPaused = False
+            if self._socket and self._isRecvPending() :
+                self._asyncSocketsPool.NotifyNextReadyForReading(self, True)
+
+    # ------------------------------------------------------------------------
+
+    def _aioCreateFuture(self) :
+        future = self._asyncSocketsPool._aioCreateFuture()
+        if self._aioFutures is None :
+            self._aioFutures = [ ]
+        self._aioFutures.append(future)
+        return future
+
+    # ------------------------------------------------------------------------
+
+    def _aioSetFutureResult(self, future, result, isException=False) :
+        self._aioDropFuture(future)
+        self._asyncSocketsPool._aioSetFutureResult(future, result, isException)
+
+    # ------------------------------------------------------------------------
+
+    def _aioDropFuture(self, future) :
+        try :
+            self._aioFutures.remove(future)
+        except :
+            pass
+
+    # ------------------------------------------------------------------------
+
+    def _aioOnDataRecv(self, xAsyncTCPClient, data, future) :
+        self._aioSetFutureResult(future, data)
+
+    # ------------------------------------------------------------------------
+
+    def _aioOnDataRecvCopy(self, xAsyncTCPClient, data, future) :
+        # The received data is a view of the receiving buffer, reused by the
+        # next receive, whereas the future result is used later,
+        self._aioSetFutureResult(future, bytes(data))
+
+    # ------------------------------------------------------------------------
+
+    def _aioOnDataSent(self, xAsyncTCPClient, arg) :
+        futures              = self._aioSendFutures
+        self._aioSendFutures = None
+        for future in (futures or ()) :
+            self._aioSetFutureResult(future, None)
+
+    # ------------------------------------------------------------------------
+
+    def _aioDropSendFuture(self, future) :
+        try :
+            self._aioSendFutures.remove(future)
+        except :
+            pass
+
+    # ------------------------------------------------------------------------
+
+    def _aioRecv(self, name, asyncRecv, recvArg, timeoutSec, onDataRecv=None) :
+        future = self._aioCreateFuture()
+        try :
+            ok = asyncRecv(recvArg, onDataRecv or self._aioOnDataRecv, future, timeoutSec)
+        except :
+            self._aioDropFuture(future)
+            raise
+        if not ok or self._socketID is None :
+            # Never completed by a receive, nor by the closing if the socket
+            # is already closed,
+            self._aioSetFutureResult( future,
+                                      XAsyncTCPClientException('%s : Not connected.' % name),
+                                      isException=True )
+        return future
+
+    # ------------------------------------------------------------------------
+
+    def RecvLine(self, lineEncoding='UTF-8', timeoutSec=None) :
+        return self._aioRecv('RecvLine', self.AsyncRecvLine, lineEncoding, timeoutSec)
+
+    # ------------------------------------------------------------------------
+
+    def RecvData(self, size=None, timeoutSec=None) :
+        return self._aioRecv('RecvData', self.AsyncRecvData, size, timeoutSec, self._aioOnDataRecvCopy)
+
+    # ------------------------------------------------------------------------
+
+    def RecvFDs(self, maxFDs=1, timeoutSec=None) :
+        return self._aioRecv('RecvFDs', self.AsyncRecvFDs, maxFDs, timeoutSec)
+
+    # ------------------------------------------------------------------------
+
+    def RecvInto(self, buffer, timeoutSec=None) :
+        return self._aioRecv('RecvInto', self.AsyncRecvInto, buffer, timeoutSec)
+
+    # ------------------------------------------------------------------------
+
+    def SendData(self, data) :
+        future = self._aioCreateFuture()
+        # All futures are completed when the sending buffer is fully sent,
+        if self._aioSendFutures is None :
+            self._aioSendFutures = [ ]
+        self._aioSendFutures.append(future)
+        try :
+            ok = self.AsyncSendData(data, self._aioOnDataSent)
+        except :
+            self._aioDropSendFuture(future)
+            self._aioDropFuture(future)
+            raise
+        if not ok or self._socketID is None :
+            self._aioDropSendFuture(future)
+            self._aioSetFutureResult( future,
+                                      XAsyncTCPClientException('SendData : Not connected.'),
+                                      isException=True )
+        return future
+
+    # ------------------------------------------------------------------------
+
     def _doSSLHandshake(self) :
         count = 0
         while count < 10 :
             try :
                 self._socket.do_handshake()
                 break
-            except ssl.SSLError as sslErr :
+            except _XSSL.SSLError as sslErr :
                 count += 1
-                if sslErr.args[0] == ssl.SSL_ERROR_WANT_READ :
+                if sslErr.args[0] == _XSSL.Module.SSL_ERROR_WANT_READ :
                     select([self._socket], [], [], 1)
-                elif sslErr.args[0] == ssl.SSL_ERROR_WANT_WRITE :
+                elif sslErr.args[0] == _XSSL.Module.SSL_ERROR_WANT_WRITE :
                     select([], [self._socket], [], 1)
                 else :
                     raise XAsyncTCPClientException('SSL : Bad handshake : %s' % sslErr)
@@ -840,6 +3240,10 @@ class XAsyncTCPClient(XAsyncSocket) :
                   server_side = False,
                   cert_reqs   = 0,
                   ca_certs    = None ) :
+        try :
+            ssl = _XSSL.Import()
+        except :
+            ssl = None
         if not hasattr(ssl, 'SSLContext') :
             raise XAsyncTCPClientException('StartSSL : This SSL implementation is not supported.')
         if self.IsSSL :
@@ -862,58 +3266,1612 @@ class XAsyncTCPClient(XAsyncSocket) :
 
     # ------------------------------------------------------------------------
 
-    def StartSSLContext(self, sslContext, serverSide=False) :
-        if not hasattr(ssl, 'SSLContext') :
-            raise XAsyncTCPClientException('StartSSLContext : This SSL implementation is not supported.')
-        if not isinstance(sslContext, ssl.SSLContext) :
-            raise XAsyncTCPClientException('StartSSLContext : "sslContext" is incorrect.')
-        if self.IsSSL :
-            raise XAsyncTCPClientException('StartSSLContext : SSL already started.')
-        try :
-            self._asyncSocketsPool.NotifyNextReadyForWriting(self, False)
-            self._asyncSocketsPool.NotifyNextReadyForReading(self, False)
-            self._asyncSocketsPool.RemoveAsyncSocket(self)
-            self._socket = sslContext.wrap_socket( self._socket,
-                                                   server_side             = serverSide,
-                                                   do_handshake_on_connect = False )
-            self._asyncSocketsPool.AddAsyncSocket(self)
-        except Exception as ex :
-            raise XAsyncTCPClientException('StartSSLContext : %s' % ex)
-        self._doSSLHandshake()
+    def StartSSLContext(self, sslContext, serverSide=False) :
+        try :
+            ssl = _XSSL.Import()
+        except :
+            ssl = None
+        if not hasattr(ssl, 'SSLContext') :
+            raise XAsyncTCPClientException('StartSSLContext : This SSL implementation is not supported.')
+        if not isinstance(sslContext, ssl.SSLContext) :
+            raise XAsyncTCPClientException('StartSSLContext : "sslContext" is incorrect.')
+        if self.IsSSL :
+            raise XAsyncTCPClientException('StartSSLContext : SSL already started.')
+        try :
+            self._asyncSocketsPool.NotifyNextReadyForWriting(self, False)
+            self._asyncSocketsPool.NotifyNextReadyForReading(self, False)
+            self._asyncSocketsPool.RemoveAsyncSocket(self)
+            self._socket = sslContext.wrap_socket( self._socket,
+                                                   server_side             = serverSide,
+                                                   do_handshake_on_connect = False )
+            self._asyncSocketsPool.AddAsyncSocket(self)
+        except Exception as ex :
+            raise XAsyncTCPClientException('StartSSLContext : %s' % ex)
+        self._doSSLHandshake()
+
+    # ------------------------------------------------------------------------
+
+    @property
+    def SrvAddr(self) :
+        return self._srvAddr
+
+    @property
+    def CliAddr(self) :
+        return self._cliAddr
+
+    @property
+    def IsSSL(self) :
+        return _XSSL.IsSSLSocket(self._socket)
+
+    @property
+    def SendingBuffer(self) :
+        return self._sendBufSlot.Buffer
+
+    @property
+    def SocketOptions(self) :
+        return self._socketOptions
+
+    @property
+    def SendBufferedLen(self) :
+        wrBufView = self._wrBufView
+        return (len(wrBufView) + self._wrChunksLen) if wrBufView else 0
+
+    @property
+    def IsCorked(self) :
+        return (self._corkDepth > 0)
+
+    @property
+    def IsSendBufferFull(self) :
+        return self._sendBufFull
+
+    @property
+    def IsReadingPaused(self) :
+        return self._readingPaused
+
+    @property
+    def Bridge(self) :
+        return self._bridge
+
+    @property
+    def Protocol(self) :
+        return self._protocol
+
+    @property
+    def Compression(self) :
+        return self._compression
+
+    @property
+    def OnSendBufferFull(self) :
+        return self._onSendBufFull
+    @OnSendBufferFull.setter
+    def OnSendBufferFull(self, value) :
+        self._onSendBufFull = value
+
+    @property
+    def OnSendBufferDrained(self) :
+        return self._onSendBufDrained
+    @OnSendBufferDrained.setter
+    def OnSendBufferDrained(self, value) :
+        self._onSendBufDrained = value
+
+    @property
+    def OnFailsToConnect(self) :
+        return self._onFailsToConnect
+    @OnFailsToConnect.setter
+    def OnFailsToConnect(self, value) :
+        self._onFailsToConnect = value
+
+    @property
+    def OnConnected(self) :
+        return self._onConnected
+    @OnConnected.setter
+    def OnConnected(self, value) :
+        with self._asyncSocketsPool._callsLock :
+            self._onConnected = value
+            late = bool(value) and self._connUnhandled
+            if late :
+                self._connUnhandled = False
+        if late :
+            # Connected before the event was set, it is called from the pool,
+            self._asyncSocketsPool.CallSoon(self._lateConnected, value)
+
+# ============================================================================
+# ===( XTCPBridge )===========================================================
+# ============================================================================
+
+class _XTCPBridgeWay :
+
+    # Data of one direction : read from "_src" and written to "_dst", through
+    # a pipe with "splice" (the bytes stay in the kernel) or through the
+    # receive buffer of "_src". "_start" and "_end" are the positions of the
+    # pending bytes, reading stops when "_end" reaches "_size" and resumes
+    # when the pending bytes fall back to "_lowWater",
+
+    __slots__ = ( '_src', '_dst', '_lock', '_pipe', '_buf', '_size', '_lowWater',
+                  '_start', '_end', '_paused', '_eof', '_done', '_bytes' )
+
+    _PIPE_SIZE  = 65536
+    _MAX_ROUNDS = 16
+
+    def __init__(self, src, dst, zeroCopy) :
+        self._src      = src
+        self._dst      = dst
+        self._lock     = allocate_lock()
+        self._pipe     = None
+        self._buf      = None
+        self._start    = 0
+        self._end      = 0
+        self._paused   = False
+        self._eof      = False
+        self._done     = False
+        self._bytes    = 0
+        if zeroCopy :
+            self._openPipe()
+        if self._pipe :
+            self._size = _XTCPBridgeWay._PIPE_SIZE
+            try :
+                import fcntl
+                self._size = fcntl.fcntl(self._pipe[1], fcntl.F_GETPIPE_SZ)
+            except :
+                pass
+        else :
+            self._buf  = memoryview(src._recvBufSlot.Buffer)
+            self._size = len(self._buf)
+        self._lowWater = self._size // 2
+
+    # ------------------------------------------------------------------------
+
+    def _openPipe(self) :
+        try :
+            # Not for SSL sockets, the data must be decrypted,
+            if os.splice and type(self._src._socket) is socket.socket \
+                         and type(self._dst._socket) is socket.socket :
+                self._pipe = os.pipe()
+        except :
+            self._pipe = None
+
+    # ------------------------------------------------------------------------
+
+    def _release(self) :
+        with self._lock :
+            pipe       = self._pipe
+            self._pipe = None
+            self._buf  = None
+            self._done = True
+        for fd in (pipe or ()) :
+            try :
+                os.close(fd)
+            except :
+                pass
+
+    # ------------------------------------------------------------------------
+
+    def _read(self) :
+        # Returns the number of bytes read, 0 at the end of the stream or
+        # None if there is nothing to read,
+        sock = self._src._socket
+        try :
+            if self._pipe :
+                return os.splice( sock.fileno(),
+                                  self._pipe[1],
+                                  self._size - (self._end - self._start),
+                                  flags = os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK )
+            return sock.recv_into(self._buf[self._end:])
+        except _XSSL.SSLError as sslErr :
+            if sslErr.args[0] != _XSSL.Module.SSL_ERROR_WANT_READ :
+                raise sslErr
+        except BlockingIOError as bioErr :
+            if bioErr.errno != 35 and bioErr.errno != EAGAIN :
+                raise bioErr
+        return None
+
+    # ------------------------------------------------------------------------
+
+    def _write(self) :
+        # Returns the number of bytes written or None if the destination is full,
+        sock = self._dst._socket
+        try :
+            if self._pipe :
+                return os.splice( self._pipe[0],
+                                  sock.fileno(),
+                                  self._end - self._start,
+                                  flags = os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK )
+            return sock.send(self._buf[self._start:self._end])
+        except _XSSL.SSLError as sslErr :
+            if sslErr.args[0] != _XSSL.Module.SSL_ERROR_WANT_WRITE :
+                raise sslErr
+        except BlockingIOError as bioErr :
+            if bioErr.errno != 35 and bioErr.errno != EAGAIN :
+                raise bioErr
+        return None
+
+    # ------------------------------------------------------------------------
+
+    def _resume(self) :
+        # Pending bytes are moved to the start to make room,
+        pending = self._end - self._start
+        if self._buf and pending :
+            self._buf[:pending] = self._buf[self._start:self._end]
+        self._start  = 0
+        self._end    = pending
+        self._paused = False
+
+    # ------------------------------------------------------------------------
+
+    def _pump(self) :
+        src   = self._src
+        dst   = self._dst
+        trace = src._asyncSocketsPool._trace
+        with self._lock :
+            if self._done :
+                return None
+            try :
+                for _ in range(_XTCPBridgeWay._MAX_ROUNDS) :
+                    moved = False
+                    if not self._eof and not self._paused :
+                        if trace :
+                            startSec = perf_counter()
+                        n = self._read()
+                        if n == 0 :
+                            self._eof = True
+                        elif n :
+                            if trace :
+                                trace._record( startSec, src._socket.fileno(),
+                                               XAsyncTrace.RECV, n, perf_counter() - startSec )
+                            self._end     += n
+                            src._bytesRecv += n
+                            moved          = True
+                            if self._end >= self._size :
+                                self._paused = True
+                    if self._end > self._start and not dst._wrBufView :
+                        if trace :
+                            startSec = perf_counter()
+                        n = self._write()
+                        if n :
+                            if trace :
+                                trace._record( startSec, dst._socket.fileno(),
+                                               XAsyncTrace.SEND, n, perf_counter() - startSec )
+                            self._start    += n
+                            self._bytes    += n
+                            dst._bytesSent += n
+                            moved           = True
+                            if self._start == self._end :
+                                self._start = self._end = 0
+                            if self._paused and self._end - self._start <= self._lowWater :
+                                self._resume()
+                    if not moved :
+                        break
+            except :
+                return XClosedReason.Error
+            pending   = self._end - self._start
+            waitRead  = not self._eof and not self._paused
+            ended     = self._eof and not pending
+            if ended :
+                self._done = True
+        src._asyncSocketsPool.NotifyNextReadyForReading(src, waitRead)
+        if pending :
+            dst._asyncSocketsPool.NotifyNextReadyForWriting(dst, True)
+        if ended :
+            # Half-close, the other way can still be used,
+            try :
+                dst._socket.shutdown(socket.SHUT_WR)
+            except :
+                pass
+        return None
+
+# ----------------------------------------------------------------------------
+
+class XTCPBridge :
+
+    __slots__ = ( '_xAsyncTCPClientA', '_xAsyncTCPClientB', '_ways', '_zeroCopy',
+                  '_lock', '_closed', '_state', '_onClosed' )
+
+    def __init__(self, xAsyncTCPClientA, xAsyncTCPClientB, zeroCopy=True) :
+        self._xAsyncTCPClientA = xAsyncTCPClientA
+        self._xAsyncTCPClientB = xAsyncTCPClientB
+        self._ways             = ( _XTCPBridgeWay(xAsyncTCPClientA, xAsyncTCPClientB, zeroCopy),
+                                   _XTCPBridgeWay(xAsyncTCPClientB, xAsyncTCPClientA, zeroCopy) )
+        self._zeroCopy         = ( self._ways[0]._pipe is not None and \
+                                   self._ways[1]._pipe is not None )
+        self._lock             = allocate_lock()
+        self._closed           = False
+        self._state            = None
+        self._onClosed         = None
+
+    # ------------------------------------------------------------------------
+
+    def _onReadable(self, xAsyncTCPClient) :
+        self._process(self._ways[0 if xAsyncTCPClient is self._xAsyncTCPClientA else 1])
+
+    # ------------------------------------------------------------------------
+
+    def _onWritable(self, xAsyncTCPClient) :
+        self._process(self._ways[1 if xAsyncTCPClient is self._xAsyncTCPClientA else 0])
+
+    # ------------------------------------------------------------------------
+
+    def _process(self, way) :
+        closedReason = way._pump()
+        if closedReason is not None :
+            self._close(closedReason)
+        elif self._ways[0]._done and self._ways[1]._done :
+            # Both peers have closed their sending side,
+            self._close(XClosedReason.ClosedByPeer)
+
+    # ------------------------------------------------------------------------
+
+    def _onClientClosed(self, xAsyncTCPClient, closedReason) :
+        self._close(closedReason)
+
+    # ------------------------------------------------------------------------
+
+    def _close(self, closedReason) :
+        with self._lock :
+            if self._closed :
+                return False
+            self._closed = True
+        for way in self._ways :
+            way._release()
+        # The client closed first (if any) returns False here,
+        self._xAsyncTCPClientA._close(closedReason)
+        self._xAsyncTCPClientB._close(closedReason)
+        if self._onClosed :
+            try :
+                self._onClosed(self, closedReason)
+            except Exception as ex :
+                raise XAsyncTCPClientException('Error when handling the "OnClosed" event : %s' % ex)
+        return True
+
+    # ------------------------------------------------------------------------
+
+    def Close(self) :
+        return self._close(XClosedReason.ClosedByHost)
+
+    # ------------------------------------------------------------------------
+
+    @property
+    def ClientA(self) :
+        return self._xAsyncTCPClientA
+
+    @property
+    def ClientB(self) :
+        return self._xAsyncTCPClientB
+
+    @property
+    def BytesAToB(self) :
+        return self._ways[0]._bytes
+
+    @property
+    def BytesBToA(self) :
+        return self._ways[1]._bytes
+
+    @property
+    def PendingBytes(self) :
+        return sum(way._end - way._start for way in self._ways)
+
+    @property
+    def IsZeroCopy(self) :
+        return self._zeroCopy
+
+    @property
+    def IsClosed(self) :
+        return self._closed
+
+    @property
+    def State(self) :
+        return self._state
+    @State.setter
+    def State(self, value) :
+        self._state = value
+
+    @property
+    def OnClosed(self) :
+        return self._onClosed
+    @OnClosed.setter
+    def OnClosed(self, value) :
+        self._onClosed = value
+
+# ============================================================================
+# ===( XHTTPConnection )======================================================
+# ============================================================================
+
+class XHTTPConnectionException(Exception) :
+    pass
+
+class XHTTPConnection :
+
+    __slots__ = ( '_cli', '_lock', '_onRequest', '_onRequestArg',
+                  '_maxHeadSize', '_maxBodySize', '_keepAliveSec', '_maxPipelined',
+                  '_inBuf', '_inPos', '_scanPos', '_parseState', '_request', '_chunkSize',
+                  '_bodyLen', '_bodyParts', '_pending', '_paused',
+                  '_requestsCount', '_state' )
+
+    _PARSE_HEAD       = 0
+    _PARSE_BODY       = 1
+    _PARSE_CHUNK_SIZE = 2
+    _PARSE_CHUNK_DATA = 3
+    _PARSE_TRAILERS   = 4
+    _PARSE_CLOSED     = 5
+
+    _MAX_CHUNK_LINE = 256
+
+    # Strict digits only for the body framing, "int" accepts signs,
+    # underscores, "0x" prefixes and non ASCII digits,
+    _DEC_DIGITS = b'0123456789'
+    _HEX_DIGITS = b'0123456789abcdefABCDEF'
+
+    _REASONS = { 100 : 'Continue',
+                 101 : 'Switching Protocols',
+                 200 : 'OK',
+                 201 : 'Created',
+                 202 : 'Accepted',
+                 204 : 'No Content',
+                 206 : 'Partial Content',
+                 301 : 'Moved Permanently',
+                 302 : 'Found',
+                 303 : 'See Other',
+                 304 : 'Not Modified',
+                 307 : 'Temporary Redirect',
+                 308 : 'Permanent Redirect',
+                 400 : 'Bad Request',
+                 401 : 'Unauthorized',
+                 403 : 'Forbidden',
+                 404 : 'Not Found',
+                 405 : 'Method Not Allowed',
+                 408 : 'Request Timeout',
+                 411 : 'Length Required',
+                 413 : 'Content Too Large',
+                 426 : 'Upgrade Required',
+                 431 : 'Request Header Fields Too Large',
+                 500 : 'Internal Server Error',
+                 501 : 'Not Implemented',
+                 503 : 'Service Unavailable',
+                 505 : 'HTTP Version Not Supported' }
+
+    def __init__( self, xAsyncTCPClient, onRequest, onRequestArg,
+                  maxHeadSize, maxBodySize, keepAliveSec, maxPipelined ) :
+        self._cli           = xAsyncTCPClient
+        self._lock          = allocate_lock()
+        self._onRequest     = onRequest
+        self._onRequestArg  = onRequestArg
+        self._maxHeadSize   = maxHeadSize
+        self._maxBodySize   = maxBodySize
+        self._keepAliveSec  = keepAliveSec
+        self._maxPipelined  = maxPipelined
+        self._inBuf         = bytearray()
+        self._inPos         = 0
+        self._scanPos       = 0
+        self._parseState    = XHTTPConnection._PARSE_HEAD
+        self._request       = None
+        self._chunkSize     = 0
+        self._bodyLen       = 0
+        self._bodyParts     = None
+        self._pending       = [ ]
+        self._paused        = False
+        self._requestsCount = 0
+        self._state         = None
+
+    # ------------------------------------------------------------------------
+
+    def _waitRequest(self) :
+        # The keep-alive timeout also limits the time to receive a request,
+        if self._keepAliveSec :
+            self._cli._setExpireTimeout(self._keepAliveSec)
+
+    # ------------------------------------------------------------------------
+
+    def _onDataRecv(self, data) :
+        if self._parseState != XHTTPConnection._PARSE_CLOSED :
+            self._inBuf += data
+            self._parse()
+
+    # ------------------------------------------------------------------------
+
+    def _onClientClosed(self, closedReason) :
+        self._parseState = XHTTPConnection._PARSE_CLOSED
+        self._pending    = [ ]
+
+    # ------------------------------------------------------------------------
+
+    def _parse(self) :
+        buf = self._inBuf
+        pos = 0
+        try :
+            while True :
+                state = self._parseState
+                if state == XHTTPConnection._PARSE_HEAD :
+                    with self._lock :
+                        if len(self._pending) >= self._maxPipelined :
+                            # Responses are late, the next requests wait in the socket,
+                            self._paused = True
+                    if self._paused :
+                        self._cli.PauseReading()
+                        return
+                    end = buf.find(b'\r\n\r\n', max(pos, self._scanPos))
+                    if end < 0 :
+                        if len(buf) - pos > self._maxHeadSize :
+                            self._fail(431)
+                        else :
+                            self._scanPos = max(pos, len(buf) - 3)
+                        return
+                    if end - pos > self._maxHeadSize :
+                        self._fail(431)
+                        return
+                    head          = bytes(buf[pos:end])
+                    pos           = end + 4
+                    self._scanPos = pos
+                    self._inPos   = pos
+                    if not self._parseHead(head) :
+                        return
+                elif state == XHTTPConnection._PARSE_BODY :
+                    if len(buf) - pos < self._bodyLen :
+                        return
+                    end = pos + self._bodyLen
+                    self._request._body = bytes(buf[pos:end])
+                    pos                 = end
+                    self._inPos         = pos
+                    self._onRequestParsed()
+                elif state == XHTTPConnection._PARSE_CHUNK_SIZE :
+                    end = buf.find(b'\r\n', pos)
+                    if end < 0 :
+                        if len(buf) - pos > XHTTPConnection._MAX_CHUNK_LINE :
+                            self._fail(400)
+                        return
+                    sizeHex = bytes(buf[pos:end]).split(b';', 1)[0].rstrip(b' \t')
+                    if not XHTTPConnection._isDigits(sizeHex, XHTTPConnection._HEX_DIGITS) :
+                        self._fail(400)
+                        return
+                    size = int(sizeHex, 16)
+                    pos = end + 2
+                    if not size :
+                        self._parseState = XHTTPConnection._PARSE_TRAILERS
+                    elif self._bodyLen + size > self._maxBodySize :
+                        self._fail(413)
+                        return
+                    else :
+                        self._chunkSize  = size
+                        self._parseState = XHTTPConnection._PARSE_CHUNK_DATA
+                elif state == XHTTPConnection._PARSE_CHUNK_DATA :
+                    end = pos + self._chunkSize
+                    if len(buf) - end < 2 :
+                        return
+                    if buf[end:end+2] != b'\r\n' :
+                        self._fail(400)
+                        return
+                    self._bodyParts.append(bytes(buf[pos:end]))
+                    self._bodyLen   += self._chunkSize
+                    pos              = end + 2
+                    self._parseState = XHTTPConnection._PARSE_CHUNK_SIZE
+                elif state == XHTTPConnection._PARSE_TRAILERS :
+                    end = buf.find(b'\r\n', pos)
+                    if end < 0 :
+                        if len(buf) - pos > self._maxHeadSize :
+                            self._fail(431)
+                        return
+                    if end > pos :
+                        # Trailer fields are ignored,
+                        pos = end + 2
+                        continue
+                    pos                 = end + 2
+                    self._inPos         = pos
+                    self._request._body = b''.join(self._bodyParts)
+                    self._bodyParts     = None
+                    self._onRequestParsed()
+                else :
+                    return
+        finally :
+            # Consumed bytes are removed once for all the requests parsed,
+            if pos :
+                del buf[:pos]
+                self._scanPos = max(0, self._scanPos - pos)
+                self._inPos   = max(0, self._inPos   - pos)
+
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def _isDigits(value, digits) :
+        if not value :
+            return False
+        for c in value :
+            if c not in digits :
+                return False
+        return True
+
+    # ------------------------------------------------------------------------
+
+    def _parseHead(self, head) :
+        try :
+            lines = head.decode('latin-1').split('\r\n')
+            while not lines[0] :
+                # Empty lines before a request are ignored,
+                lines.pop(0)
+            method, target, version = lines[0].split(' ')
+        except :
+            self._fail(400)
+            return False
+        if not version.startswith('HTTP/1.') :
+            self._fail(505)
+            return False
+        headers = { }
+        for line in lines[1:] :
+            i = line.find(':')
+            if i <= 0 or line[0] in ' \t' :
+                self._fail(400)
+                return False
+            name  = line[:i].strip().lower()
+            value = line[i+1:].strip()
+            if name in headers :
+                headers[name] += ', ' + value
+            else :
+                headers[name] = value
+        conn = [ t.strip() for t in headers.get('connection', '').lower().split(',') ]
+        if version == 'HTTP/1.0' :
+            keepAlive = ('keep-alive' in conn)
+        else :
+            keepAlive = ('close' not in conn)
+        self._request = XHTTPRequest(self, method, target, version, headers, keepAlive)
+        te = headers.get('transfer-encoding')
+        cl = headers.get('content-length')
+        if te is not None :
+            if cl is not None or te.lower().split(',')[-1].strip() != 'chunked' :
+                # Ambiguous or unknown framing of the body,
+                self._fail(400 if cl is not None else 501)
+                return False
+            self._bodyLen    = 0
+            self._bodyParts  = [ ]
+            self._parseState = XHTTPConnection._PARSE_CHUNK_SIZE
+        elif cl is not None :
+            if not XHTTPConnection._isDigits(cl.encode('latin-1'), XHTTPConnection._DEC_DIGITS) :
+                self._fail(400)
+                return False
+            self._bodyLen = int(cl)
+            if self._bodyLen > self._maxBodySize :
+                self._fail(413)
+                return False
+            if not self._bodyLen :
+                self._onRequestParsed()
+                return True
+            self._parseState = XHTTPConnection._PARSE_BODY
+        else :
+            self._onRequestParsed()
+            return True
+        if headers.get('expect', '').lower() == '100-continue' :
+            with self._lock :
+                if not self._pending :
+                    self._cli.AsyncSendData(b'HTTP/1.1 100 Continue\r\n\r\n')
+        return True
+
+    # ------------------------------------------------------------------------
+
+    def _onRequestParsed(self) :
+        request          = self._request
+        self._request    = None
+        self._parseState = XHTTPConnection._PARSE_HEAD
+        with self._lock :
+            self._pending.append(request)
+        self._requestsCount += 1
+        self._cli._removeExpireTimeout()
+        if not request._keepAlive :
+            # Last request of the connection,
+            self._parseState = XHTTPConnection._PARSE_CLOSED
+            self._cli.PauseReading()
+        if self._onRequest :
+            try :
+                self._onRequest(self, request, self._onRequestArg)
+            except Exception as ex :
+                raise XHTTPConnectionException('Error when handling the "OnRequest" event : %s' % ex)
+
+    # ------------------------------------------------------------------------
+
+    def _fail(self, code) :
+        self._parseState = XHTTPConnection._PARSE_CLOSED
+        self._cli.PauseReading()
+        request = XHTTPRequest(self, None, None, 'HTTP/1.1', { }, False)
+        with self._lock :
+            self._pending.append(request)
+        request.SendResponse(code)
+
+    # ------------------------------------------------------------------------
+
+    def _respond(self, request, code, headers, body, reason) :
+        if not isinstance(code, int) or code < 100 or code > 999 :
+            raise XHTTPConnectionException('SendResponse : "code" is incorrect.')
+        if body is None :
+            body = b''
+        elif isinstance(body, str) :
+            body = body.encode('UTF-8')
+        elif not isinstance(body, (bytes, bytearray, memoryview)) :
+            raise XHTTPConnectionException('SendResponse : "body" is incorrect.')
+        if reason is None :
+            reason = XHTTPConnection._REASONS.get(code, '')
+        head   = [ 'HTTP/1.1 %d %s\r\n' % (code, reason) ]
+        hasLen = False
+        try :
+            for name, value in (headers.items() if isinstance(headers, dict) else (headers or ())) :
+                lname = name.lower()
+                if lname == 'connection' and code != 101 :
+                    continue
+                if lname == 'content-length' or lname == 'transfer-encoding' :
+                    hasLen = True
+                head.append('%s: %s\r\n' % (name, value))
+        except :
+            raise XHTTPConnectionException('SendResponse : "headers" is incorrect.')
+        noBody = (code < 200 or code == 204 or code == 304)
+        if not hasLen and not noBody :
+            head.append('Content-Length: %d\r\n' % len(body))
+        if code == 101 :
+            # The connection is given to another protocol,
+            head.append('\r\n')
+        elif not request._keepAlive :
+            head.append('Connection: close\r\n\r\n')
+        elif request._version == 'HTTP/1.0' :
+            head.append('Connection: keep-alive\r\n\r\n')
+        else :
+            head.append('\r\n')
+        chunks = [ ''.join(head).encode('latin-1') ]
+        if body and not noBody and request._method != 'HEAD' :
+            # Sent by a gather-write with the head, without concatenation,
+            chunks.append(body)
+        cli    = self._cli
+        resume = False
+        with self._lock :
+            if request._response is not None or cli._socketID is None :
+                return False
+            request._response = chunks
+            pending = self._pending
+            while pending and pending[0]._response is not None :
+                # Responses are sent in the order of the pipelined requests,
+                request = pending.pop(0)
+                last    = len(request._response) - 1
+                for i, chunk in enumerate(request._response) :
+                    if i == last and not request._keepAlive :
+                        cli.AsyncSendData(chunk, self._onLastResponseSent)
+                    else :
+                        cli.AsyncSendData(chunk)
+                request._response = ( )
+            if self._paused and len(pending) < self._maxPipelined and \
+               self._parseState != XHTTPConnection._PARSE_CLOSED :
+                self._paused = False
+                resume       = True
+            idle = not pending and self._parseState == XHTTPConnection._PARSE_HEAD
+        if idle :
+            self._waitRequest()
+        if resume :
+            # Buffered requests are parsed again in the pool loop,
+            cli._asyncSocketsPool.CallSoon(self._resumeParsing)
+        return True
+
+    # ------------------------------------------------------------------------
+
+    def _upgradeToWebSocket(self, request, onMessage, onMessageArg, maxMessageSize, subprotocol) :
+        if not isinstance(maxMessageSize, int) or maxMessageSize <= 0 :
+            raise XHTTPConnectionException('UpgradeToWebSocket : "maxMessageSize" is incorrect.')
+        with self._lock :
+            if not self._pending or self._pending[0] is not request :
+                raise XHTTPConnectionException('UpgradeToWebSocket : Previous requests are not responded.')
+        key  = request.GetHeader('sec-websocket-key', '')
+        conn = [ t.strip() for t in request.GetHeader('connection', '').lower().split(',') ]
+        if request._method != 'GET'                                      or \
+           request.GetHeader('upgrade', '').lower() != 'websocket' or \
+           'upgrade' not in conn or not key :
+            request.SendResponse(400)
+            return None
+        if request.GetHeader('sec-websocket-version') != '13' :
+            request.SendResponse(426, { 'Sec-WebSocket-Version' : '13' })
+            return None
+        try :
+            from hashlib  import sha1
+            from binascii import b2a_base64
+        except :
+            from uhashlib  import sha1
+            from ubinascii import b2a_base64
+        accept  = b2a_base64(sha1((key + XWebSocket._GUID).encode()).digest()).strip().decode()
+        headers = [ ('Upgrade',              'websocket'),
+                    ('Connection',           'Upgrade'),
+                    ('Sec-WebSocket-Accept', accept) ]
+        if subprotocol :
+            headers.append(('Sec-WebSocket-Protocol', subprotocol))
+        # No more HTTP requests, the data received after this one is frames,
+        self._parseState = XHTTPConnection._PARSE_CLOSED
+        leftover         = bytes(self._inBuf[self._inPos:])
+        self._inBuf      = bytearray()
+        self._inPos      = 0
+        request.SendResponse(101, headers)
+        webSocket = XWebSocket(self._cli, request, onMessage, onMessageArg, maxMessageSize)
+        self._cli._protocol = webSocket
+        self._cli.ResumeReading()
+        if leftover :
+            webSocket._onDataRecv(leftover)
+        return webSocket
+
+    # ------------------------------------------------------------------------
+
+    def _onLastResponseSent(self, xAsyncTCPClient, arg) :
+        xAsyncTCPClient.Close()
+
+    # ------------------------------------------------------------------------
+
+    def _resumeParsing(self, arg) :
+        if self._parseState != XHTTPConnection._PARSE_CLOSED :
+            self._parse()
+            if not self._paused and self._parseState != XHTTPConnection._PARSE_CLOSED :
+                self._cli.ResumeReading()
+
+    # ------------------------------------------------------------------------
+
+    def Close(self) :
+        return self._cli.Close()
+
+    # ------------------------------------------------------------------------
+
+    @property
+    def Client(self) :
+        return self._cli
+
+    @property
+    def RequestsCount(self) :
+        return self._requestsCount
+
+    @property
+    def PendingResponsesCount(self) :
+        return len(self._pending)
+
+    @property
+    def IsClosed(self) :
+        return self._cli._socketID is None
+
+    @property
+    def State(self) :
+        return self._state
+    @State.setter
+    def State(self, value) :
+        self._state = value
+
+    @property
+    def OnRequest(self) :
+        return self._onRequest
+    @OnRequest.setter
+    def OnRequest(self, value) :
+        self._onRequest = value
+
+# ============================================================================
+# ===( XHTTPRequest )=========================================================
+# ============================================================================
+
+class XHTTPRequest :
+
+    __slots__ = ( '_httpConn', '_method', '_target', '_version', '_headers',
+                  '_keepAlive', '_body', '_response' )
+
+    def __init__(self, xHTTPConnection, method, target, version, headers, keepAlive) :
+        self._httpConn  = xHTTPConnection
+        self._method    = method
+        self._target    = target
+        self._version   = version
+        self._headers   = headers
+        self._keepAlive = keepAlive
+        self._body      = b''
+        self._response  = None
+
+    # ------------------------------------------------------------------------
+
+    def GetHeader(self, name, default=None) :
+        return self._headers.get(name.lower(), default)
+
+    # ------------------------------------------------------------------------
+
+    def SendResponse(self, code=200, headers=None, body=None, reason=None) :
+        return self._httpConn._respond(self, code, headers, body, reason)
+
+    # ------------------------------------------------------------------------
+
+    def UpgradeToWebSocket(self, onMessage=None, onMessageArg=None, maxMessageSize=1048576, subprotocol=None) :
+        return self._httpConn._upgradeToWebSocket(self, onMessage, onMessageArg, maxMessageSize, subprotocol)
+
+    # ------------------------------------------------------------------------
+
+    @property
+    def HTTPConnection(self) :
+        return self._httpConn
+
+    @property
+    def Method(self) :
+        return self._method
+
+    @property
+    def Target(self) :
+        return self._target
+
+    @property
+    def Path(self) :
+        return self._target.split('?', 1)[0] if self._target else None
+
+    @property
+    def QueryString(self) :
+        if self._target and '?' in self._target :
+            return self._target.split('?', 1)[1]
+        return ''
+
+    @property
+    def Version(self) :
+        return self._version
+
+    @property
+    def Headers(self) :
+        return self._headers
+
+    @property
+    def Body(self) :
+        return self._body
+
+    @property
+    def KeepAlive(self) :
+        return self._keepAlive
+
+    @property
+    def IsResponded(self) :
+        return self._response is not None
+
+# ============================================================================
+# ===( XWebSocket )===========================================================
+# ============================================================================
+
+class XWebSocketException(Exception) :
+    pass
+
+class XWebSocket :
+
+    __slots__ = ( '_cli', '_request', '_sendLock', '_onMessage', '_onMessageArg',
+                  '_maxMessageSize', '_inBuf', '_fragOpcode', '_fragParts',
+                  '_fragLen', '_closeSent', '_closed', '_closeCode',
+                  '_msgsRecv', '_msgsSent', '_onPong', '_onClosed', '_state' )
+
+    _GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+    OPCODE_CONTINUATION = 0x0
+    OPCODE_TEXT         = 0x1
+    OPCODE_BINARY       = 0x2
+    OPCODE_CLOSE        = 0x8
+    OPCODE_PING         = 0x9
+    OPCODE_PONG         = 0xA
+
+    CLOSE_NORMAL         = 1000
+    CLOSE_GOING_AWAY     = 1001
+    CLOSE_PROTOCOL_ERROR = 1002
+    CLOSE_NO_STATUS      = 1005
+    CLOSE_ABNORMAL       = 1006
+    CLOSE_INVALID_DATA   = 1007
+    CLOSE_TOO_BIG        = 1009
+
+    _CLOSE_TIMEOUT_SEC = 5
+    _GATHER_MIN_SIZE   = 16384
+
+    def __init__(self, xAsyncTCPClient, request, onMessage, onMessageArg, maxMessageSize) :
+        self._cli            = xAsyncTCPClient
+        self._request        = request
+        self._sendLock       = allocate_lock()
+        self._onMessage      = onMessage
+        self._onMessageArg   = onMessageArg
+        self._maxMessageSize = maxMessageSize
+        self._inBuf          = bytearray()
+        self._fragOpcode     = None
+        self._fragParts      = None
+        self._fragLen        = 0
+        self._closeSent      = False
+        self._closed         = False
+        self._closeCode      = None
+        self._msgsRecv       = 0
+        self._msgsSent       = 0
+        self._onPong         = None
+        self._onClosed       = None
+        self._state          = None
+
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def _unmask(data, mask) :
+        # XOR of the whole payload at once, as two big integers,
+        n = len(data)
+        if not n :
+            return b''
+        masks = (mask * ((n >> 2) + 1))[:n]
+        return ( int.from_bytes(data,  'little') ^ \
+                 int.from_bytes(masks, 'little') ).to_bytes(n, 'little')
+
+    # ------------------------------------------------------------------------
+
+    def _onDataRecv(self, data) :
+        if self._closed :
+            return
+        if self._inBuf :
+            self._inBuf += data
+            pos = self._parse(self._inBuf)
+            if pos :
+                del self._inBuf[:pos]
+        else :
+            # Frames are parsed straight from the receive slot, only the
+            # end of a partial frame is kept,
+            pos = self._parse(data)
+            if pos < len(data) and not self._closed :
+                self._inBuf += data[pos:]
+
+    # ------------------------------------------------------------------------
+
+    def _parse(self, buf) :
+        n   = len(buf)
+        pos = 0
+        while not self._closed and n - pos >= 2 :
+            b0     = buf[pos]
+            b1     = buf[pos+1]
+            opcode = b0 & 0x0F
+            length = b1 & 0x7F
+            hdrLen = 6
+            if length == 126 :
+                if n - pos < 4 :
+                    break
+                length = (buf[pos+2] << 8) | buf[pos+3]
+                hdrLen = 8
+            elif length == 127 :
+                if n - pos < 10 :
+                    break
+                length = int.from_bytes(bytes(buf[pos+2:pos+10]), 'big')
+                hdrLen = 14
+            if (b0 & 0x70) or not (b1 & 0x80) :
+                # No extension is negotiated and client frames must be masked,
+                self._fail(XWebSocket.CLOSE_PROTOCOL_ERROR)
+                break
+            if opcode >= XWebSocket.OPCODE_CLOSE and ( not (b0 & 0x80) or length > 125 ) :
+                self._fail(XWebSocket.CLOSE_PROTOCOL_ERROR)
+                break
+            if self._fragLen + length > self._maxMessageSize :
+                self._fail(XWebSocket.CLOSE_TOO_BIG)
+                break
+            end = pos + hdrLen + length
+            if end > n :
+                break
+            mask    = bytes(buf[pos+hdrLen-4:pos+hdrLen])
+            payload = XWebSocket._unmask(buf[pos+hdrLen:end], mask)
+            pos     = end
+            self._onFrame(b0 & 0x80, opcode, payload)
+        return pos
+
+    # ------------------------------------------------------------------------
+
+    def _onFrame(self, fin, opcode, payload) :
+        if opcode == XWebSocket.OPCODE_CONTINUATION :
+            if self._fragOpcode is None :
+                self._fail(XWebSocket.CLOSE_PROTOCOL_ERROR)
+                return
+            self._fragParts.append(payload)
+            self._fragLen += len(payload)
+            if fin :
+                opcode           = self._fragOpcode
+                payload          = b''.join(self._fragParts)
+                self._fragOpcode = None
+                self._fragParts  = None
+                self._fragLen    = 0
+                self._onDataMessage(opcode, payload)
+        elif opcode == XWebSocket.OPCODE_TEXT or opcode == XWebSocket.OPCODE_BINARY :
+            if self._fragOpcode is not None :
+                self._fail(XWebSocket.CLOSE_PROTOCOL_ERROR)
+            elif fin :
+                self._onDataMessage(opcode, payload)
+            else :
+                self._fragOpcode = opcode
+                self._fragParts  = [ payload ]
+                self._fragLen    = len(payload)
+        elif opcode == XWebSocket.OPCODE_PING :
+            self._sendFrame(XWebSocket.OPCODE_PONG, payload)
+        elif opcode == XWebSocket.OPCODE_PONG :
+            if self._onPong :
+                try :
+                    self._onPong(self, payload)
+                except Exception as ex :
+                    raise XWebSocketException('Error when handling the "OnPong" event : %s' % ex)
+        elif opcode == XWebSocket.OPCODE_CLOSE :
+            if len(payload) >= 2 :
+                self._closeCode = (payload[0] << 8) | payload[1]
+            else :
+                self._closeCode = XWebSocket.CLOSE_NO_STATUS
+            self._closed = True
+            if self._closeSent :
+                self._cli.Close()
+            else :
+                # Echoes the status code, then closes the connection,
+                self._sendClose(payload[:2], True)
+        else :
+            self._fail(XWebSocket.CLOSE_PROTOCOL_ERROR)
+
+    # ------------------------------------------------------------------------
+
+    def _onDataMessage(self, opcode, payload) :
+        if opcode == XWebSocket.OPCODE_TEXT :
+            try :
+                payload = payload.decode('UTF-8')
+            except :
+                self._fail(XWebSocket.CLOSE_INVALID_DATA)
+                return
+        self._msgsRecv += 1
+        if self._onMessage :
+            try :
+                self._onMessage(self, payload, self._onMessageArg)
+            except Exception as ex :
+                raise XWebSocketException('Error when handling the "OnMessage" event : %s' % ex)
+
+    # ------------------------------------------------------------------------
+
+    def _fail(self, code) :
+        self._closed    = True
+        self._closeCode = code
+        if not self._closeSent :
+            self._sendClose(struct.pack('!H', code), True)
+        else :
+            self._cli.Close()
+
+    # ------------------------------------------------------------------------
+
+    def _sendFrame(self, opcode, payload, onDataSent=None) :
+        n = len(payload)
+        if n < 126 :
+            header = bytes((0x80 | opcode, n))
+        elif n < 65536 :
+            header = struct.pack('!BBH', 0x80 | opcode, 126, n)
+        else :
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, n)
+        with self._sendLock :
+            if not n :
+                return self._cli.AsyncSendData(header, onDataSent)
+            if n <= XWebSocket._GATHER_MIN_SIZE :
+                # Copying a payload costs less than queuing one more chunk,
+                return self._cli.AsyncSendData(header + bytes(payload), onDataSent)
+            # The header and the large payload are sent by a gather-write,
+            return self._cli.AsyncSendData(header) and \
+                   self._cli.AsyncSendData(payload, onDataSent)
+
+    # ------------------------------------------------------------------------
+
+    def _sendClose(self, payload, closeWhenSent) :
+        self._closeSent = True
+        self._sendFrame( XWebSocket.OPCODE_CLOSE,
+                         payload,
+                         self._onCloseSent if closeWhenSent else None )
+
+    # ------------------------------------------------------------------------
+
+    def _onCloseSent(self, xAsyncTCPClient, arg) :
+        xAsyncTCPClient.Close()
+
+    # ------------------------------------------------------------------------
+
+    def _onClientClosed(self, closedReason) :
+        self._closed = True
+        if self._closeCode is None :
+            self._closeCode = XWebSocket.CLOSE_ABNORMAL
+        if self._onClosed :
+            try :
+                self._onClosed(self, self._closeCode)
+            except Exception as ex :
+                raise XWebSocketException('Error when handling the "OnClosed" event : %s' % ex)
+
+    # ------------------------------------------------------------------------
+
+    def SendText(self, text) :
+        try :
+            data = text.encode('UTF-8')
+        except :
+            raise XWebSocketException('SendText : "text" is incorrect.')
+        return self._sendMessage(XWebSocket.OPCODE_TEXT, data)
+
+    # ------------------------------------------------------------------------
+
+    def SendBinary(self, data) :
+        if not isinstance(data, (bytes, bytearray, memoryview)) :
+            raise XWebSocketException('SendBinary : "data" is incorrect.')
+        return self._sendMessage(XWebSocket.OPCODE_BINARY, data)
+
+    # ------------------------------------------------------------------------
+
+    def _sendMessage(self, opcode, data) :
+        if self._closeSent or self._closed :
+            return False
+        if self._sendFrame(opcode, data) :
+            self._msgsSent += 1
+            return True
+        return False
+
+    # ------------------------------------------------------------------------
+
+    def Ping(self, data=b'') :
+        if len(data) > 125 :
+            raise XWebSocketException('Ping : "data" is limited to 125 bytes.')
+        if self._closeSent or self._closed :
+            return False
+        return self._sendFrame(XWebSocket.OPCODE_PING, data)
+
+    # ------------------------------------------------------------------------
+
+    def Close(self, code=1000, reason='') :
+        if self._closeSent or self._closed :
+            return False
+        try :
+            payload = struct.pack('!H', code) + reason.encode('UTF-8')
+            if len(payload) > 125 :
+                raise Exception()
+        except :
+            raise XWebSocketException('Close : "code" or "reason" is incorrect.')
+        # The connection is closed when the peer answers, or after a delay,
+        self._sendClose(payload, False)
+        self._cli._setExpireTimeout(XWebSocket._CLOSE_TIMEOUT_SEC)
+        return True
+
+    # ------------------------------------------------------------------------
+
+    @property
+    def Client(self) :
+        return self._cli
+
+    @property
+    def Request(self) :
+        return self._request
+
+    @property
+    def MessagesRecv(self) :
+        return self._msgsRecv
+
+    @property
+    def MessagesSent(self) :
+        return self._msgsSent
+
+    @property
+    def IsClosed(self) :
+        return self._closed
+
+    @property
+    def CloseCode(self) :
+        return self._closeCode
+
+    @property
+    def State(self) :
+        return self._state
+    @State.setter
+    def State(self, value) :
+        self._state = value
+
+    @property
+    def OnMessage(self) :
+        return self._onMessage
+    @OnMessage.setter
+    def OnMessage(self, value) :
+        self._onMessage = value
+
+    @property
+    def OnPong(self) :
+        return self._onPong
+    @OnPong.setter
+    def OnPong(self, value) :
+        self._onPong = value
+
+    @property
+    def OnClosed(self) :
+        return self._onClosed
+    @OnClosed.setter
+    def OnClosed(self, value) :
+        self._onClosed = value
+
+# ============================================================================
+# ===( XCompressionPool )=====================================================
+# ============================================================================
+
+class XCompressionPoolException(Exception) :
+    pass
+
+class XCompressionPool :
+
+    # Deflate objects shared by the compression stages of all connections.
+    # Each block is ended by a full flush and never refers to the previous
+    # ones, so an object is only lent for one block and can then serve any
+    # other connection,
+
+    _default     = None
+    _defaultLock = allocate_lock()
+
+    @staticmethod
+    def GetDefault() :
+        with XCompressionPool._defaultLock :
+            if XCompressionPool._default is None :
+                XCompressionPool._default = XCompressionPool()
+            return XCompressionPool._default
+
+    def __init__(self, level=6, maxFreeObjects=16) :
+        if not isinstance(level, int) or level < -1 or level > 9 :
+            raise XCompressionPoolException('XCompressionPool : "level" is incorrect.')
+        if not isinstance(maxFreeObjects, int) or maxFreeObjects < 0 :
+            raise XCompressionPoolException('XCompressionPool : "maxFreeObjects" is incorrect.')
+        # "zlib" is only imported when compression is used,
+        try :
+            import zlib
+            zlib.compressobj
+            zlib.decompressobj
+        except :
+            raise XCompressionPoolException('XCompressionPool : Streaming "zlib" is not available.')
+        self._zlib           = zlib
+        self._level          = level
+        self._maxFreeObjects = maxFreeObjects
+        self._lock           = allocate_lock()
+        self._compressors    = [ ]
+        self._decompressors  = [ ]
+        self._objectsCreated = 0
+
+    # ------------------------------------------------------------------------
+
+    def _getCompressor(self) :
+        with self._lock :
+            if self._compressors :
+                return self._compressors.pop()
+            self._objectsCreated += 1
+        # Raw deflate, without zlib header nor checksum,
+        return self._zlib.compressobj(self._level, self._zlib.DEFLATED, -15)
+
+    # ------------------------------------------------------------------------
+
+    def _releaseCompressor(self, compressor) :
+        with self._lock :
+            if len(self._compressors) < self._maxFreeObjects :
+                self._compressors.append(compressor)
+
+    # ------------------------------------------------------------------------
+
+    def _getDecompressor(self) :
+        with self._lock :
+            if self._decompressors :
+                return self._decompressors.pop()
+            self._objectsCreated += 1
+        return self._zlib.decompressobj(-15)
+
+    # ------------------------------------------------------------------------
+
+    def _releaseDecompressor(self, decompressor) :
+        with self._lock :
+            if len(self._decompressors) < self._maxFreeObjects :
+                self._decompressors.append(decompressor)
+
+    # ------------------------------------------------------------------------
+
+    @property
+    def Level(self) :
+        return self._level
+
+    @property
+    def MaxFreeObjects(self) :
+        return self._maxFreeObjects
+
+    @property
+    def ObjectsCreated(self) :
+        return self._objectsCreated
+
+    @property
+    def FreeObjectsCount(self) :
+        return len(self._compressors) + len(self._decompressors)
+
+# ============================================================================
+# ===( XCompressionStage )====================================================
+# ============================================================================
+
+class XCompressionStageException(Exception) :
+    pass
+
+class XCompressionStage :
+
+    __slots__ = ( '_cli', '_pool', '_minSize', '_onPlainRecv', '_onPlainRecvArg',
+                  '_hdrBuf', '_blockLeft', '_decompressor', '_closed',
+                  '_plainSent', '_wireSent', '_plainRecv', '_wireRecv',
+                  '_blocksCompressed', '_blocksStored', '_state' )
+
+    # A block is a 4 bytes header (compressed flag and payload size) and a
+    # payload, stored as is or deflated without its ending sync marker,
+    _HEADER_SIZE     = 4
+    _FLAG_COMPRESSED = 0x80000000
+    _MAX_BLOCK_SIZE  = 0x7FFFFFFF
+    _SYNC_MARKER     = b'\x00\x00\xff\xff'
+    _OUT_CHUNK_SIZE  = 65536
+
+    def __init__(self, xAsyncTCPClient, onDataRecv, onDataRecvArg, minSize, compressionPool) :
+        self._cli              = xAsyncTCPClient
+        self._pool             = compressionPool
+        self._minSize          = minSize
+        self._onPlainRecv      = onDataRecv
+        self._onPlainRecvArg   = onDataRecvArg
+        self._hdrBuf           = bytearray()
+        self._blockLeft        = 0
+        self._decompressor     = None
+        self._closed           = False
+        self._plainSent        = 0
+        self._wireSent         = 0
+        self._plainRecv        = 0
+        self._wireRecv         = 0
+        self._blocksCompressed = 0
+        self._blocksStored     = 0
+        self._state            = None
+
+    # ------------------------------------------------------------------------
+
+    def _encode(self, data) :
+        try :
+            n = len(data)
+            if not n or n > XCompressionStage._MAX_BLOCK_SIZE :
+                raise Exception()
+        except :
+            raise XAsyncTCPClientException('AsyncSendData : "data" is incorrect.')
+        if n >= self._minSize :
+            zlib       = self._pool._zlib
+            compressor = self._pool._getCompressor()
+            payload    = compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+            self._pool._releaseCompressor(compressor)
+            payload    = payload[:-4]
+            if len(payload) < n :
+                block = struct.pack('!I', XCompressionStage._FLAG_COMPRESSED | len(payload)) + payload
+                self._countBlock(n, block)
+                return block
+        # Small or incompressible data pass through,
+        block = struct.pack('!I', n) + data
+        self._countBlock(n, block)
+        return block
+
+    # ------------------------------------------------------------------------
+
+    def _countBlock(self, plainSize, block) :
+        if block[0] & 0x80 :
+            self._blocksCompressed += 1
+        else :
+            self._blocksStored += 1
+        self._plainSent += plainSize
+        self._wireSent  += len(block)
+
+    # ------------------------------------------------------------------------
+
+    def _onDataRecv(self, data) :
+        n    = len(data)
+        pos  = 0
+        self._wireRecv += n
+        while pos < n and not self._closed :
+            if not self._blockLeft :
+                if self._hdrBuf or n - pos < 4 :
+                    need          = 4 - len(self._hdrBuf)
+                    self._hdrBuf += data[pos:pos+need]
+                    pos          += need
+                    if len(self._hdrBuf) < 4 :
+                        break
+                    header = struct.unpack('!I', self._hdrBuf)[0]
+                    self._hdrBuf = bytearray()
+                else :
+                    header = struct.unpack_from('!I', data, pos)[0]
+                    pos   += 4
+                self._blockLeft = header & XCompressionStage._MAX_BLOCK_SIZE
+                if not self._blockLeft :
+                    self._fail()
+                    break
+                if header & XCompressionStage._FLAG_COMPRESSED :
+                    self._decompressor = self._pool._getDecompressor()
+                continue
+            size             = min(self._blockLeft, n - pos)
+            chunk            = data[pos:pos+size]
+            pos             += size
+            self._blockLeft -= size
+            if self._decompressor :
+                self._inflate(chunk)
+                if not self._blockLeft and not self._closed :
+                    self._inflate(XCompressionStage._SYNC_MARKER)
+                    self._pool._releaseDecompressor(self._decompressor)
+                    self._decompressor = None
+            else :
+                self._deliver(chunk)
+
+    # ------------------------------------------------------------------------
+
+    def _inflate(self, data) :
+        # The output is delivered by parts, so that a highly compressed
+        # payload never expands at once in memory,
+        decompressor = self._decompressor
+        maxSize      = XCompressionStage._OUT_CHUNK_SIZE
+        try :
+            while True :
+                out  = decompressor.decompress(data, maxSize)
+                data = decompressor.unconsumed_tail
+                if out :
+                    self._deliver(out)
+                    if self._closed :
+                        return
+                if not data and len(out) < maxSize :
+                    return
+        except self._pool._zlib.error :
+            self._fail()
+
+    # ------------------------------------------------------------------------
+
+    def _deliver(self, data) :
+        self._plainRecv += len(data)
+        if self._onPlainRecv :
+            try :
+                self._onPlainRecv(self, data, self._onPlainRecvArg)
+            except Exception as ex :
+                raise XCompressionStageException('Error when handling the "OnDataRecv" event : %s' % ex)
+
+    # ------------------------------------------------------------------------
+
+    def _fail(self) :
+        self._closed = True
+        self._cli._close()
+
+    # ------------------------------------------------------------------------
+
+    def _onClientClosed(self, closedReason) :
+        self._closed = True
+        # Stopped in the middle of a block, it cannot be reused,
+        self._decompressor = None
 
     # ------------------------------------------------------------------------
 
     @property
-    def SrvAddr(self) :
-        return self._srvAddr
+    def Client(self) :
+        return self._cli
 
     @property
-    def CliAddr(self) :
-        return self._cliAddr
+    def CompressionPool(self) :
+        return self._pool
 
     @property
-    def IsSSL(self) :
-        return ( hasattr(ssl, 'SSLContext') and \
-                 hasattr(ssl, 'SSLSocket')  and \
-                 isinstance(self._socket, ssl.SSLSocket) )
+    def MinSize(self) :
+        return self._minSize
 
     @property
-    def SendingBuffer(self) :
-        return self._sendBufSlot.Buffer
+    def PlainBytesSent(self) :
+        return self._plainSent
 
     @property
-    def OnFailsToConnect(self) :
-        return self._onFailsToConnect
-    @OnFailsToConnect.setter
-    def OnFailsToConnect(self, value) :
-        self._onFailsToConnect = value
+    def WireBytesSent(self) :
+        return self._wireSent
 
     @property
-    def OnConnected(self) :
-        return self._onConnected
-    @OnConnected.setter
-    def OnConnected(self, value) :
-        self._onConnected = value
+    def PlainBytesRecv(self) :
+        return self._plainRecv
+
+    @property
+    def WireBytesRecv(self) :
+        return self._wireRecv
+
+    @property
+    def SendRatio(self) :
+        return (self._wireSent / self._plainSent) if self._plainSent else 1.0
+
+    @property
+    def RecvRatio(self) :
+        return (self._wireRecv / self._plainRecv) if self._plainRecv else 1.0
+
+    @property
+    def BlocksCompressed(self) :
+        return self._blocksCompressed
+
+    @property
+    def BlocksStored(self) :
+        return self._blocksStored
+
+    @property
+    def IsClosed(self) :
+        return self._closed
+
+    @property
+    def State(self) :
+        return self._state
+    @State.setter
+    def State(self, value) :
+        self._state = value
+
+    @property
+    def OnDataRecv(self) :
+        return self._onPlainRecv
+    @OnDataRecv.setter
+    def OnDataRecv(self, value) :
+        self._onPlainRecv = value
 
 # ============================================================================
 # ===( XAsyncUDPDatagram )====================================================
@@ -924,19 +4882,41 @@ class XAsyncUDPDatagramException(Exception) :
 
 class XAsyncUDPDatagram(XAsyncSocket) :
 
+    __slots__ = ( '_wrDgramFiFo', '_onFailsToSend',
+                  '_onDataSent', '_onDataSentArg', '_onDataRecv',
+                  '_sessions', '_sessionsLock', '_sessionsMax',
+                  '_sessionIdleSec', '_onSessionCreated' )
+
     @staticmethod
-    def Create(asyncSocketsPool, localAddr=None, recvBufLen=4096, broadcast=False) :
+    def Create(asyncSocketsPool, localAddr=None, recvBufLen=4096, broadcast=False, socketOptions=None, family=None) :
+        try :
+            socketOptions = XSocketOptions._get(socketOptions)
+            if localAddr is not None :
+                addrFamily = XAsyncSocket._getAddrFamily(localAddr)
+                if family is not None and family != addrFamily :
+                    raise Exception('"family" does not match "localAddr".')
+                family = addrFamily
+            elif family is None :
+                family = socket.AF_INET
+            elif family not in ( socket.AF_INET,
+                                 getattr(socket, 'AF_INET6', None),
+                                 getattr(socket, 'AF_UNIX',  None) ) :
+                raise Exception('"family" is incorrect.')
+        except Exception as ex :
+            raise XAsyncUDPDatagramException('Create : %s' % ex)
         try :
-            udpSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            udpSocket = socket.socket(family, socket.SOCK_DGRAM)
         except :
             raise XAsyncUDPDatagramException('Create : Cannot open socket (no enought memory).')
         if broadcast :
             udpSocket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        if socketOptions :
+            socketOptions._apply(udpSocket)
         openRecv = (localAddr is not None)
         if openRecv :
             try :
                 udpSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                udpSocket.bind(localAddr)
+                XAsyncSocket._bindSocket(udpSocket, localAddr)
             except :
                 raise XAsyncUDPDatagramException('Create : Error to binding the UDP Datagram local address.')
             try :
@@ -956,16 +4936,44 @@ class XAsyncUDPDatagram(XAsyncSocket) :
     def __init__(self, asyncSocketsPool, udpSocket, recvBufSlot) :
         try :
             super().__init__(asyncSocketsPool, udpSocket, recvBufSlot, None)
-            self._wrDgramFiFo   = XFiFo()
-            self._onFailsToSend = None
-            self._onDataSent    = None
-            self._onDataSentArg = None
-            self._onDataRecv    = None
+            self._wrDgramFiFo      = XFiFo()
+            self._onFailsToSend    = None
+            self._onDataSent       = None
+            self._onDataSentArg    = None
+            self._onDataRecv       = None
+            self._sessions         = None
+            self._sessionsLock     = None
+            self._sessionsMax      = None
+            self._sessionIdleSec   = None
+            self._onSessionCreated = None
         except :
             raise XAsyncUDPDatagramException('Error to creating XAsyncUDPDatagram, arguments are incorrects.')
 
     # ------------------------------------------------------------------------
 
+    def _close(self, closedReason=XClosedReason.Error, triggerOnClosed=True) :
+        try :
+            localAddr = self._socket.getsockname()
+        except :
+            localAddr = None
+        ret = super()._close(closedReason, triggerOnClosed)
+        if ret :
+            XAsyncSocket._removeUnixPath(localAddr)
+            if self._sessions :
+                self._expireSessions(None, 'closed')
+        return ret
+
+    # ------------------------------------------------------------------------
+
+    def _getEventCallback(self, eventName) :
+        if eventName == 'OnReadyForReading' :
+            return self._onDataRecv
+        if eventName == 'OnReadyForWriting' :
+            return self._onDataSent
+        return super()._getEventCallback(eventName)
+
+    # ------------------------------------------------------------------------
+
     def OnReadyForReading(self) :
         try :
             n, remoteAddr = self._socket.recvfrom_into(self._recvBufSlot.Buffer)
@@ -976,6 +4984,16 @@ class XAsyncUDPDatagram(XAsyncSocket) :
                 datagram        = memoryview(buf)
             except :
                 return True
+        self._bytesRecv += len(datagram)
+        self._msgsRecv  += 1
+        if self._sessions is not None :
+            session = self._getOrCreateSession(remoteAddr)
+            if session and session._onDatagram :
+                try :
+                    session._onDatagram(session, datagram)
+                except Exception as ex :
+                    raise XAsyncUDPDatagramException('Error when handling the "OnDatagram" event : %s' % ex)
+                return
         if self._onDataRecv :
             try :
                 self._onDataRecv(self, remoteAddr, datagram)
@@ -991,6 +5009,8 @@ class XAsyncUDPDatagram(XAsyncSocket) :
             try :
                 datagram, remoteAddr = self._wrDgramFiFo.Get()
                 self._socket.sendto(datagram, remoteAddr)
+                self._bytesSent += len(datagram)
+                self._msgsSent  += 1
             except :
                 if self._onFailsToSend :
                     try :
@@ -1010,7 +5030,8 @@ class XAsyncUDPDatagram(XAsyncSocket) :
     def AsyncSendDatagram(self, datagram, remoteAddr, onDataSent=None, onDataSentArg=None) :
         if self._socket :
             try :
-                if bytes([datagram[0]]) and len(remoteAddr) == 2 :
+                if bytes([datagram[0]]) and \
+                   (XAsyncSocket._isUnixAddr(remoteAddr) or len(remoteAddr) in (2, 4)) :
                     self._wrDgramFiFo.Put( (datagram, remoteAddr) )
                     self._onDataSent    = onDataSent
                     self._onDataSentArg = onDataSentArg
@@ -1023,6 +5044,131 @@ class XAsyncUDPDatagram(XAsyncSocket) :
 
     # ------------------------------------------------------------------------
 
+    def SetSessions(self, maxSessions, idleTimeoutSec=60) :
+        if maxSessions is None :
+            if self._sessions is not None :
+                self._expireSessions(None, 'disabled')
+                with self._sessionsLock :
+                    self._sessions = None
+                self._removeExpireTimeout()
+            return
+        if not isinstance(maxSessions, int) or maxSessions <= 0 :
+            raise XAsyncUDPDatagramException('SetSessions : "maxSessions" must be an integer greater than zero.')
+        if idleTimeoutSec is not None and idleTimeoutSec <= 0 :
+            raise XAsyncUDPDatagramException('SetSessions : "idleTimeoutSec" must be greater than zero.')
+        if self._sessionsLock is None :
+            self._sessionsLock = allocate_lock()
+        with self._sessionsLock :
+            if self._sessions is None :
+                self._sessions = OrderedDict()
+            self._sessionsMax    = maxSessions
+            self._sessionIdleSec = idleTimeoutSec
+        self._armSessionsTimeout()
+
+    # ------------------------------------------------------------------------
+
+    def GetSession(self, remoteAddr) :
+        sessions = self._sessions
+        return sessions.get(remoteAddr) if sessions is not None else None
+
+    # ------------------------------------------------------------------------
+
+    def _getOrCreateSession(self, remoteAddr) :
+        evicted = None
+        with self._sessionsLock :
+            sessions = self._sessions
+            if sessions is None :
+                return None
+            session = sessions.get(remoteAddr)
+            if session :
+                # Most recently active sessions are kept at the end,
+                del sessions[remoteAddr]
+                sessions[remoteAddr] = session
+                session._lastSec     = perf_counter()
+                return session
+            if len(sessions) >= self._sessionsMax :
+                evicted = sessions.pop(next(iter(sessions)))
+            session = XUDPSession(self, remoteAddr)
+            sessions[remoteAddr] = session
+            arm = (len(sessions) == 1)
+        if evicted :
+            evicted._expired('evicted')
+        if arm :
+            self._armSessionsTimeout()
+        if self._onSessionCreated :
+            try :
+                self._onSessionCreated(self, session)
+            except Exception as ex :
+                raise XAsyncUDPDatagramException('Error when handling the "OnSessionCreated" event : %s' % ex)
+        return session
+
+    # ------------------------------------------------------------------------
+
+    def _removeSession(self, session) :
+        with self._sessionsLock :
+            sessions = self._sessions
+            if sessions is not None and sessions.get(session._remoteAddr) is session :
+                del sessions[session._remoteAddr]
+                return True
+        return False
+
+    # ------------------------------------------------------------------------
+
+    def _armSessionsTimeout(self) :
+        # The pool timeout of the socket follows the least recently active
+        # session, the others can only expire later,
+        with self._sessionsLock :
+            sessions = self._sessions
+            if not sessions or self._sessionIdleSec is None :
+                expireTimeSec = None
+            else :
+                oldest        = sessions[next(iter(sessions))]
+                expireTimeSec = oldest._lastSec + self._sessionIdleSec
+        if expireTimeSec is None :
+            self._removeExpireTimeout()
+        else :
+            self._setExpireTimeSec(expireTimeSec)
+
+    # ------------------------------------------------------------------------
+
+    def _expireSessions(self, timeSec, reason) :
+        expired = [ ]
+        with self._sessionsLock :
+            sessions = self._sessions
+            if timeSec is not None and self._sessionIdleSec is None :
+                return
+            while sessions :
+                remoteAddr = next(iter(sessions))
+                session    = sessions[remoteAddr]
+                if timeSec is not None and session._lastSec + self._sessionIdleSec > timeSec :
+                    break
+                del sessions[remoteAddr]
+                expired.append(session)
+        # Already removed sessions are all notified even if a handler
+        # fails, the first error is raised afterwards,
+        error = None
+        for session in expired :
+            try :
+                session._expired(reason)
+            except Exception as ex :
+                if error is None :
+                    error = ex
+        if error is not None :
+            raise error
+
+    # ------------------------------------------------------------------------
+
+    def OnExpireTimeout(self) :
+        if self._sessions is None :
+            super().OnExpireTimeout()
+            return
+        try :
+            self._expireSessions(perf_counter(), 'idleTimeout')
+        finally :
+            self._armSessionsTimeout()
+
+    # ------------------------------------------------------------------------
+
     @property
     def LocalAddr(self) :
         try :
@@ -1044,12 +5190,414 @@ class XAsyncUDPDatagram(XAsyncSocket) :
     def OnFailsToSend(self, value) :
         self._onFailsToSend = value
 
+    @property
+    def SessionsCount(self) :
+        sessions = self._sessions
+        return len(sessions) if sessions is not None else 0
+
+    @property
+    def OnSessionCreated(self) :
+        return self._onSessionCreated
+    @OnSessionCreated.setter
+    def OnSessionCreated(self, value) :
+        self._onSessionCreated = value
+
+# ============================================================================
+# ===( XUDPSession )==========================================================
+# ============================================================================
+
+class XUDPSession :
+
+    __slots__ = ( '_xAsyncUDPDatagram', '_remoteAddr', '_lastSec', '_state',
+                  '_onDatagram', '_onSessionExpired' )
+
+    def __init__(self, xAsyncUDPDatagram, remoteAddr) :
+        self._xAsyncUDPDatagram = xAsyncUDPDatagram
+        self._remoteAddr        = remoteAddr
+        self._lastSec           = perf_counter()
+        self._state             = None
+        self._onDatagram        = None
+        self._onSessionExpired  = None
+
+    # ------------------------------------------------------------------------
+
+    def _expired(self, reason) :
+        if self._onSessionExpired :
+            try :
+                self._onSessionExpired(self, reason)
+            except Exception as ex :
+                raise XAsyncUDPDatagramException('Error when handling the "OnSessionExpired" event : %s' % ex)
+
+    # ------------------------------------------------------------------------
+
+    def AsyncSendDatagram(self, datagram, onDataSent=None, onDataSentArg=None) :
+        return self._xAsyncUDPDatagram.AsyncSendDatagram( datagram,
+                                                          self._remoteAddr,
+                                                          onDataSent,
+                                                          onDataSentArg )
+
+    # ------------------------------------------------------------------------
+
+    def Close(self) :
+        return self._xAsyncUDPDatagram._removeSession(self)
+
+    # ------------------------------------------------------------------------
+
+    @property
+    def UDPDatagram(self) :
+        return self._xAsyncUDPDatagram
+
+    @property
+    def RemoteAddr(self) :
+        return self._remoteAddr
+
+    @property
+    def IdleSec(self) :
+        return perf_counter() - self._lastSec
+
+    @property
+    def State(self) :
+        return self._state
+    @State.setter
+    def State(self, value) :
+        self._state = value
+
+    @property
+    def OnDatagram(self) :
+        return self._onDatagram
+    @OnDatagram.setter
+    def OnDatagram(self, value) :
+        self._onDatagram = value
+
+    @property
+    def OnSessionExpired(self) :
+        return self._onSessionExpired
+    @OnSessionExpired.setter
+    def OnSessionExpired(self, value) :
+        self._onSessionExpired = value
+
+# ============================================================================
+# ===( XAsyncDNSResolver )====================================================
+# ============================================================================
+
+class XAsyncDNSResolverException(Exception) :
+    pass
+
+class XAsyncDNSResolver :
+
+    def __init__(self, workersCount=2, cacheSize=256, cacheTTLSec=60, negativeTTLSec=5) :
+        if not isinstance(cacheSize, int) or cacheSize <= 0 :
+            raise XAsyncDNSResolverException('"cacheSize" must be an integer greater than zero.')
+        if cacheTTLSec < 0 or negativeTTLSec < 0 :
+            raise XAsyncDNSResolverException('"cacheTTLSec" and "negativeTTLSec" must be positive.')
+        self._cacheSize      = cacheSize
+        self._cacheTTLSec    = cacheTTLSec
+        self._negativeTTLSec = negativeTTLSec
+        self._lock           = allocate_lock()
+        self._cache          = OrderedDict()
+        self._pending        = { }
+        self._hits           = 0
+        self._misses         = 0
+        try :
+            self._workers = MicroWorkers(workersCount=workersCount)
+        except Exception as ex :
+            raise XAsyncDNSResolverException('Error to create resolver workers : %s' % ex)
+
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def IsIPAddress(host) :
+        if not isinstance(host, str) :
+            return False
+        if hasattr(socket, 'inet_pton') :
+            for af in (socket.AF_INET, getattr(socket, 'AF_INET6', None)) :
+                if af is not None :
+                    try :
+                        socket.inet_pton(af, host)
+                        return True
+                    except :
+                        pass
+            return False
+        parts = host.split('.')
+        return ( len(parts) == 4 and \
+                 all(p.isdigit() and int(p) < 256 for p in parts) )
+
+    # ------------------------------------------------------------------------
+
+    def _cacheGet(self, key) :
+        with self._lock :
+            entry = self._cache.get(key)
+            if entry is not None :
+                if perf_counter() < entry[0] :
+                    # Moves the entry to the most recently used position,
+                    del self._cache[key]
+                    self._cache[key] = entry
+                    self._hits += 1
+                    return entry[1]
+                del self._cache[key]
+            self._misses += 1
+        return None
+
+    # ------------------------------------------------------------------------
+
+    def _cacheSet(self, key, addrs) :
+        ttlSec = self._cacheTTLSec if addrs else self._negativeTTLSec
+        if ttlSec <= 0 :
+            return
+        with self._lock :
+            if key in self._cache :
+                del self._cache[key]
+            elif len(self._cache) >= self._cacheSize :
+                del self._cache[next(iter(self._cache))]
+            self._cache[key] = (perf_counter() + ttlSec, addrs)
+
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def _getAddrInfo(host, port, family) :
+        addrs = [ ]
+        try :
+            try :
+                infos = socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)
+            except :
+                infos = socket.getaddrinfo(host, port)
+            for info in infos :
+                addr = (info[0], info[-1])
+                if (not family or info[0] == family) and addr not in addrs :
+                    addrs.append(addr)
+        except :
+            pass
+        return addrs
+
+    # ------------------------------------------------------------------------
+
+    def _resolveJob(self, key) :
+        addrs = self._getAddrInfo(key[0], key[1], key[2])
+        self._cacheSet(key, addrs)
+        with self._lock :
+            callbacks = self._pending.pop(key, ())
+        for onResolved, onResolvedArg in callbacks :
+            try :
+                onResolved(self, addrs, onResolvedArg)
+            except :
+                pass
+
+    # ------------------------------------------------------------------------
+
+    def _startLookup(self, key, onResolved, onResolvedArg) :
+        with self._lock :
+            callbacks = self._pending.get(key)
+            if callbacks is not None :
+                # A lookup of the same name is already running, waits for it,
+                callbacks.append( (onResolved, onResolvedArg) )
+                return
+            self._pending[key] = [ (onResolved, onResolvedArg) ]
+        self._workers.AddJob(self._resolveJob, key)
+
+    # ------------------------------------------------------------------------
+
+    def GetCached(self, host, port, family=0) :
+        if XAsyncDNSResolver.IsIPAddress(host) :
+            if not family :
+                family = socket.AF_INET6 if ':' in host else socket.AF_INET
+            return [ (family, (host, port)) ]
+        return self._cacheGet( (host, port, family) )
+
+    # ------------------------------------------------------------------------
+
+    def Resolve(self, host, port, onResolved, onResolvedArg=None, family=0) :
+        if not onResolved :
+            raise XAsyncDNSResolverException('Resolve : "onResolved" is incorrect.')
+        addrs = self.GetCached(host, port, family)
+        if addrs is not None :
+            onResolved(self, addrs, onResolvedArg)
+        else :
+            self._startLookup( (host, port, family), onResolved, onResolvedArg )
+
+    # ------------------------------------------------------------------------
+
+    def ResolveSync(self, host, port, family=0) :
+        addrs = self.GetCached(host, port, family)
+        if addrs is None :
+            addrs = self._getAddrInfo(host, port, family)
+            self._cacheSet((host, port, family), addrs)
+        return addrs
+
+    # ------------------------------------------------------------------------
+
+    def ClearCache(self) :
+        with self._lock :
+            self._cache.clear()
+
+    # ------------------------------------------------------------------------
+
+    def Stop(self) :
+        self._workers.StopAll()
+
+    # ------------------------------------------------------------------------
+
+    @property
+    def CacheSize(self) :
+        return self._cacheSize
+
+    @property
+    def CachedCount(self) :
+        return len(self._cache)
+
+    @property
+    def Hits(self) :
+        return self._hits
+
+    @property
+    def Misses(self) :
+        return self._misses
+
+# ============================================================================
+# ===( XSocketOptions )=======================================================
+# ============================================================================
+
+class XSocketOptionsException(Exception) :
+    pass
+
+class XSocketOptions :
+
+    _PRESETS = {
+        'low-latency'     : { 'noDelay'     : True,
+                              'quickAck'    : True,
+                              'tos'         : 0x10 },
+        'bulk-throughput' : { 'noDelay'     : False,
+                              'recvBufSize' : 1048576,
+                              'sendBufSize' : 1048576,
+                              'tos'         : 0x08 }
+    }
+
+    def __init__( self,
+                  noDelay              = None,
+                  recvBufSize          = None,
+                  sendBufSize          = None,
+                  quickAck             = None,
+                  deferAcceptSec       = None,
+                  fastOpen             = None,
+                  keepAlive            = None,
+                  keepAliveIdleSec     = None,
+                  keepAliveIntervalSec = None,
+                  keepAliveCount       = None,
+                  tos                  = None ) :
+        self._options = { 'noDelay'              : noDelay,
+                          'recvBufSize'          : recvBufSize,
+                          'sendBufSize'          : sendBufSize,
+                          'quickAck'             : quickAck,
+                          'deferAcceptSec'       : deferAcceptSec,
+                          'fastOpen'             : fastOpen,
+                          'keepAlive'            : keepAlive,
+                          'keepAliveIdleSec'     : keepAliveIdleSec,
+                          'keepAliveIntervalSec' : keepAliveIntervalSec,
+                          'keepAliveCount'       : keepAliveCount,
+                          'tos'                  : tos }
+        for name, value in self._options.items() :
+            if value is not None and not isinstance(value, (bool, int)) :
+                raise XSocketOptionsException('XSocketOptions : "%s" is incorrect.' % name)
+        self._skipped = [ ]
+
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def Preset(name, **options) :
+        preset = XSocketOptions._PRESETS.get(name)
+        if preset is None :
+            raise XSocketOptionsException('Preset : Unknown preset "%s".' % name)
+        preset = dict(preset)
+        preset.update(options)
+        return XSocketOptions(**preset)
+
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def _get(socketOptions) :
+        if socketOptions is None or isinstance(socketOptions, XSocketOptions) :
+            return socketOptions
+        if isinstance(socketOptions, str) :
+            return XSocketOptions.Preset(socketOptions)
+        if isinstance(socketOptions, dict) :
+            return XSocketOptions(**socketOptions)
+        raise XSocketOptionsException('"socketOptions" must be a XSocketOptions, a preset name or a dict.')
+
+    # ------------------------------------------------------------------------
+
+    def _setOpt(self, sock, levelName, optName, value, optionName) :
+        level = getattr(socket, levelName, None)
+        opt   = getattr(socket, optName, None)
+        if level is None or opt is None :
+            if optionName not in self._skipped :
+                self._skipped.append(optionName)
+            return False
+        try :
+            sock.setsockopt(level, opt, int(value))
+            return True
+        except :
+            if optionName not in self._skipped :
+                self._skipped.append(optionName)
+            return False
+
+    # ------------------------------------------------------------------------
+
+    def _apply(self, sock, isListener=False, isOutbound=False) :
+        # Options not set are left to the system defaults and unsupported
+        # ones (system or socket type) are skipped,
+        opts     = self._options
+        isStream = (getattr(sock, 'type', socket.SOCK_STREAM) == socket.SOCK_STREAM)
+        if opts['recvBufSize'] is not None :
+            self._setOpt(sock, 'SOL_SOCKET', 'SO_RCVBUF', opts['recvBufSize'], 'recvBufSize')
+        if opts['sendBufSize'] is not None :
+            self._setOpt(sock, 'SOL_SOCKET', 'SO_SNDBUF', opts['sendBufSize'], 'sendBufSize')
+        if opts['tos'] is not None :
+            if getattr(sock, 'family', None) == getattr(socket, 'AF_INET6', None) :
+                self._setOpt(sock, 'IPPROTO_IPV6', 'IPV6_TCLASS', opts['tos'], 'tos')
+            else :
+                self._setOpt(sock, 'IPPROTO_IP', 'IP_TOS', opts['tos'], 'tos')
+        if not isStream :
+            return
+        if opts['noDelay'] is not None :
+            self._setOpt(sock, 'IPPROTO_TCP', 'TCP_NODELAY', opts['noDelay'], 'noDelay')
+        if opts['keepAlive'] is not None :
+            self._setOpt(sock, 'SOL_SOCKET', 'SO_KEEPALIVE', opts['keepAlive'], 'keepAlive')
+        if opts['keepAliveIdleSec'] is not None :
+            optName = 'TCP_KEEPIDLE' if hasattr(socket, 'TCP_KEEPIDLE') else 'TCP_KEEPALIVE'
+            self._setOpt(sock, 'IPPROTO_TCP', optName, opts['keepAliveIdleSec'], 'keepAliveIdleSec')
+        if opts['keepAliveIntervalSec'] is not None :
+            self._setOpt(sock, 'IPPROTO_TCP', 'TCP_KEEPINTVL', opts['keepAliveIntervalSec'], 'keepAliveIntervalSec')
+        if opts['keepAliveCount'] is not None :
+            self._setOpt(sock, 'IPPROTO_TCP', 'TCP_KEEPCNT', opts['keepAliveCount'], 'keepAliveCount')
+        if isListener :
+            if opts['deferAcceptSec'] is not None :
+                self._setOpt(sock, 'IPPROTO_TCP', 'TCP_DEFER_ACCEPT', opts['deferAcceptSec'], 'deferAcceptSec')
+            if opts['fastOpen'] is not None :
+                # Length of the pending TFO requests queue (0 disables it),
+                self._setOpt(sock, 'IPPROTO_TCP', 'TCP_FASTOPEN', int(opts['fastOpen']), 'fastOpen')
+        else :
+            if opts['quickAck'] is not None :
+                self._setOpt(sock, 'IPPROTO_TCP', 'TCP_QUICKACK', opts['quickAck'], 'quickAck')
+            if opts['fastOpen'] and isOutbound :
+                self._setOpt(sock, 'IPPROTO_TCP', 'TCP_FASTOPEN_CONNECT', 1, 'fastOpen')
+
+    # ------------------------------------------------------------------------
+
+    @property
+    def Options(self) :
+        return dict(self._options)
+
+    @property
+    def Skipped(self) :
+        return list(self._skipped)
+
 # ============================================================================
 # ===( XBufferSlot )==========================================================
 # ============================================================================
 
 class XBufferSlot :
 
+    __slots__ = ('_available', '_size', '_keepAlloc', '_buffer')
+
     def __init__(self, size, keepAlloc=True) :
         self._available = True
         self._size      = size
@@ -1120,8 +5668,18 @@ class XBufferSlots :
 class XFiFoException(Exception) :
     pass
 
+class _XFiFoNode :
+
+    __slots__ = ('_obj', '_next')
+
+    def __init__(self, obj) :
+        self._obj  = obj
+        self._next = None
+
 class XFiFo :
 
+    __slots__ = ('_lock', '_first', '_last')
+
     def __init__(self) :
         self._lock  = allocate_lock()
         self._first = None
@@ -1130,18 +5688,18 @@ class XFiFo :
     def Put(self, obj) :
         self._lock.acquire()
         if self._first :
-            self._last[1] = [obj, None]
-            self._last    = self._last[1]
+            self._last._next = _XFiFoNode(obj)
+            self._last       = self._last._next
         else :
-            self._last  = [obj, None]
+            self._last  = _XFiFoNode(obj)
             self._first = self._last
         self._lock.release()
 
     def Get(self) :
         self._lock.acquire()
         if self._first :
-            obj         = self._first[0]
-            self._first = self._first[1]
+            obj         = self._first._obj
+            self._first = self._first._next
             self._lock.release()
             return obj
         else :
@@ -0,0 +1,949 @@
+"""
+The MIT License (MIT)
+Copyright © 2019 Jean-Christophe Bos & HC² (www.hc2.fr)
+"""
+
+# Loopback benchmarks of XAsyncSockets.
+#
+# Each benchmark runs for every combination of "threadsCount" and buffer
+# slots size and writes one JSON object per line (JSON Lines) :
+#
+#   python benchmarks/benchSuite.py --threads 1,2 --slots 1024,4096 --output results.jsonl
+#   python benchmarks/benchSuite.py --compare results.jsonl --tolerance 0.15
+#
+# With "--compare", each result is checked against the results file of a
+# previous version and regressions greater than the tolerance are reported
+# (exit code 1).
+
+import os
+import sys
+import gc
+import json
+import socket
+import struct
+import argparse
+import platform
+import threading
+import tempfile
+import py_compile
+import subprocess
+from   time import perf_counter, sleep
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from XAsyncSockets import XAsyncSocketsPool, XAsyncTCPServer, XAsyncTCPClient, \
+                          XAsyncUDPDatagram, XBufferSlots, XSocketOptions, XWebSocket
+
+try :
+    import tracemalloc
+except :
+    tracemalloc = None
+
+# ============================================================================
+# ===( Helpers )==============================================================
+# ============================================================================
+
+def percentile(values, pct) :
+    if not values :
+        return None
+    values = sorted(values)
+    idx    = int(round((pct / 100.0) * (len(values) - 1)))
+    return values[idx]
+
+def createServer(pool, slotsCount, slotsSize, srvAddr=('127.0.0.1', 0), socketOptions=None) :
+    srv = XAsyncTCPServer.Create( pool,
+                                  srvAddr,
+                                  bufSlots      = XBufferSlots(slotsCount, slotsSize),
+                                  socketOptions = socketOptions )
+    return srv, srv.GetSocketObj().getsockname()
+
+def waitUntil(condition, timeoutSec) :
+    endSec = perf_counter() + timeoutSec
+    while not condition() and perf_counter() < endSec :
+        sleep(0.005)
+    return condition()
+
+# ============================================================================
+# ===( Benchmarks )===========================================================
+# ============================================================================
+
+def benchTCPEcho(pool, threadsCount, slotsSize, opts, srvAddr=('127.0.0.1', 0)) :
+    msgSize   = min(opts.msgSize, slotsSize)
+    payload   = b'x' * msgSize
+    latencies = [ ]
+    running   = [ True ]
+
+    def onSrvDataRecv(cli, data, arg) :
+        cli.AsyncSendData(bytes(data))
+        cli.AsyncRecvData(msgSize, onSrvDataRecv)
+
+    def onAccepted(srv, cli) :
+        cli.AsyncRecvData(msgSize, onSrvDataRecv)
+
+    def sendNext(cli) :
+        cli.State = perf_counter()
+        cli.AsyncSendData(payload)
+        cli.AsyncRecvData(msgSize, onCliDataRecv)
+
+    def onCliDataRecv(cli, data, arg) :
+        latencies.append(perf_counter() - cli.State)
+        if running[0] :
+            sendNext(cli)
+
+    srv, srvAddr = createServer(pool, opts.clients * 2, slotsSize, srvAddr)
+    srv.OnClientAccepted = onAccepted
+    pool.AsyncWaitEvents(threadsCount=threadsCount)
+    startSec = perf_counter()
+    for _ in range(opts.clients) :
+        cli = XAsyncTCPClient.Create(pool, srvAddr, recvBufLen=slotsSize, sendBufLen=slotsSize)
+        if cli :
+            cli.OnConnected = sendNext
+    sleep(opts.duration)
+    running[0] = False
+    elapsedSec = perf_counter() - startSec
+    pool.StopWaitEvents()
+    srv.Close()
+    count = len(latencies)
+    return { 'messages'     : count,
+             'messagesSec'  : count / elapsedSec,
+             'mbytesSec'    : count * msgSize * 2 / elapsedSec / 1048576,
+             'latencyP50Ms' : (percentile(latencies, 50) or 0) * 1000,
+             'latencyP99Ms' : (percentile(latencies, 99) or 0) * 1000 }
+
+# ----------------------------------------------------------------------------
+
+def benchUnixEcho(pool, threadsCount, slotsSize, opts) :
+    # Same as "tcpEcho" over a Unix domain socket (same-host IPC),
+    if not hasattr(socket, 'AF_UNIX') :
+        return None
+    path = os.path.join(tempfile.gettempdir(), 'xasyncsockets-bench-%d.sock' % os.getpid())
+    return benchTCPEcho(pool, threadsCount, slotsSize, opts, path)
+
+# ----------------------------------------------------------------------------
+
+def benchAcceptChurn(pool, threadsCount, slotsSize, opts, recycling=False) :
+    counts  = [0, 0]
+    running = [ True ]
+
+    def onAccepted(srv, cli) :
+        # Waits for the peer closing to release the buffer slots,
+        cli.AsyncRecvData(1)
+
+    def connectOne() :
+        cli = XAsyncTCPClient.Create(pool, srvAddr, recvBufLen=slotsSize, sendBufLen=slotsSize)
+        if cli :
+            cli.OnConnected      = onConnected
+            cli.OnFailsToConnect = onFailsToConnect
+        else :
+            counts[1] += 1
+
+    def onConnected(cli) :
+        counts[0] += 1
+        cli.Close()
+        if running[0] :
+            connectOne()
+
+    def onFailsToConnect(cli) :
+        counts[1] += 1
+        if running[0] :
+            connectOne()
+
+    srv, srvAddr = createServer(pool, opts.clients * 4, slotsSize)
+    srv.OnClientAccepted = onAccepted
+    if recycling :
+        srv.SetClientsRecycling(opts.clients)
+    pool.AsyncWaitEvents(threadsCount=threadsCount)
+    gcCount  = sum(stats['collections'] for stats in gc.get_stats())
+    startSec = perf_counter()
+    for _ in range(opts.clients) :
+        connectOne()
+    sleep(opts.duration)
+    running[0] = False
+    elapsedSec = perf_counter() - startSec
+    gcCount    = sum(stats['collections'] for stats in gc.get_stats()) - gcCount
+    pool.StopWaitEvents()
+    srv.Close()
+    return { 'connections'    : counts[0],
+             'failures'       : counts[1],
+             'connectionsSec' : counts[0] / elapsedSec,
+             'gcPer1000'      : gcCount * 1000.0 / max(1, counts[0]),
+             'recycled'       : srv.RecycledCount }
+
+# ----------------------------------------------------------------------------
+
+def benchAcceptChurnRecycled(pool, threadsCount, slotsSize, opts) :
+    # Same as "acceptChurn" with the closed server side clients recycled,
+    return benchAcceptChurn(pool, threadsCount, slotsSize, opts, recycling=True)
+
+# ----------------------------------------------------------------------------
+
+def benchRecvLine(pool, threadsCount, slotsSize, opts) :
+    line    = b'y' * (min(opts.lineSize, slotsSize) - 2) + b'\r\n'
+    chunk   = line * max(1, 16384 // len(line))
+    lines   = [0]
+    running = [ True ]
+
+    def onLineRecv(cli, l, arg) :
+        lines[0] += 1
+        cli.AsyncRecvLine(onLineRecv=onLineRecv)
+
+    def onAccepted(srv, cli) :
+        cli.AsyncRecvLine(onLineRecv=onLineRecv)
+
+    def onDataSent(cli, arg) :
+        if running[0] :
+            cli.AsyncSendData(chunk, onDataSent)
+
+    srv, srvAddr = createServer(pool, 4, slotsSize)
+    srv.OnClientAccepted = onAccepted
+    pool.AsyncWaitEvents(threadsCount=threadsCount)
+    startSec = perf_counter()
+    cli = XAsyncTCPClient.Create(pool, srvAddr, recvBufLen=slotsSize, sendBufLen=slotsSize)
+    cli.OnConnected = lambda cli : onDataSent(cli, None)
+    sleep(opts.duration)
+    running[0] = False
+    elapsedSec = perf_counter() - startSec
+    pool.StopWaitEvents()
+    return { 'lines'    : lines[0],
+             'linesSec' : lines[0] / elapsedSec }
+
+# ----------------------------------------------------------------------------
+
+def benchRecvFrames(pool, threadsCount, slotsSize, opts, into=False) :
+    # Frames of "--frame-size" bytes received into a preallocated destination,
+    frame   = b'f' * opts.frameSize
+    dest    = bytearray(opts.frameSize)
+    frames  = [0]
+    running = [ True ]
+
+    def onFrameRecv(cli, data, arg) :
+        if not into :
+            dest[:] = data
+        frames[0] += 1
+        recvFrame(cli)
+
+    def recvFrame(cli) :
+        if into :
+            cli.AsyncRecvInto(dest, onFrameRecv)
+        else :
+            cli.AsyncRecvData(opts.frameSize, onFrameRecv)
+
+    def onDataSent(cli, arg) :
+        if running[0] :
+            cli.AsyncSendData(frame, onDataSent)
+
+    srv, srvAddr = createServer(pool, 4, slotsSize)
+    srv.OnClientAccepted = lambda srv, cli : recvFrame(cli)
+    pool.AsyncWaitEvents(threadsCount=threadsCount)
+    startSec = perf_counter()
+    cli = XAsyncTCPClient.Create(pool, srvAddr, recvBufLen=slotsSize, sendBufLen=slotsSize)
+    cli.OnConnected = lambda cli : onDataSent(cli, None)
+    sleep(opts.duration)
+    running[0] = False
+    elapsedSec = perf_counter() - startSec
+    pool.StopWaitEvents()
+    srv.Close()
+    return { 'frames'    : frames[0],
+             'mbytesSec' : frames[0] * opts.frameSize / elapsedSec / 1048576 }
+
+# ----------------------------------------------------------------------------
+
+def benchRecvDataCopy(pool, threadsCount, slotsSize, opts) :
+    # "AsyncRecvData" then a copy to the destination,
+    return benchRecvFrames(pool, threadsCount, slotsSize, opts, into=False)
+
+# ----------------------------------------------------------------------------
+
+def benchRecvInto(pool, threadsCount, slotsSize, opts) :
+    # "AsyncRecvInto" directly in the destination,
+    return benchRecvFrames(pool, threadsCount, slotsSize, opts, into=True)
+
+# ----------------------------------------------------------------------------
+
+def benchRelay(pool, threadsCount, slotsSize, opts, mode) :
+    # Source -> relay server -> sink server, the relay forwards with
+    # "AsyncRecvData" and "AsyncSendData" ("copy") or with "BridgeTo",
+    chunk    = b'r' * 65536
+    sinkBuf  = bytearray(65536)
+    received = [0]
+    running  = [ True ]
+
+    def onSinkRecv(cli, data, arg) :
+        received[0] += len(data)
+        cli.AsyncRecvInto(sinkBuf, onSinkRecv)
+
+    def onRelayAccepted(srv, cliA) :
+        cliB = XAsyncTCPClient.Create(pool, sinkAddr, recvBufLen=slotsSize, sendBufLen=slotsSize)
+        cliB.OnConnected = lambda cliB : startRelay(cliA, cliB)
+
+    def startRelay(cliA, cliB) :
+        if mode == 'copy' :
+            onRelaySent(cliB, cliA)
+        else :
+            cliA.BridgeTo(cliB, zeroCopy=(mode == 'splice'))
+
+    def onRelayRecv(cliA, data, cliB) :
+        cliB.AsyncSendData(data, onRelaySent, cliA)
+
+    def onRelaySent(cliB, cliA) :
+        cliA.AsyncRecvData(slotsSize, onRelayRecv, cliB)
+
+    def onDataSent(cli, arg) :
+        if running[0] :
+            cli.AsyncSendData(chunk, onDataSent)
+
+    sink, sinkAddr = createServer(pool, 4, slotsSize)
+    sink.OnClientAccepted = lambda srv, cli : cli.AsyncRecvInto(sinkBuf, onSinkRecv)
+    relay, relayAddr = createServer(pool, 4, slotsSize)
+    relay.OnClientAccepted = onRelayAccepted
+    pool.AsyncWaitEvents(threadsCount=threadsCount)
+    startSec = perf_counter()
+    cli = XAsyncTCPClient.Create(pool, relayAddr, recvBufLen=slotsSize, sendBufLen=slotsSize)
+    cli.OnConnected = lambda cli : onDataSent(cli, None)
+    sleep(opts.duration)
+    running[0] = False
+    elapsedSec = perf_counter() - startSec
+    pool.StopWaitEvents()
+    sink.Close()
+    relay.Close()
+    return { 'mbytes'    : received[0] / 1048576,
+             'mbytesSec' : received[0] / elapsedSec / 1048576 }
+
+# ----------------------------------------------------------------------------
+
+def benchRelayCopy(pool, threadsCount, slotsSize, opts) :
+    return benchRelay(pool, threadsCount, slotsSize, opts, 'copy')
+
+# ----------------------------------------------------------------------------
+
+def benchBridgeBuffer(pool, threadsCount, slotsSize, opts) :
+    return benchRelay(pool, threadsCount, slotsSize, opts, 'buffer')
+
+# ----------------------------------------------------------------------------
+
+def benchBridgeSplice(pool, threadsCount, slotsSize, opts) :
+    if not hasattr(os, 'splice') :
+        return None
+    return benchRelay(pool, threadsCount, slotsSize, opts, 'splice')
+
+# ----------------------------------------------------------------------------
+
+HTTP_REQUEST  = ( b'GET /bench?id=1 HTTP/1.1\r\n'
+                  b'Host: 127.0.0.1\r\n'
+                  b'User-Agent: benchSuite\r\n'
+                  b'Accept: */*\r\n'
+                  b'Accept-Encoding: gzip, deflate\r\n'
+                  b'Connection: keep-alive\r\n\r\n' )
+HTTP_BODY     = b'z' * 64
+HTTP_RESPONSE = ( b'HTTP/1.1 200 OK\r\n'
+                  b'Content-Type: text/plain\r\n'
+                  b'Content-Length: %d\r\n\r\n' % len(HTTP_BODY) ) + HTTP_BODY
+
+def benchHTTP(pool, threadsCount, slotsSize, opts, lines=False) :
+    # Keep-alive clients sending "--http-pipeline" requests at once, the
+    # server parses them with "AsyncRecvLine" or with "StartHTTP",
+    depth    = opts.httpPipeline
+    requests = [0]
+    running  = [ True ]
+
+    def onLineRecv(cli, line, arg) :
+        if line :
+            if cli.State is None :
+                cli.State = { 'request' : line.split(' ') }
+            else :
+                name, _, value = line.partition(':')
+                cli.State[name.strip().lower()] = value.strip()
+        else :
+            cli.State = None
+            cli.AsyncSendData(HTTP_RESPONSE)
+        cli.AsyncRecvLine(onLineRecv=onLineRecv)
+
+    def onRequest(httpConn, request, arg) :
+        request.SendResponse(200, { 'Content-Type' : 'text/plain' }, HTTP_BODY)
+
+    def onAccepted(srv, cli) :
+        if lines :
+            cli.AsyncRecvLine(onLineRecv=onLineRecv)
+        else :
+            cli.StartHTTP(onRequest, keepAliveSec=None, maxPipelined=depth)
+
+    def sendNext(cli) :
+        cli.AsyncSendData(HTTP_REQUEST * depth)
+        cli.AsyncRecvData(len(HTTP_RESPONSE) * depth, onCliDataRecv)
+
+    def onCliDataRecv(cli, data, arg) :
+        requests[0] += depth
+        if running[0] :
+            sendNext(cli)
+
+    srv, srvAddr = createServer(pool, opts.clients * 2, slotsSize)
+    srv.OnClientAccepted = onAccepted
+    pool.AsyncWaitEvents(threadsCount=threadsCount)
+    startSec = perf_counter()
+    for _ in range(opts.clients) :
+        cli = XAsyncTCPClient.Create(pool, srvAddr, recvBufLen=slotsSize, sendBufLen=slotsSize)
+        if cli :
+            cli.OnConnected = sendNext
+    sleep(opts.duration)
+    running[0] = False
+    elapsedSec = perf_counter() - startSec
+    pool.StopWaitEvents()
+    srv.Close()
+    return { 'requests'    : requests[0],
+             'requestsSec' : requests[0] / elapsedSec,
+             'pipeline'    : depth }
+
+# ----------------------------------------------------------------------------
+
+def benchHTTPLines(pool, threadsCount, slotsSize, opts) :
+    return benchHTTP(pool, threadsCount, slotsSize, opts, lines=True)
+
+# ----------------------------------------------------------------------------
+
+def benchHTTPServer(pool, threadsCount, slotsSize, opts) :
+    return benchHTTP(pool, threadsCount, slotsSize, opts, lines=False)
+
+# ----------------------------------------------------------------------------
+
+WS_MASK = b'\x37\xfa\x21\x3d'
+
+def unmaskBytewise(data, mask) :
+    # The usual pure Python unmasking, one byte at a time,
+    return bytes( b ^ mask[i & 3] for i, b in enumerate(data) )
+
+def wsFrame(payload, mask=None) :
+    n = len(payload)
+    if n < 126 :
+        header = bytes((0x82, n | (0x80 if mask else 0)))
+    elif n < 65536 :
+        header = struct.pack('!BBH', 0x82, 126 | (0x80 if mask else 0), n)
+    else :
+        header = struct.pack('!BBQ', 0x82, 127 | (0x80 if mask else 0), n)
+    if mask :
+        return header + mask + unmaskBytewise(payload, mask)
+    return header + payload
+
+def benchWSUnmask(pool, threadsCount, slotsSize, opts) :
+    # Unmasking of "--ws-frame-size" payloads, byte by byte and in bulk
+    # (the pool is not used),
+    payload = os.urandom(opts.wsFrameSize)
+    rates   = { }
+    for name, unmask in ( ('bytewise', unmaskBytewise),
+                          ('bulk',     XWebSocket._unmask) ) :
+        count    = 0
+        startSec = perf_counter()
+        endSec   = startSec + opts.duration / 2
+        while perf_counter() < endSec :
+            unmask(payload, WS_MASK)
+            count += 1
+        rates[name] = count * len(payload) / (perf_counter() - startSec) / 1048576
+    return { 'frameSize'         : len(payload),
+             'mbytesSec'         : rates['bulk'],
+             'bytewiseMBytesSec' : rates['bytewise'],
+             'speedup'           : rates['bulk'] / rates['bytewise'] }
+
+# ----------------------------------------------------------------------------
+
+def benchWSFrames(pool, threadsCount, slotsSize, opts) :
+    # Clients sending 16 masked frames at once to a server echoing each
+    # message, without Nagle delays on the echoed frames,
+    payload   = os.urandom(opts.wsFrameSize)
+    batch     = wsFrame(payload, WS_MASK) * 16
+    echoLen   = len(wsFrame(payload)) * 16
+    handshake = ( b'GET /ws HTTP/1.1\r\n'
+                  b'Host: 127.0.0.1\r\n'
+                  b'Upgrade: websocket\r\n'
+                  b'Connection: Upgrade\r\n'
+                  b'Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n'
+                  b'Sec-WebSocket-Version: 13\r\n\r\n' )
+    frames    = [0]
+    running   = [ True ]
+
+    def onMessage(webSocket, message, arg) :
+        webSocket.SendBinary(message)
+
+    def onRequest(httpConn, request, arg) :
+        request.UpgradeToWebSocket(onMessage)
+
+    def onAccepted(srv, cli) :
+        cli.StartHTTP(onRequest, keepAliveSec=None)
+
+    def onConnected(cli) :
+        cli.AsyncSendData(handshake)
+        cli.AsyncRecvLine(onLineRecv=onHandshakeLine)
+
+    def onHandshakeLine(cli, line, arg) :
+        if line :
+            cli.AsyncRecvLine(onLineRecv=onHandshakeLine)
+        else :
+            sendNext(cli)
+
+    def sendNext(cli) :
+        cli.AsyncSendData(batch)
+        cli.AsyncRecvData(echoLen, onEchoRecv)
+
+    def onEchoRecv(cli, data, arg) :
+        frames[0] += 16
+        if running[0] :
+            sendNext(cli)
+
+    srv, srvAddr = createServer( pool, opts.clients * 2, slotsSize,
+                                 socketOptions = XSocketOptions.Preset('low-latency') )
+    srv.OnClientAccepted = onAccepted
+    pool.AsyncWaitEvents(threadsCount=threadsCount)
+    startSec = perf_counter()
+    for _ in range(opts.clients) :
+        cli = XAsyncTCPClient.Create(pool, srvAddr, recvBufLen=slotsSize, sendBufLen=slotsSize)
+        if cli :
+            cli.OnConnected = onConnected
+    sleep(opts.duration)
+    running[0] = False
+    elapsedSec = perf_counter() - startSec
+    pool.StopWaitEvents()
+    srv.Close()
+    return { 'frames'    : frames[0],
+             'frameSize' : len(payload),
+             'framesSec' : frames[0] / elapsedSec,
+             'mbytesSec' : frames[0] * len(payload) / elapsedSec / 1048576 }
+
+# ----------------------------------------------------------------------------
+
+def benchCompression(pool, threadsCount, slotsSize, opts) :
+    # One client streams JSON records through a compression stage, the
+    # server decompresses them, the rate is counted in uncompressed bytes,
+    records  = [ '{"id":%d,"name":"sensor-%d","status":"ok","value":%d.%02d}'
+                 % (i, i % 64, i * 7 % 1000, i % 100) for i in range(4096) ]
+    payload  = ('[' + ','.join(records) + ']').encode()[:opts.compressMsgSize]
+    received = [0]
+    running  = [ True ]
+    stages   = [ ]
+
+    def onPlainRecv(stage, data, arg) :
+        received[0] += len(data)
+
+    def onAccepted(srv, cli) :
+        stages.append(cli.StartCompression(onPlainRecv))
+
+    def onConnected(cli) :
+        cli.StartCompression(onPlainRecv)
+        onDataSent(cli, None)
+
+    def onDataSent(cli, arg) :
+        if running[0] :
+            cli.AsyncSendData(payload, onDataSent)
+
+    srv, srvAddr = createServer(pool, 4, slotsSize)
+    srv.OnClientAccepted = onAccepted
+    pool.AsyncWaitEvents(threadsCount=threadsCount)
+    startSec = perf_counter()
+    cli = XAsyncTCPClient.Create(pool, srvAddr, recvBufLen=slotsSize, sendBufLen=slotsSize)
+    cli.OnConnected = onConnected
+    sleep(opts.duration)
+    running[0] = False
+    elapsedSec = perf_counter() - startSec
+    pool.StopWaitEvents()
+    srv.Close()
+    if not stages :
+        return None
+    stage = stages[0]
+    return { 'msgSize'       : len(payload),
+             'mbytes'        : received[0] / 1048576,
+             'mbytesSec'     : received[0] / elapsedSec / 1048576,
+             'wireMBytesSec' : stage.WireBytesRecv / elapsedSec / 1048576,
+             'ratio'         : stage.RecvRatio }
+
+# ----------------------------------------------------------------------------
+
+def benchBroadcast(pool, threadsCount, slotsSize, opts) :
+    # This thread publishes batches of 16 messages to "--subscribers"
+    # accepted clients, one client at a time with "AsyncSendData" or with
+    # "Broadcast", and waits until the subscribers received them,
+    payload  = os.urandom(min(opts.msgSize, slotsSize))
+    accepted = [ ]
+    counter  = [0, 0]
+    lock     = threading.Lock()
+    done     = threading.Event()
+
+    def onRecv(cli, data, arg) :
+        with lock :
+            counter[0] += 1
+            if counter[0] >= counter[1] :
+                done.set()
+        cli.AsyncRecvData(len(payload), onRecv)
+
+    srv, srvAddr = createServer(pool, opts.subscribers * 2 + 8, slotsSize)
+    srv.OnClientAccepted = lambda srv, cli : accepted.append(cli)
+    pool.AsyncWaitEvents(threadsCount=threadsCount)
+    for _ in range(opts.subscribers) :
+        cli = XAsyncTCPClient.Create(pool, srvAddr, recvBufLen=slotsSize, sendBufLen=slotsSize)
+        if cli :
+            cli.AsyncRecvData(len(payload), onRecv)
+    if not waitUntil(lambda : len(accepted) == opts.subscribers, 10) :
+        pool.StopWaitEvents()
+        srv.Close()
+        return None
+    rates   = { }
+    wakeUps = { }
+    for mode in ('send', 'broadcast') :
+        count     = 0
+        startWake = pool.GetMetrics()['wakeUpsCount']
+        startSec  = perf_counter()
+        endSec    = startSec + opts.duration / 2
+        while perf_counter() < endSec :
+            with lock :
+                done.clear()
+                counter[1] = counter[0] + 16 * len(accepted)
+            for _ in range(16) :
+                if mode == 'broadcast' :
+                    pool.Broadcast(accepted, payload)
+                else :
+                    for cli in accepted :
+                        cli.AsyncSendData(payload)
+            if not done.wait(10) :
+                break
+            count += 16 * len(accepted)
+        rates[mode]   = count / (perf_counter() - startSec)
+        wakeUps[mode] = (pool.GetMetrics()['wakeUpsCount'] - startWake) * 1000 / max(count, 1)
+    pool.StopWaitEvents()
+    srv.Close()
+    return { 'subscribers'        : len(accepted),
+             'msgSize'            : len(payload),
+             'messagesSec'        : rates['broadcast'],
+             'sendMessagesSec'    : rates['send'],
+             'speedup'            : rates['broadcast'] / rates['send'] if rates['send'] else None,
+             'wakeUpsPer1000'     : wakeUps['broadcast'],
+             'sendWakeUpsPer1000' : wakeUps['send'] }
+
+# ----------------------------------------------------------------------------
+
+def benchUDP(pool, threadsCount, slotsSize, opts) :
+    datagram = b'z' * min(opts.msgSize, slotsSize)
+    counts   = [0, 0]
+    running  = [ True ]
+
+    def onDataRecv(udp, remoteAddr, data) :
+        counts[0] += 1
+
+    def onDataSent(udp, arg) :
+        counts[1] += 1
+        if running[0] :
+            udp.AsyncSendDatagram(datagram, recvAddr, onDataSent)
+
+    receiver = XAsyncUDPDatagram.Create(pool, ('127.0.0.1', 0), recvBufLen=slotsSize)
+    receiver.OnDataRecv = onDataRecv
+    recvAddr = receiver.LocalAddr
+    sender   = XAsyncUDPDatagram.Create(pool)
+    pool.AsyncWaitEvents(threadsCount=threadsCount)
+    startSec = perf_counter()
+    sender.AsyncSendDatagram(datagram, recvAddr, onDataSent)
+    sleep(opts.duration)
+    running[0] = False
+    elapsedSec = perf_counter() - startSec
+    pool.StopWaitEvents()
+    return { 'sent'          : counts[1],
+             'received'      : counts[0],
+             'packetsSec'    : counts[0] / elapsedSec,
+             'lossRatio'     : (1 - counts[0] / counts[1]) if counts[1] else 0 }
+
+# ----------------------------------------------------------------------------
+
+def benchUDPSessions(pool, threadsCount, slotsSize, opts) :
+    # Many peers on one datagram socket, demultiplexed by the sessions table,
+    # the senders are paced by a window of datagrams in flight to measure
+    # the receiver instead of the kernel drops of a full receive buffer,
+    datagram = b'z' * min(opts.msgSize, slotsSize)
+    counts   = [0, 0]
+    window   = 256
+    lost     = 0
+
+    def onDatagram(session, data) :
+        session.State += 1
+        counts[0]     += 1
+
+    def onSessionCreated(udp, session) :
+        session.State      = 0
+        session.OnDatagram = onDatagram
+
+    receiver = XAsyncUDPDatagram.Create(pool, ('127.0.0.1', 0), recvBufLen=slotsSize)
+    receiver.OnSessionCreated = onSessionCreated
+    receiver.SetSessions(opts.udpPeers, idleTimeoutSec=opts.duration * 2)
+    recvAddr = receiver.LocalAddr
+    peers    = [ socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(opts.udpPeers) ]
+    pool.AsyncWaitEvents(threadsCount=threadsCount)
+    startSec = perf_counter()
+    endSec   = startSec + opts.duration
+    while perf_counter() < endSec :
+        for peer in peers :
+            if counts[1] - counts[0] - lost >= window :
+                waitSec = perf_counter() + 0.05
+                while counts[1] - counts[0] - lost >= window // 2 :
+                    if perf_counter() >= waitSec :
+                        # Datagrams not received by now are dropped,
+                        lost = counts[1] - counts[0]
+                        break
+                    sleep(0)
+            try :
+                peer.sendto(datagram, recvAddr)
+                counts[1] += 1
+            except OSError :
+                pass
+    sleep(0.1)
+    elapsedSec = perf_counter() - startSec
+    sessionsCount = receiver.SessionsCount
+    pool.StopWaitEvents()
+    receiver.Close()
+    for peer in peers :
+        peer.close()
+    return { 'peers'         : opts.udpPeers,
+             'sessions'      : sessionsCount,
+             'sent'          : counts[1],
+             'received'      : counts[0],
+             'packetsSec'    : counts[0] / elapsedSec,
+             'lossRatio'     : (1 - counts[0] / counts[1]) if counts[1] else 0 }
+
+# ----------------------------------------------------------------------------
+
+def benchCallSoon(pool, threadsCount, slotsSize, opts) :
+    # Calls posted from this thread, in batches, and run by the pool loop,
+    counter = [0]
+    def onCall(arg) :
+        counter[0] += 1
+    pool.AsyncWaitEvents(threadsCount=threadsCount)
+    wakeUps  = pool.GetMetrics()['wakeUpsCount']
+    posted   = 0
+    startSec = perf_counter()
+    endSec   = startSec + opts.duration
+    while perf_counter() < endSec :
+        for _ in range(100) :
+            pool.CallSoon(onCall)
+        posted += 100
+        # Lets the loop drain the batch,
+        sleep(0)
+    ok      = waitUntil(lambda : counter[0] >= posted, 10)
+    elapsed = perf_counter() - startSec
+    wakeUps = pool.GetMetrics()['wakeUpsCount'] - wakeUps
+    pool.StopWaitEvents()
+    return { 'calls'          : counter[0],
+             'complete'       : ok,
+             'callsSec'       : counter[0] / elapsed,
+             'wakeUpsPer1000' : wakeUps * 1000.0 / max(1, counter[0]) }
+
+# ----------------------------------------------------------------------------
+
+def benchTimers(pool, threadsCount, slotsSize, opts) :
+    # Timers spread over the duration, half of them cancelled, the lateness
+    # is measured from their deadline,
+    lateness = [ ]
+    def onTimer(whenSec) :
+        lateness.append(perf_counter() - whenSec)
+    pool.AsyncWaitEvents(threadsCount=threadsCount)
+    count    = opts.timers
+    handles  = [ ]
+    startSec = perf_counter()
+    for i in range(count) :
+        whenSec = startSec + 0.1 + (i * 7919 % count) * opts.duration / count
+        handles.append(pool.CallAt(whenSec, onTimer, whenSec))
+    scheduleSec = perf_counter() - startSec
+    for handle in handles[1::2] :
+        handle.Cancel()
+    ok = waitUntil(lambda : len(lateness) >= count - count // 2, opts.duration + 10)
+    pool.StopWaitEvents()
+    return { 'timers'        : count,
+             'fired'         : len(lateness),
+             'complete'      : ok,
+             'timersSec'     : count / max(scheduleSec, 1e-9),
+             'latenessP50Ms' : (percentile(lateness, 50) or 0) * 1000,
+             'latenessP99Ms' : (percentile(lateness, 99) or 0) * 1000 }
+
+# ----------------------------------------------------------------------------
+
+# Target of memory for an idle accepted connection, buffer slots excluded,
+IDLE_BYTES_TARGET = 1024
+
+def benchIdleMemory(pool, threadsCount, slotsSize, opts) :
+    if not tracemalloc :
+        return None
+    accepted = [ ]
+    count    = opts.idleConnections
+    srv, srvAddr = createServer(pool, count * 2, slotsSize)
+    srv.OnClientAccepted = lambda srv, cli : accepted.append(cli)
+    # Client sides are raw sockets, created before the first measure,
+    socks = [ socket.socket(socket.AF_INET, socket.SOCK_STREAM) for _ in range(count) ]
+    pool.AsyncWaitEvents(threadsCount=threadsCount)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for sock in socks :
+        sock.connect(srvAddr)
+    ok    = waitUntil(lambda : len(accepted) >= count, 10)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    pool.StopWaitEvents()
+    objBytes = sys.getsizeof(accepted[0]) if accepted else None
+    for sock in socks :
+        sock.close()
+    bytesPerConn = (after - before) / max(1, len(accepted))
+    return { 'connections'            : len(accepted),
+             'complete'               : ok,
+             'bytesPerConnection'     : bytesPerConn,
+             'clientObjectBytes'      : objBytes,
+             'slotBytesPerConnection' : slotsSize * 2,
+             'withinTarget'           : bytesPerConn <= IDLE_BYTES_TARGET }
+
+# ----------------------------------------------------------------------------
+
+IMPORT_CODE = '''
+import sys, json
+from time import perf_counter
+measureMemory = (sys.argv[1] == 'memory')
+if measureMemory :
+    import tracemalloc
+    tracemalloc.start()
+modules  = len(sys.modules)
+startSec = perf_counter()
+import XAsyncSockets
+importMs = (perf_counter() - startSec) * 1000
+print( json.dumps( { 'importMs'      : importMs,
+                     'importBytes'   : tracemalloc.get_traced_memory()[0] if measureMemory else None,
+                     'modulesLoaded' : len(sys.modules) - modules,
+                     'sslLoaded'     : 'ssl' in sys.modules } ) )
+'''
+
+def benchImport(pool, threadsCount, slotsSize, opts) :
+    # Cold "import XAsyncSockets" in new interpreters, from the compiled
+    # bytecode (the pool is not used),
+    libDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    py_compile.compile(os.path.join(libDir, 'XAsyncSockets.py'))
+    runs = [ ]
+    for mode in ['time'] * opts.importRuns + ['memory'] :
+        out = subprocess.check_output( [sys.executable, '-c', IMPORT_CODE, mode],
+                                       cwd = libDir )
+        runs.append(json.loads(out))
+    times = [ run['importMs'] for run in runs[:-1] ]
+    return { 'importMs'      : percentile(times, 50),
+             'importMaxMs'   : max(times),
+             'importBytes'   : runs[-1]['importBytes'],
+             'modulesLoaded' : runs[-1]['modulesLoaded'],
+             'sslLoaded'     : runs[-1]['sslLoaded'] }
+
+# ============================================================================
+# ===( Suite )================================================================
+# ============================================================================
+
+BENCHMARKS = { 'tcpEcho'        : benchTCPEcho,
+               'unixEcho'       : benchUnixEcho,
+               'acceptChurn'    : benchAcceptChurn,
+               'acceptRecycled' : benchAcceptChurnRecycled,
+               'recvLine'       : benchRecvLine,
+               'recvDataCopy'   : benchRecvDataCopy,
+               'recvInto'       : benchRecvInto,
+               'relayCopy'      : benchRelayCopy,
+               'bridgeBuffer'   : benchBridgeBuffer,
+               'bridgeSplice'   : benchBridgeSplice,
+               'httpLines'      : benchHTTPLines,
+               'httpServer'     : benchHTTPServer,
+               'wsUnmask'       : benchWSUnmask,
+               'wsFrames'       : benchWSFrames,
+               'compression'    : benchCompression,
+               'broadcast'      : benchBroadcast,
+               'udp'            : benchUDP,
+               'udpSessions'    : benchUDPSessions,
+               'callSoon'       : benchCallSoon,
+               'timers'         : benchTimers,
+               'idleMemory'     : benchIdleMemory,
+               'import'         : benchImport }
+
+# Result keys where a higher value is better (the others are lower is better),
+HIGHER_IS_BETTER = ( 'messagesSec', 'mbytesSec', 'connectionsSec',
+                     'linesSec', 'packetsSec', 'callsSec', 'timersSec',
+                     'requestsSec', 'framesSec' )
+LOWER_IS_BETTER  = ( 'latencyP50Ms', 'latencyP99Ms', 'bytesPerConnection',
+                     'importMs', 'importBytes', 'latenessP50Ms', 'latenessP99Ms' )
+
+def runSuite(opts) :
+    results = [ ]
+    pool    = XAsyncSocketsPool()
+    for name in opts.benchmarks :
+        for threadsCount in opts.threads :
+            for slotsSize in opts.slots :
+                result = BENCHMARKS[name](pool, threadsCount, slotsSize, opts)
+                if result is None :
+                    continue
+                result.update( { 'bench'        : name,
+                                 'threadsCount' : threadsCount,
+                                 'slotsSize'    : slotsSize,
+                                 'python'       : platform.python_implementation() + ' ' + platform.python_version() } )
+                results.append(result)
+                print(json.dumps(result), flush=True)
+    return results
+
+def resultKey(result) :
+    return (result['bench'], result['threadsCount'], result['slotsSize'])
+
+def compareResults(results, baselineFilename, tolerance) :
+    baseline = { }
+    with open(baselineFilename) as f :
+        for line in f :
+            if line.strip() :
+                result = json.loads(line)
+                baseline[resultKey(result)] = result
+    regressions = [ ]
+    for result in results :
+        ref = baseline.get(resultKey(result))
+        if not ref :
+            continue
+        for key in HIGHER_IS_BETTER + LOWER_IS_BETTER :
+            if key in result and ref.get(key) :
+                ratio = result[key] / ref[key]
+                if (key in HIGHER_IS_BETTER and ratio < 1 - tolerance) or \
+                   (key in LOWER_IS_BETTER  and ratio > 1 + tolerance) :
+                    regressions.append( '%s threads=%s slots=%s : %s %.3f -> %.3f (%+.1f%%)'
+                                        % ( resultKey(result) + (key, ref[key], result[key], (ratio - 1) * 100) ) )
+    return regressions
+
+def intList(value) :
+    return [ int(x) for x in value.split(',') if x ]
+
+def main() :
+    parser = argparse.ArgumentParser(description='XAsyncSockets loopback benchmarks')
+    parser.add_argument('--bench', dest='benchmarks', default=','.join(BENCHMARKS),
+                        type=lambda v : [ x for x in v.split(',') if x ],
+                        help='comma separated list of : %s' % ', '.join(BENCHMARKS))
+    parser.add_argument('--threads', type=intList, default=[1, 2], help='"threadsCount" values')
+    parser.add_argument('--slots', type=intList, default=[1024, 4096], help='buffer slots sizes')
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds per run')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent connections')
+    parser.add_argument('--msg-size', dest='msgSize', type=int, default=256)
+    parser.add_argument('--line-size', dest='lineSize', type=int, default=64)
+    parser.add_argument('--frame-size', dest='frameSize', type=int, default=1048576)
+    parser.add_argument('--http-pipeline', dest='httpPipeline', type=int, default=8,
+                        help='requests sent at once by the HTTP clients')
+    parser.add_argument('--ws-frame-size', dest='wsFrameSize', type=int, default=1024)
+    parser.add_argument('--compress-msg-size', dest='compressMsgSize', type=int, default=16384)
+    parser.add_argument('--idle-connections', dest='idleConnections', type=int, default=1000)
+    parser.add_argument('--udp-peers', dest='udpPeers', type=int, default=1000)
+    parser.add_argument('--subscribers', type=int, default=200, help='clients of the "broadcast" benchmark')
+    parser.add_argument('--timers', type=int, default=10000, help='timers of the "timers" benchmark')
+    parser.add_argument('--import-runs', dest='importRuns', type=int, default=9)
+    parser.add_argument('--output', help='JSON Lines file to write the results')
+    parser.add_argument('--compare', help='JSON Lines file of reference results')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    opts = parser.parse_args()
+    for name in opts.benchmarks :
+        if name not in BENCHMARKS :
+            parser.error('unknown benchmark "%s"' % name)
+    results = runSuite(opts)
+    if opts.output :
+        with open(opts.output, 'w') as f :
+            for result in results :
+                f.write(json.dumps(result) + '\n')
+    if opts.compare :
+        regressions = compareResults(results, opts.compare, opts.tolerance)
+        for regression in regressions :
+            print('REGRESSION %s' % regression, file=sys.stderr)
+        if regressions :
+            sys.exit(1)
+
+if __name__ == '__main__' :
+    main()
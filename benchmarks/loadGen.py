@@ -0,0 +1,351 @@
+"""
+The MIT License (MIT)
+Copyright © 2019 Jean-Christophe Bos & HC² (www.hc2.fr)
+"""
+
+# Closed-loop load generator built on XAsyncSocketsPool and XAsyncTCPClient.
+#
+# N connections replay request templates at a total target rate. Each
+# connection has at most one request in flight and requests follow a fixed
+# schedule : the latency is measured from the time the request should have
+# been sent, so that a stalled server is not hidden by the generator waiting
+# for it (coordinated omission correction).
+#
+#   python benchmarks/loadGen.py --connections 64 --rate 5000 --duration 30 \
+#                                --request 'PING {seq}\n' --response line 127.0.0.1:8080
+#   python benchmarks/loadGen.py --echo-server --rate 2000 --duration 5
+#
+# Templates accept "{conn}" (connection index) and "{seq}" (request number)
+# and the usual escape sequences (\r, \n, \t). The end of a response is
+# detected with "--response" : "line", "size:<bytes>" or "http".
+
+import os
+import sys
+import json
+import heapq
+import argparse
+import threading
+from   time import perf_counter, sleep
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from XAsyncSockets import XAsyncSocketsPool, XAsyncTCPServer, XAsyncTCPClient, \
+                          XBufferSlots
+
+# ============================================================================
+# ===( LatencyHistogram )=====================================================
+# ============================================================================
+
+class LatencyHistogram :
+
+    # Log-linear buckets in microseconds : 2^SUB_BITS linear sub-buckets
+    # for each power of two, so values are kept with ~3% precision.
+    SUB_BITS = 5
+
+    def __init__(self) :
+        self._counts = { }
+        self._count  = 0
+        self._maxUs  = 0
+
+    def _bucket(self, us) :
+        if us < (1 << LatencyHistogram.SUB_BITS) :
+            return (0, us)
+        shift = us.bit_length() - LatencyHistogram.SUB_BITS
+        return (shift, us >> shift)
+
+    def Record(self, sec) :
+        us  = max(0, int(sec * 1000000))
+        key = self._bucket(us)
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self._count += 1
+        if us > self._maxUs :
+            self._maxUs = us
+
+    def Merge(self, other) :
+        for key, count in other._counts.items() :
+            self._counts[key] = self._counts.get(key, 0) + count
+        self._count += other._count
+        self._maxUs  = max(self._maxUs, other._maxUs)
+
+    def PercentileMs(self, pct) :
+        if not self._count :
+            return None
+        rank = max(1, int(round(self._count * pct / 100.0)))
+        seen = 0
+        for shift, value in sorted(self._counts) :
+            seen += self._counts[(shift, value)]
+            if seen >= rank :
+                # Upper bound of the bucket, at most the maximum recorded,
+                return min(((value + 1) << shift) - 1, self._maxUs) / 1000.0
+        return self._maxUs / 1000.0
+
+    @property
+    def Count(self) :
+        return self._count
+
+    @property
+    def MaxMs(self) :
+        return self._maxUs / 1000.0
+
+# ============================================================================
+# ===( Pacer )================================================================
+# ============================================================================
+
+class Pacer :
+
+    # Runs functions at given times from a dedicated thread.
+
+    def __init__(self) :
+        self._heap      = [ ]
+        self._seq       = 0
+        self._cond      = threading.Condition()
+        self._running   = True
+        self._thread    = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) :
+        while True :
+            with self._cond :
+                while self._running and not self._heap :
+                    self._cond.wait()
+                if not self._running :
+                    return
+                atSec, _, func, arg = self._heap[0]
+                waitSec = atSec - perf_counter()
+                if waitSec > 0 :
+                    self._cond.wait(waitSec)
+                    continue
+                heapq.heappop(self._heap)
+            try :
+                func(arg)
+            except Exception as ex :
+                print('Pacer error : %s' % ex, file=sys.stderr)
+
+    def At(self, atSec, func, arg) :
+        with self._cond :
+            self._seq += 1
+            heapq.heappush(self._heap, (atSec, self._seq, func, arg))
+            self._cond.notify()
+
+    def Stop(self) :
+        with self._cond :
+            self._running = False
+            self._cond.notify()
+
+# ============================================================================
+# ===( LoadGenerator )========================================================
+# ============================================================================
+
+class LoadGenerator :
+
+    def __init__(self, pool, srvAddr, opts) :
+        self._pool        = pool
+        self._srvAddr     = srvAddr
+        self._opts        = opts
+        self._templates   = [ t.encode('latin-1').decode('unicode_escape') for t in opts.requests ]
+        self._intervalSec = opts.connections / float(opts.rate)
+        self._pacer       = Pacer()
+        self._lock        = threading.Lock()
+        self._running     = False
+        self._seq         = 0
+        self._errors      = 0
+        self._histo       = LatencyHistogram()
+        self._total       = LatencyHistogram()
+        mode = opts.response
+        if mode.startswith('size:') :
+            self._respSize = int(mode[5:])
+            mode           = 'size'
+        self._respMode = mode
+
+    # ------------------------------------------------------------------------
+
+    def _nextRequest(self, connIdx) :
+        with self._lock :
+            self._seq += 1
+            seq = self._seq
+        template = self._templates[seq % len(self._templates)]
+        return template.format(conn=connIdx, seq=seq).encode()
+
+    # ------------------------------------------------------------------------
+
+    def _connect(self, connIdx, startSec) :
+        cli = XAsyncTCPClient.Create( self._pool,
+                                      self._srvAddr,
+                                      recvBufLen = self._opts.bufLen,
+                                      sendBufLen = self._opts.bufLen )
+        if not cli :
+            self._onError(None, connIdx, startSec)
+            return
+        cli.State            = { 'conn' : connIdx, 'intended' : startSec, 'length' : None }
+        cli.OnConnected      = self._onConnected
+        cli.OnFailsToConnect = lambda cli : self._onError(cli, connIdx, startSec)
+        cli.OnClosed         = lambda cli, reason : self._onError(cli, connIdx, None)
+
+    # ------------------------------------------------------------------------
+
+    def _onError(self, cli, connIdx, intendedSec) :
+        if not self._running :
+            return
+        with self._lock :
+            self._errors += 1
+        if cli is not None :
+            intendedSec = cli.State['intended']
+        # Reconnects after a short delay keeping the schedule,
+        retrySec = max(perf_counter() + 0.1, intendedSec or 0)
+        self._pacer.At(retrySec, lambda idx : self._connect(idx, retrySec), connIdx)
+
+    # ------------------------------------------------------------------------
+
+    def _onConnected(self, cli) :
+        self._schedule(cli)
+
+    # ------------------------------------------------------------------------
+
+    def _schedule(self, cli) :
+        if not self._running :
+            cli.OnClosed = None
+            cli.Close()
+            return
+        if cli.State['intended'] <= perf_counter() :
+            self._sendRequest(cli)
+        else :
+            self._pacer.At(cli.State['intended'], self._sendRequest, cli)
+
+    # ------------------------------------------------------------------------
+
+    def _sendRequest(self, cli) :
+        cli.State['length'] = None
+        cli.AsyncSendData(self._nextRequest(cli.State['conn']))
+        self._recvResponse(cli)
+
+    # ------------------------------------------------------------------------
+
+    def _recvResponse(self, cli) :
+        if self._respMode == 'size' :
+            cli.AsyncRecvData(self._respSize, self._onResponseData)
+        else :
+            cli.AsyncRecvLine(onLineRecv=self._onResponseLine)
+
+    # ------------------------------------------------------------------------
+
+    def _onResponseLine(self, cli, line, arg) :
+        if self._respMode == 'http' :
+            if line :
+                if line.lower().startswith('content-length:') :
+                    cli.State['length'] = int(line[15:].strip())
+                cli.AsyncRecvLine(onLineRecv=self._onResponseLine)
+                return
+            if cli.State['length'] :
+                cli.AsyncRecvData(cli.State['length'], self._onResponseData)
+                return
+        self._onResponse(cli)
+
+    # ------------------------------------------------------------------------
+
+    def _onResponseData(self, cli, data, arg) :
+        self._onResponse(cli)
+
+    # ------------------------------------------------------------------------
+
+    def _onResponse(self, cli) :
+        nowSec = perf_counter()
+        with self._lock :
+            self._histo.Record(nowSec - cli.State['intended'])
+        cli.State['intended'] += self._intervalSec
+        self._schedule(cli)
+
+    # ------------------------------------------------------------------------
+
+    def Run(self) :
+        opts          = self._opts
+        self._running = True
+        startSec      = perf_counter()
+        for connIdx in range(opts.connections) :
+            # Spreads the connections over the first interval,
+            self._connect(connIdx, startSec + connIdx * self._intervalSec / opts.connections)
+        endSec    = startSec + opts.duration
+        reportSec = startSec
+        count     = 0
+        while True :
+            # From the start, so that the intervals do not drift,
+            count     += 1
+            prevSec    = reportSec
+            reportSec  = min(startSec + count * opts.interval, endSec)
+            if endSec - reportSec < opts.interval * 1e-6 :
+                reportSec = endSec
+            sleep(max(0, reportSec - perf_counter()))
+            with self._lock :
+                histo       = self._histo
+                errors      = self._errors
+                self._histo = LatencyHistogram()
+                self._total.Merge(histo)
+            self._report('interval', histo, errors, reportSec - prevSec, reportSec - startSec)
+            if reportSec >= endSec :
+                break
+        self._running = False
+        self._pacer.Stop()
+        self._report('total', self._total, self._errors, opts.duration, opts.duration)
+
+    # ------------------------------------------------------------------------
+
+    def _report(self, kind, histo, errors, periodSec, elapsedSec) :
+        print( json.dumps( { 'type'       : kind,
+                             'elapsedSec' : round(elapsedSec, 3),
+                             'requests'   : histo.Count,
+                             'rps'        : round(histo.Count / periodSec, 1),
+                             'errors'     : errors,
+                             'p50Ms'      : histo.PercentileMs(50),
+                             'p90Ms'      : histo.PercentileMs(90),
+                             'p99Ms'      : histo.PercentileMs(99),
+                             'p999Ms'     : histo.PercentileMs(99.9),
+                             'maxMs'      : histo.MaxMs } ), flush=True )
+
+# ============================================================================
+# ===( Main )=================================================================
+# ============================================================================
+
+def startEchoServer(pool, opts) :
+    def onLineRecv(cli, line, arg) :
+        cli.AsyncSendData((line + '\n').encode())
+        cli.AsyncRecvLine(onLineRecv=onLineRecv)
+    srv = XAsyncTCPServer.Create( pool,
+                                  ('127.0.0.1', 0),
+                                  bufSlots = XBufferSlots(opts.connections * 2 + 8, opts.bufLen) )
+    srv.OnClientAccepted = lambda srv, cli : cli.AsyncRecvLine(onLineRecv=onLineRecv)
+    return srv.GetSocketObj().getsockname()
+
+def parseAddr(value) :
+    host, _, port = value.rpartition(':')
+    return (host.strip('[]'), int(port))
+
+def main() :
+    parser = argparse.ArgumentParser(description='XAsyncSockets closed-loop load generator')
+    parser.add_argument('srvAddr', nargs='?', type=parseAddr, help='host:port of the server')
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--rate', type=float, default=1000, help='total requests per second')
+    parser.add_argument('--duration', type=float, default=10, help='seconds')
+    parser.add_argument('--interval', type=float, default=1, help='seconds between reports')
+    parser.add_argument('--request', dest='requests', action='append', help='request template (repeatable)')
+    parser.add_argument('--response', default='line', help='"line", "size:<bytes>" or "http"')
+    parser.add_argument('--threads', type=int, default=1, help='"threadsCount" of the pool')
+    parser.add_argument('--buf-len', dest='bufLen', type=int, default=4096)
+    parser.add_argument('--echo-server', dest='echoServer', action='store_true',
+                        help='runs a loopback line echo server in this process')
+    opts = parser.parse_args()
+    if not opts.requests :
+        opts.requests = [ 'PING {conn} {seq}\\n' ]
+    if opts.rate <= 0 or opts.connections <= 0 :
+        parser.error('"--rate" and "--connections" must be greater than zero')
+    pool = XAsyncSocketsPool()
+    if opts.echoServer :
+        opts.srvAddr = startEchoServer(pool, opts)
+    elif not opts.srvAddr :
+        parser.error('"srvAddr" or "--echo-server" is required')
+    pool.AsyncWaitEvents(threadsCount=opts.threads)
+    try :
+        LoadGenerator(pool, opts.srvAddr, opts).Run()
+    finally :
+        pool.StopWaitEvents()
+
+if __name__ == '__main__' :
+    main()
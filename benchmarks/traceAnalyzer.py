@@ -0,0 +1,160 @@
+"""
+The MIT License (MIT)
+Copyright © 2019 Jean-Christophe Bos & HC² (www.hc2.fr)
+"""
+
+# Post-mortem analysis of a trace dumped by XAsyncTrace.Dump.
+#
+#   trace = pool.StartTrace(capacity=65536)
+#   ...
+#   trace.Dump('/tmp/xasync.trace')
+#
+#   python benchmarks/traceAnalyzer.py /tmp/xasync.trace --top 10
+#   python benchmarks/traceAnalyzer.py /tmp/xasync.trace --fd 12
+#
+# Reports the durations by event type, the slowest loop ticks with the
+# socket handlers run during each of them, and the busiest sockets.
+
+import sys
+import argparse
+from   datetime import datetime
+
+# ============================================================================
+# ===( Trace )================================================================
+# ============================================================================
+
+HANDLER_EVENTS = ( 'read', 'write', 'error' )
+
+class Trace :
+
+    def __init__(self, filename) :
+        self.header        = { }
+        self.wallOffsetSec = 0.0
+        self.events        = [ ]
+        with open(filename) as f :
+            for line in f :
+                line = line.strip()
+                if not line :
+                    continue
+                if line.startswith('#') :
+                    for item in line[1:].split() :
+                        if '=' in item :
+                            key, value = item.split('=', 1)
+                            self.header[key] = float(value)
+                    continue
+                timeSec, fd, event, size, durationSec = line.split()
+                self.events.append( (float(timeSec), int(fd), event, int(size), float(durationSec)) )
+        # Handlers are recorded when they end, with their start time,
+        self.events.sort()
+        self.wallOffsetSec = self.header.get('wallOffsetSec', 0.0)
+
+    def WallTime(self, timeSec) :
+        return datetime.fromtimestamp(timeSec + self.wallOffsetSec).strftime('%H:%M:%S.%f')
+
+# ============================================================================
+# ===( Reports )==============================================================
+# ============================================================================
+
+def percentile(values, pct) :
+    if not values :
+        return 0.0
+    values = sorted(values)
+    return values[int(round((pct / 100.0) * (len(values) - 1)))]
+
+def reportSummary(trace) :
+    events = trace.events
+    print('Trace : %d events' % len(events), end='')
+    if trace.header.get('dropped') :
+        print(' (%d older events dropped by the ring buffer)' % trace.header['dropped'], end='')
+    if events :
+        print(', %.3f sec from %s' % ( events[-1][0] - events[0][0], trace.WallTime(events[0][0]) ), end='')
+    print()
+    byType = { }
+    for timeSec, fd, event, size, durationSec in events :
+        byType.setdefault(event, [ ]).append((size, durationSec))
+    print()
+    print('%-8s %10s %14s %12s %12s %12s' % ('event', 'count', 'bytes', 'p50 us', 'p99 us', 'max us'))
+    for event in sorted(byType) :
+        items     = byType[event]
+        durations = [ d for _, d in items ]
+        size      = sum(s for s, _ in items) if event in ('recv', 'send') else 0
+        print( '%-8s %10d %14d %12.1f %12.1f %12.1f'
+               % ( event, len(items), size,
+                   percentile(durations, 50) * 1e6,
+                   percentile(durations, 99) * 1e6,
+                   max(durations) * 1e6 ) )
+
+def reportSlowTicks(trace, top) :
+    ticks = [ e for e in trace.events if e[2] == 'tick' ]
+    ticks.sort(key=lambda e : e[4], reverse=True)
+    print()
+    print('Slowest ticks :')
+    for timeSec, fd, event, readyCount, durationSec in ticks[:top] :
+        print( '  %s  %.3f ms, %d ready sockets'
+               % ( trace.WallTime(timeSec), durationSec * 1000, readyCount ) )
+        endSec   = timeSec + durationSec
+        handlers = [ e for e in trace.events
+                     if e[2] in HANDLER_EVENTS and timeSec <= e[0] <= endSec ]
+        handlers.sort(key=lambda e : e[4], reverse=True)
+        for hTimeSec, hFd, hEvent, hSize, hDurationSec in handlers[:5] :
+            io = sum( e[3] for e in trace.events
+                      if e[1] == hFd and e[2] in ('recv', 'send') and
+                         hTimeSec <= e[0] <= hTimeSec + hDurationSec )
+            print( '      fd %-6d %-6s %9.3f ms %8d bytes'
+                   % ( hFd, hEvent, hDurationSec * 1000, io ) )
+
+def reportSockets(trace, top) :
+    sockets = { }
+    for timeSec, fd, event, size, durationSec in trace.events :
+        if fd < 0 :
+            continue
+        # [handlers count, busy sec, max sec, bytes recv, bytes sent, expired],
+        stats = sockets.setdefault(fd, [0, 0.0, 0.0, 0, 0, 0])
+        if event in HANDLER_EVENTS :
+            stats[0] += 1
+            stats[1] += durationSec
+            stats[2]  = max(stats[2], durationSec)
+        elif event == 'recv' :
+            stats[3] += size
+        elif event == 'send' :
+            stats[4] += size
+        elif event == 'expire' :
+            stats[5] += 1
+    print()
+    print('Busiest sockets :')
+    print('  %-6s %10s %12s %12s %14s %14s %8s' % ('fd', 'handlers', 'busy ms', 'max ms', 'bytes recv', 'bytes sent', 'expired'))
+    for fd, stats in sorted(sockets.items(), key=lambda item : item[1][1], reverse=True)[:top] :
+        print( '  %-6d %10d %12.3f %12.3f %14d %14d %8d'
+               % ( fd, stats[0], stats[1] * 1000, stats[2] * 1000, stats[3], stats[4], stats[5] ) )
+
+def reportSocket(trace, fd) :
+    print('Events of fd %d :' % fd)
+    for timeSec, eFd, event, size, durationSec in trace.events :
+        if eFd == fd :
+            print( '  %s  %-6s %8d bytes %9.3f ms'
+                   % ( trace.WallTime(timeSec), event, size, durationSec * 1000 ) )
+
+# ============================================================================
+# ===( Main )=================================================================
+# ============================================================================
+
+def main() :
+    parser = argparse.ArgumentParser(description='XAsyncSockets trace analyzer')
+    parser.add_argument('filename', help='file written by XAsyncTrace.Dump')
+    parser.add_argument('--top', type=int, default=10, help='number of ticks and sockets listed')
+    parser.add_argument('--fd', type=int, help='lists all the events of a file descriptor')
+    opts  = parser.parse_args()
+    try :
+        trace = Trace(opts.filename)
+    except Exception as ex :
+        print('Cannot read the trace : %s' % ex, file=sys.stderr)
+        sys.exit(1)
+    if opts.fd is not None :
+        reportSocket(trace, opts.fd)
+        return
+    reportSummary(trace)
+    reportSlowTicks(trace, opts.top)
+    reportSockets(trace, opts.top)
+
+if __name__ == '__main__' :
+    main()
@@ -0,0 +1,2297 @@
+"""
+The MIT License (MIT)
+Copyright © 2019 Jean-Christophe Bos & HC² (www.hc2.fr)
+"""
+
+# Regression tests of XAsyncSockets, on loopback only :
+#
+#   python -m unittest discover -s tests
+
+import asyncio
+import os
+import sys
+import socket
+import struct
+import tempfile
+import unittest
+from   time import perf_counter, sleep
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from XAsyncSockets import *
+
+def waitUntil(condition, timeoutSec=5) :
+    endSec = perf_counter() + timeoutSec
+    while not condition() and perf_counter() < endSec :
+        sleep(0.01)
+    return condition()
+
+# ============================================================================
+# ===( PoolTestCase )=========================================================
+# ============================================================================
+
+class PoolTestCase(unittest.TestCase) :
+
+    def setUp(self) :
+        self.pool = XAsyncSocketsPool()
+        self.pool.AsyncWaitEvents(threadsCount=1)
+
+    def tearDown(self) :
+        self.pool.StopWaitEvents()
+
+    def createServer(self, slotsCount=4, onClientAccepted=None) :
+        self.bufSlots = XBufferSlots(slotsCount, 1024)
+        srv = XAsyncTCPServer.Create(self.pool, ('127.0.0.1', 0), bufSlots=self.bufSlots)
+        srv.OnClientAccepted = onClientAccepted
+        self.addCleanup(srv.Close)
+        return srv, srv.GetSocketObj().getsockname()
+
+# ============================================================================
+# ===( XAsyncSocketsPool )====================================================
+# ============================================================================
+
+class PoolCallsTests(PoolTestCase) :
+
+    def test_CallSoonOrder(self) :
+        calls = [ ]
+        done  = [ ]
+        for i in range(5) :
+            self.pool.CallSoon(calls.append, i)
+        self.pool.CallSoon(done.append, True)
+        self.assertTrue(waitUntil(lambda : done))
+        self.assertEqual(calls, [ 0, 1, 2, 3, 4 ])
+
+    def test_CallLaterCancel(self) :
+        calls  = [ ]
+        handle = self.pool.CallLater(0.1, calls.append, 'cancelled')
+        self.pool.CallLater(0.2, calls.append, 'late')
+        self.pool.CallLater(0.05, calls.append, 'early')
+        self.assertTrue(handle.Cancel())
+        self.assertFalse(handle.Cancel())
+        self.assertTrue(waitUntil(lambda : len(calls) == 2))
+        self.assertEqual(calls, [ 'early', 'late' ])
+
+    def test_WakeUpWithManyPools(self) :
+        # More pools than the ports tried for their wake up sockets,
+        pools = [ XAsyncSocketsPool() for i in range(31) ]
+        pool  = XAsyncSocketsPool()
+        pools.append(pool)
+        for p in pools :
+            self.addCleanup(p._udpSockEvt.close)
+        self.assertEqual(len(set(p._udpSockEvtAddr for p in pools)), len(pools))
+        pool.AsyncWaitEvents(threadsCount=1)
+        self.addCleanup(pool.StopWaitEvents)
+        sleep(0.1)
+        calls    = [ ]
+        startSec = perf_counter()
+        pool.CallSoon(calls.append, True)
+        self.assertTrue(waitUntil(lambda : calls))
+        self.assertLess(perf_counter() - startSec, 0.5)
+
+    def test_CallAtIncorrectArguments(self) :
+        with self.assertRaises(XAsyncSocketsPoolException) :
+            self.pool.CallSoon(None)
+        with self.assertRaises(XAsyncSocketsPoolException) :
+            self.pool.CallLater(-1, print)
+        with self.assertRaises(XAsyncSocketsPoolException) :
+            self.pool.CallAt('now', print)
+
+class BroadcastTests(PoolTestCase) :
+
+    def createSubscribers(self, count) :
+        accepted = [ ]
+        srv, srvAddr = self.createServer(slotsCount=2 * count, onClientAccepted=lambda srv, cli : accepted.append(cli))
+        peers = [ ]
+        for i in range(count) :
+            peer = socket.create_connection(srvAddr, timeout=5)
+            self.addCleanup(peer.close)
+            peers.append(peer)
+        self.assertTrue(waitUntil(lambda : len(accepted) == count))
+        return accepted, peers
+
+    def recvAll(self, peer, size) :
+        data = b''
+        while len(data) < size :
+            buf = peer.recv(size - len(data))
+            if not buf :
+                break
+            data += buf
+        return data
+
+    def test_Broadcast(self) :
+        clients, peers = self.createSubscribers(3)
+        self.assertEqual(self.pool.Broadcast(clients, b'hello '), 3)
+        self.assertEqual(self.pool.Broadcast(clients, bytearray(b'world')), 3)
+        for peer in peers :
+            self.assertEqual(self.recvAll(peer, 11), b'hello world')
+
+    def test_BroadcastClosedClient(self) :
+        clients, peers = self.createSubscribers(3)
+        clients[1].Close()
+        self.assertEqual(self.pool.Broadcast(clients, b'hello'), 2)
+        self.assertEqual(clients[1].SendBufferedLen, 0)
+        self.assertEqual(self.recvAll(peers[0], 5), b'hello')
+        self.assertEqual(self.recvAll(peers[2], 5), b'hello')
+        self.assertEqual(peers[1].recv(5), b'')
+
+    def test_BroadcastIncorrectArguments(self) :
+        clients, peers = self.createSubscribers(1)
+        for args in ( (clients, b''),
+                      ([ None ], b'data'),
+                      (clients, b'data', 0),
+                      (clients, b'data', None, 'wait') ) :
+            with self.assertRaises(XAsyncSocketsPoolException) :
+                self.pool.Broadcast(*args)
+
+class AsyncioPoolTests(unittest.TestCase) :
+
+    def runInLoop(self, coroutine) :
+        pool = XAsyncSocketsPool()
+        async def run() :
+            pool.AttachAsyncioLoop()
+            try :
+                return await coroutine(pool)
+            finally :
+                pool.StopWaitEvents()
+        return asyncio.run(run())
+
+    def test_CallSoonInLoopThread(self) :
+        # Called from the loop thread, the call still runs later,
+        async def callSoon(pool) :
+            calls  = [ ]
+            pool.CallSoon(calls.append, 'first')
+            handle = pool.CallSoon(calls.append, 'cancelled')
+            pool.CallSoon(calls.append, 'second')
+            calls.append('returned')
+            self.assertTrue(handle.Cancel())
+            for i in range(100) :
+                if len(calls) == 3 :
+                    break
+                await asyncio.sleep(0.01)
+            return calls
+        calls = self.runInLoop(callSoon)
+        self.assertEqual(calls, [ 'returned', 'first', 'second' ])
+
+    def test_CallLaterInLoopThread(self) :
+        async def callLater(pool) :
+            calls = [ ]
+            pool.CallLater(0.05, calls.append, 'later')
+            pool.CallSoon(calls.append, 'soon')
+            await asyncio.sleep(0.2)
+            return calls
+        self.assertEqual(self.runInLoop(callLater), [ 'soon', 'later' ])
+
+    def test_AttachTwice(self) :
+        async def attach(pool) :
+            self.assertIs(pool.AsyncioLoop, asyncio.get_running_loop())
+            with self.assertRaises(XAsyncSocketsPoolException) :
+                pool.AttachAsyncioLoop()
+        self.runInLoop(attach)
+
+    def test_AwaitableSockets(self) :
+        async def echo(pool) :
+            srv = XAsyncTCPServer.Create(pool, ('127.0.0.1', 0))
+            try :
+                accepted = srv.Accept()
+                cli  = XAsyncTCPClient.Create(pool, srv.GetSocketObj().getsockname())
+                peer = await asyncio.wait_for(accepted, 5)
+                self.assertIsNone(await asyncio.wait_for(cli.SendData(b'hello\nworld!'), 5))
+                line = await asyncio.wait_for(peer.RecvLine(), 5)
+                data = await asyncio.wait_for(peer.RecvData(5), 5)
+                self.assertIs(type(data), bytes)
+                buf  = bytearray(6)
+                into = peer.RecvInto(buf)
+                await asyncio.wait_for(peer.SendData(data + b'\n'), 5)
+                echo = await asyncio.wait_for(cli.RecvLine(), 5)
+                await cli.SendData(b'abcdef')
+                self.assertIs(await asyncio.wait_for(into, 5), buf)
+                # A pending receive fails once the client is closed,
+                pending = cli.RecvData(10)
+                cli.Close()
+                with self.assertRaises(XAsyncTCPClientException) :
+                    await asyncio.wait_for(pending, 5)
+                with self.assertRaises(XAsyncTCPClientException) :
+                    await asyncio.wait_for(cli.RecvLine(), 5)
+                return line, data, echo, bytes(buf)
+            finally :
+                srv.Close()
+        self.assertEqual( self.runInLoop(echo),
+                          ('hello', b'world', 'world', b'!abcde') )
+
+    def test_AcceptWithOnClientAccepted(self) :
+        async def accept(pool) :
+            srv = XAsyncTCPServer.Create(pool, ('127.0.0.1', 0))
+            srv.OnClientAccepted = lambda srv, cli : None
+            try :
+                with self.assertRaises(XAsyncTCPServerException) :
+                    srv.Accept()
+            finally :
+                srv.Close()
+        self.runInLoop(accept)
+
+    def test_FuturesWithWaitEvents(self) :
+        # Futures of a pool processed by its own thread are completed in
+        # the asyncio loop,
+        async def echo() :
+            pool = XAsyncSocketsPool()
+            pool.AsyncWaitEvents(threadsCount=1)
+            srv  = XAsyncTCPServer.Create(pool, ('127.0.0.1', 0))
+            try :
+                accepted = srv.Accept()
+                cli      = XAsyncTCPClient.Create(pool, srv.GetSocketObj().getsockname())
+                peer     = await asyncio.wait_for(accepted, 5)
+                await asyncio.wait_for(peer.SendData(b'ping\n'), 5)
+                return await asyncio.wait_for(cli.RecvLine(), 5)
+            finally :
+                srv.Close()
+                pool.StopWaitEvents()
+        self.assertEqual(asyncio.run(echo()), 'ping')
+
+# ============================================================================
+# ===( XAsyncTCPServer )======================================================
+# ============================================================================
+
+class TCPServerTests(PoolTestCase) :
+
+    def test_AcceptWithOnClientAccepted(self) :
+        srv, srvAddr = self.createServer(onClientAccepted=lambda srv, cli : None)
+        with self.assertRaises(XAsyncTCPServerException) :
+            srv.Accept()
+
+    def test_Accept(self) :
+        srv, srvAddr = self.createServer()
+        async def accept() :
+            future = srv.Accept()
+            srv.Accept().cancel()
+            peer   = socket.create_connection(srvAddr)
+            try :
+                return await asyncio.wait_for(future, 5)
+            finally :
+                peer.close()
+        cli = asyncio.run(accept())
+        self.assertIsInstance(cli, XAsyncTCPClient)
+
+    def test_OOBByteClosesClient(self) :
+        # An exceptional condition closes the client and releases its slots,
+        accepted = [ ]
+        closed   = [ ]
+        def onClientAccepted(srv, cli) :
+            cli.OnClosed = lambda cli, reason : closed.append(reason)
+            accepted.append(cli)
+            cli.AsyncRecvLine()
+        srv, srvAddr = self.createServer(onClientAccepted=onClientAccepted)
+        peer = socket.create_connection(srvAddr)
+        self.addCleanup(peer.close)
+        self.assertTrue(waitUntil(lambda : accepted))
+        peer.send(b'!', socket.MSG_OOB)
+        self.assertTrue(waitUntil(lambda : closed))
+        self.assertEqual(closed, [ XClosedReason.Error ])
+        self.assertIsNone(accepted[0].SocketID)
+        self.assertEqual(accepted[0].GetSocketObj().fileno(), -1)
+        self.assertTrue(all(slot.Available for slot in self.bufSlots.Slots))
+        self.assertEqual(srv.ConnectionsCount, 0)
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets not available')
+    def test_UnixAdmissionControl(self) :
+        # Accepted Unix clients have no IP address, they share one count,
+        tmpDir = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, tmpDir)
+        path     = os.path.join(tmpDir, 'srv.sock')
+        accepted = [ ]
+        rejected = [ ]
+        srv = XAsyncTCPServer.Create(self.pool, path, bufSlots=XBufferSlots(4, 1024))
+        self.addCleanup(srv.Close)
+        srv.OnClientAccepted = lambda srv, cli : accepted.append(cli)
+        srv.OnClientRejected = lambda srv, cliAddr, reason : rejected.append(reason)
+        peers = [ ]
+        def connect() :
+            peer = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.addCleanup(peer.close)
+            peer.connect(path)
+            peers.append(peer)
+        connect()
+        self.assertTrue(waitUntil(lambda : len(accepted) == 1))
+        srv.SetAdmissionControl(maxConnectionsPerIP=1)
+        connect()
+        self.assertTrue(waitUntil(lambda : rejected))
+        self.assertEqual(rejected, [ 'maxConnectionsPerIP' ])
+        accepted[0].Close()
+        self.assertTrue(waitUntil(lambda : srv.ConnectionsCount == 0))
+        connect()
+        self.assertTrue(waitUntil(lambda : len(accepted) == 2))
+
+# ============================================================================
+# ===( XAsyncTCPClient )======================================================
+# ============================================================================
+
+class TCPClientTests(PoolTestCase) :
+
+    def test_CreateWithHostName(self) :
+        # Without DNS resolver, the host name is resolved by "Create",
+        lines = [ ]
+        def onClientAccepted(srv, cli) :
+            cli.AsyncSendData(b'hello\n')
+        srv, srvAddr = self.createServer(onClientAccepted=onClientAccepted)
+        for connectAsync in (True, False) :
+            cli = XAsyncTCPClient.Create(self.pool, ('localhost', srvAddr[1]), connectAsync=connectAsync)
+            self.assertIsNotNone(cli)
+            self.addCleanup(cli.Close)
+            cli.AsyncRecvLine(onLineRecv=lambda cli, line, arg : lines.append(line))
+        self.assertTrue(waitUntil(lambda : len(lines) == 2))
+        self.assertEqual(lines, [ 'hello', 'hello' ])
+
+    def test_SendBeforeConnected(self) :
+        # The data given while connecting is sent once connected,
+        received = [ ]
+        def onClientAccepted(srv, cli) :
+            cli.AsyncRecvData(5, lambda cli, data, arg : received.append(bytes(data)))
+        srv, srvAddr = self.createServer(onClientAccepted=onClientAccepted)
+        cli = XAsyncTCPClient.Create(self.pool, srvAddr)
+        self.assertIsNotNone(cli)
+        self.addCleanup(cli.Close)
+        self.assertTrue(cli.AsyncSendData(b'hello'))
+        self.assertTrue(waitUntil(lambda : received))
+        self.assertEqual(received, [ b'hello' ])
+
+    def test_OnConnectedSetOnceConnected(self) :
+        # The event set after the connection is still called, once,
+        srv, srvAddr = self.createServer(onClientAccepted=lambda srv, cli : None)
+        cli = XAsyncTCPClient.Create(self.pool, srvAddr)
+        self.assertIsNotNone(cli)
+        self.addCleanup(cli.Close)
+        self.assertTrue(waitUntil(lambda : cli._socketOpened))
+        connected = [ ]
+        cli.OnConnected = connected.append
+        self.assertTrue(waitUntil(lambda : connected))
+        cli.OnConnected = connected.append
+        sleep(0.1)
+        self.assertEqual(connected, [ cli ])
+
+    def test_CreateWithIncorrectAddress(self) :
+        with self.assertRaises(XAsyncTCPClientException) :
+            XAsyncTCPClient.Create(self.pool, 8080)
+
+    def test_FuturesNotConnected(self) :
+        # Futures fail at once instead of waiting forever,
+        srv, srvAddr = self.createServer()
+        cli = XAsyncTCPClient.Create(self.pool, srvAddr, connectAsync=False)
+        self.assertIsNotNone(cli)
+        cli.Close()
+        async def waitFutures() :
+            for makeFuture in ( lambda : cli.RecvLine(),
+                                lambda : cli.RecvData(4),
+                                lambda : cli.RecvInto(bytearray(4)),
+                                lambda : cli.SendData(b'data') ) :
+                with self.assertRaises(XAsyncTCPClientException) :
+                    await asyncio.wait_for(makeFuture(), 5)
+        asyncio.run(waitFutures())
+
+    @unittest.skipUnless(hasattr(socket, 'SCM_RIGHTS'), 'SCM_RIGHTS not available')
+    def test_SendFDsOnFullBuffer(self) :
+        # Nothing is queued, "SendFDs" returns False until the peer reads,
+        sock, peer = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(peer.close)
+        cli = XAsyncTCPClient.CreateFromSocket(self.pool, sock)
+        self.addCleanup(cli.Close)
+        sentCount = 0
+        while cli.SendFDs([ peer.fileno() ]) :
+            sentCount += 1
+            self.assertLess(sentCount, 100000)
+        self.assertGreater(sentCount, 0)
+        cmsgLen = socket.CMSG_SPACE(struct.calcsize('i'))
+        peer.setblocking(False)
+        try :
+            while True :
+                data, ancData, flags, addr = peer.recvmsg(1, cmsgLen)
+                for level, type, fdsData in ancData :
+                    os.close(struct.unpack('i', fdsData)[0])
+        except BlockingIOError :
+            pass
+        self.assertTrue(cli.SendFDs([ peer.fileno() ]))
+
+# ============================================================================
+# ===( XAsyncUDPDatagram )====================================================
+# ============================================================================
+
+class UDPDatagramTests(PoolTestCase) :
+
+    def sendTo(self, localAddr, family) :
+        datagrams = [ ]
+        failed    = [ ]
+        receiver  = XAsyncUDPDatagram.Create(self.pool, localAddr)
+        self.addCleanup(receiver.Close)
+        receiver.OnDataRecv = lambda udp, remoteAddr, datagram : datagrams.append(bytes(datagram))
+        sender = XAsyncUDPDatagram.Create(self.pool, family=family)
+        self.addCleanup(sender.Close)
+        sender.OnFailsToSend = lambda udp, datagram, remoteAddr : failed.append(remoteAddr)
+        sender.AsyncSendDatagram(b'ping', receiver.LocalAddr)
+        self.assertTrue(waitUntil(lambda : datagrams or failed))
+        self.assertEqual((datagrams, failed), ([ b'ping' ], [ ]))
+
+    def test_SendOnlyIPv4(self) :
+        self.sendTo(('127.0.0.1', 0), None)
+
+    @unittest.skipUnless(socket.has_ipv6, 'IPv6 not available')
+    def test_SendOnlyIPv6(self) :
+        try :
+            self.sendTo(('::1', 0), socket.AF_INET6)
+        except XAsyncUDPDatagramException :
+            self.skipTest('IPv6 loopback not available')
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets not available')
+    def test_SendOnlyUnix(self) :
+        tmpDir = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, tmpDir)
+        path   = os.path.join(tmpDir, 'udp.sock')
+        self.sendTo(path, socket.AF_UNIX)
+
+    def test_FamilyMismatch(self) :
+        with self.assertRaises(XAsyncUDPDatagramException) :
+            XAsyncUDPDatagram.Create(self.pool, ('127.0.0.1', 0), family=getattr(socket, 'AF_INET6', -1))
+
+    def test_FailingSessionExpiredEvent(self) :
+        # A failing handler doesn't keep the other sessions alive nor
+        # the idle timeout disarmed,
+        expired = [ ]
+        def onSessionExpired(session, reason) :
+            expired.append(session.RemoteAddr)
+            if len(expired) == 1 :
+                raise Exception('failure')
+        def onSessionCreated(xAsyncUDPDatagram, session) :
+            session.OnSessionExpired = onSessionExpired
+        udp = XAsyncUDPDatagram.Create(self.pool, ('127.0.0.1', 0))
+        self.addCleanup(udp.Close)
+        udp.OnSessionCreated = onSessionCreated
+        udp.SetSessions(8, idleTimeoutSec=0.2)
+        peers = [ ]
+        for i in range(3) :
+            peer = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.addCleanup(peer.close)
+            peer.bind(('127.0.0.1', 0))
+            peer.sendto(b'x', udp.LocalAddr)
+            peers.append(peer.getsockname())
+        self.assertTrue(waitUntil(lambda : udp.SessionsCount == 3))
+        self.assertTrue(waitUntil(lambda : len(expired) == 3))
+        self.assertEqual(sorted(expired), sorted(peers))
+        self.assertEqual(udp.SessionsCount, 0)
+        peer = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(peer.close)
+        peer.sendto(b'x', udp.LocalAddr)
+        self.assertTrue(waitUntil(lambda : len(expired) == 4))
+
+# ============================================================================
+# ===( XHTTPConnection )======================================================
+# ============================================================================
+
+class HTTPConnectionTests(PoolTestCase) :
+
+    def setUp(self) :
+        super().setUp()
+        self.conns = [ ]
+        def onRequest(conn, req, arg) :
+            self.handleRequest(req)
+        def onClientAccepted(srv, cli) :
+            self.conns.append(cli.StartHTTP(onRequest))
+        self.srv, self.srvAddr = self.createServer(onClientAccepted=onClientAccepted)
+
+    def handleRequest(self, req) :
+        req.SendResponse(200, body=bytes(req.Body))
+
+    def talk(self, data) :
+        s = socket.create_connection(self.srvAddr, timeout=5)
+        try :
+            s.sendall(data)
+            resp = b''
+            while not b'\r\n\r\n' in resp :
+                buf = s.recv(4096)
+                if not buf :
+                    break
+                resp += buf
+            return resp
+        finally :
+            s.close()
+
+    def assertStatus(self, data, code) :
+        resp = self.talk(data)
+        self.assertTrue(resp.startswith(b'HTTP/1.1 %d ' % code), resp)
+
+    def readResponses(self, s, count) :
+        # Returns [ (status line, headers, body), ... ] and b'' or b'closed',
+        resps = [ ]
+        buf   = b''
+        while True :
+            end = buf.find(b'\r\n\r\n')
+            if end >= 0 :
+                lines   = buf[:end].decode().split('\r\n')
+                headers = dict( (k.lower(), v.strip())
+                                for k, v in (l.split(':', 1) for l in lines[1:]) )
+                size    = end + 4 + int(headers.get('content-length', 0))
+                if len(buf) >= size :
+                    resps.append((lines[0], headers, buf[end+4:size]))
+                    buf = buf[size:]
+                    if len(resps) == count :
+                        return resps
+                    continue
+            data = s.recv(4096)
+            if not data :
+                return resps
+            buf += data
+
+    def isClosedByServer(self, s) :
+        try :
+            return s.recv(1) == b''
+        except ConnectionResetError :
+            return True
+
+    def test_ContentLength(self) :
+        self.assertStatus(b'POST / HTTP/1.1\r\nContent-Length: 2\r\n\r\nok', 200)
+
+    def test_NonASCIIContentLength(self) :
+        # '\xb2' is a latin-1 superscript two, a digit for "str.isdigit",
+        for cl in ('\xb2', '+2', '2_0', ' ', '0x2') :
+            data = ('POST / HTTP/1.1\r\nContent-Length: %s\r\n\r\nok' % cl).encode('latin-1')
+            self.assertStatus(data, 400)
+
+    def test_ChunkSize(self) :
+        data = b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\na;x=1\r\n0123456789\r\n0\r\n\r\n'
+        self.assertStatus(data, 200)
+
+    def test_IncorrectChunkSize(self) :
+        for size in (b'0x5', b'+5', b'5_0', b'-5', b' 5', b'') :
+            data = b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n' + size + b'\r\nhello\r\n0\r\n\r\n'
+            self.assertStatus(data, 400)
+
+    def test_PipelinedResponsesOrder(self) :
+        requests = [ ]
+        self.handleRequest = requests.append
+        s = socket.create_connection(self.srvAddr, timeout=5)
+        self.addCleanup(s.close)
+        s.sendall( b'GET /a HTTP/1.1\r\n\r\n'
+                   b'POST /b HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc'
+                   b'GET /c HTTP/1.1\r\n\r\n' )
+        self.assertTrue(waitUntil(lambda : len(requests) == 3))
+        self.assertEqual([ req.Path for req in requests ], [ '/a', '/b', '/c' ])
+        self.assertEqual(self.conns[0].PendingResponsesCount, 3)
+        # Responded in the reverse order, sent in the order of the requests,
+        for req in reversed(requests) :
+            self.assertTrue(req.SendResponse(200, body=req.Path))
+        self.assertFalse(requests[0].SendResponse(200))
+        resps = self.readResponses(s, 3)
+        self.assertEqual([ body for line, headers, body in resps ], [ b'/a', b'/b', b'/c' ])
+        self.assertEqual(self.conns[0].RequestsCount, 3)
+        self.assertEqual(self.conns[0].PendingResponsesCount, 0)
+
+    def test_KeepAlive(self) :
+        s = socket.create_connection(self.srvAddr, timeout=5)
+        self.addCleanup(s.close)
+        for version, body in ( (b'1.1', b'one'), (b'1.0', b'two') ) :
+            s.sendall( b'POST / HTTP/' + version + b'\r\nConnection: keep-alive\r\n'
+                       b'Content-Length: 3\r\n\r\n' + body )
+            line, headers, recvBody = self.readResponses(s, 1)[0]
+            self.assertEqual(recvBody, body)
+            # Only needed for HTTP/1.0, where keep-alive is not the default,
+            self.assertEqual(headers.get('connection'), 'keep-alive' if version == b'1.0' else None)
+        self.assertEqual(self.conns[0].RequestsCount, 2)
+        for head in ( b'GET / HTTP/1.1\r\nConnection: close\r\n\r\n',
+                      b'GET / HTTP/1.0\r\n\r\n' ) :
+            s = socket.create_connection(self.srvAddr, timeout=5)
+            self.addCleanup(s.close)
+            s.sendall(head)
+            line, headers, body = self.readResponses(s, 1)[0]
+            self.assertEqual(headers['connection'], 'close')
+            self.assertTrue(self.isClosedByServer(s))
+
+    def test_HeadRequest(self) :
+        self.handleRequest = lambda req : req.SendResponse(200, body=b'not sent')
+        s = socket.create_connection(self.srvAddr, timeout=5)
+        self.addCleanup(s.close)
+        s.sendall(b'HEAD / HTTP/1.1\r\n\r\nGET / HTTP/1.1\r\n\r\n')
+        resp = b''
+        while resp.count(b'not sent') < 1 :
+            resp += s.recv(4096)
+        # The body of the HEAD response is not sent, only its length,
+        self.assertEqual(resp.count(b'Content-Length: 8\r\n'), 2)
+        self.assertTrue(resp.endswith(b'\r\n\r\nnot sent'))
+        self.assertEqual(resp.count(b'not sent'), 1)
+
+    def test_ExpectContinue(self) :
+        s = socket.create_connection(self.srvAddr, timeout=5)
+        self.addCleanup(s.close)
+        s.sendall(b'POST / HTTP/1.1\r\nContent-Length: 5\r\nExpect: 100-continue\r\n\r\n')
+        self.assertEqual(self.readResponses(s, 1)[0][0], 'HTTP/1.1 100 Continue')
+        s.sendall(b'hello')
+        line, headers, body = self.readResponses(s, 1)[0]
+        self.assertEqual((line, body), ('HTTP/1.1 200 OK', b'hello'))
+
+    def test_ErrorStatusCloses(self) :
+        for data, code in ( (b'POST / HTTP/1.1\r\nContent-Length: 2000000\r\n\r\n', 413),
+                            (b'GET / HTTP/1.1\r\nX: ' + b'x' * 9000 + b'\r\n\r\n', 431),
+                            (b'POST / HTTP/1.1\r\nTransfer-Encoding: gzip\r\n\r\n', 501),
+                            (b'GET / HTTP/2.0\r\n\r\n', 505),
+                            (b'GET /\r\n\r\n', 400) ) :
+            with self.subTest(code=code) :
+                s = socket.create_connection(self.srvAddr, timeout=5)
+                self.addCleanup(s.close)
+                s.sendall(data)
+                line, headers, body = self.readResponses(s, 1)[0]
+                self.assertTrue(line.startswith('HTTP/1.1 %d ' % code), line)
+                self.assertTrue(self.isClosedByServer(s))
+
+    def test_RespondAfterClose(self) :
+        requests = [ ]
+        self.handleRequest = requests.append
+        s = socket.create_connection(self.srvAddr, timeout=5)
+        s.sendall(b'GET / HTTP/1.1\r\n\r\n')
+        self.assertTrue(waitUntil(lambda : requests))
+        conn = self.conns[0]
+        self.assertFalse(conn.IsClosed)
+        s.close()
+        self.assertTrue(waitUntil(lambda : conn.IsClosed))
+        self.assertFalse(requests[0].SendResponse(200))
+
+    def test_UpgradeWithPipelinedFrame(self) :
+        # The frame received with the upgrade request, before the upgrade,
+        # is given to the WebSocket,
+        requests = [ ]
+        messages = [ ]
+        self.handleRequest = requests.append
+        mask  = b'\x01\x02\x03\x04'
+        frame = b'\x81\x82' + mask + bytes(c ^ mask[i % 4] for i, c in enumerate(b'hi'))
+        s = socket.create_connection(self.srvAddr, timeout=5)
+        self.addCleanup(s.close)
+        s.sendall( b'GET /ws HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\n'
+                   b'Connection: Upgrade\r\nSec-WebSocket-Version: 13\r\n'
+                   b'Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n\r\n' + frame )
+        self.assertTrue(waitUntil(lambda : requests))
+        sleep(0.05)
+        webSocket = requests[0].UpgradeToWebSocket(lambda ws, msg, arg : messages.append(msg))
+        self.assertIsNotNone(webSocket)
+        self.assertTrue(waitUntil(lambda : messages))
+        self.assertEqual(messages, [ 'hi' ])
+
+# ============================================================================
+# ===( XWebSocket )===========================================================
+# ============================================================================
+
+class WebSocketTests(PoolTestCase) :
+
+    KEY = 'dGhlIHNhbXBsZSBub25jZQ=='
+
+    def setUp(self) :
+        super().setUp()
+        self.webSockets     = [ ]
+        self.messages       = [ ]
+        self.closeCodes     = [ ]
+        self.maxMessageSize = 1048576
+        def onMessage(ws, msg, arg) :
+            self.messages.append(msg)
+            if isinstance(msg, str) :
+                ws.SendText(msg)
+            else :
+                ws.SendBinary(msg)
+        def onRequest(conn, req, arg) :
+            ws = req.UpgradeToWebSocket(onMessage, maxMessageSize=self.maxMessageSize)
+            ws.OnClosed = lambda ws, code : self.closeCodes.append(code)
+            self.webSockets.append(ws)
+        self.srv, self.srvAddr = self.createServer( onClientAccepted = lambda srv, cli :
+                                                    cli.StartHTTP(onRequest) )
+
+    def connect(self) :
+        s = socket.create_connection(self.srvAddr, timeout=5)
+        self.addCleanup(s.close)
+        s.sendall( ( 'GET /ws HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\n'
+                     'Connection: Upgrade\r\nSec-WebSocket-Version: 13\r\n'
+                     'Sec-WebSocket-Key: %s\r\n\r\n' % WebSocketTests.KEY ).encode() )
+        head = b''
+        while not head.endswith(b'\r\n\r\n') :
+            head += s.recv(1)
+        self.assertTrue(waitUntil(lambda : self.webSockets))
+        return s, head
+
+    def frame(self, opcode, payload, fin=True, mask=b'\x11\x22\x33\x44') :
+        n = len(payload)
+        if n < 126 :
+            header = bytes((opcode | (0x80 if fin else 0), n | (0x80 if mask else 0)))
+        elif n < 65536 :
+            header = struct.pack('!BBH', opcode | (0x80 if fin else 0), 126 | (0x80 if mask else 0), n)
+        else :
+            header = struct.pack('!BBQ', opcode | (0x80 if fin else 0), 127 | (0x80 if mask else 0), n)
+        if not mask :
+            return header + payload
+        return header + mask + bytes(c ^ mask[i % 4] for i, c in enumerate(payload))
+
+    def recvExactly(self, s, size) :
+        data = b''
+        while len(data) < size :
+            chunk = s.recv(size - len(data))
+            if not chunk :
+                raise ConnectionError('closed')
+            data += chunk
+        return data
+
+    def readFrame(self, s) :
+        # Server frames are not masked,
+        b0, b1 = self.recvExactly(s, 2)
+        self.assertFalse(b1 & 0x80)
+        n = b1 & 0x7F
+        if n == 126 :
+            n = struct.unpack('!H', self.recvExactly(s, 2))[0]
+        elif n == 127 :
+            n = struct.unpack('!Q', self.recvExactly(s, 8))[0]
+        return b0 & 0x0F, self.recvExactly(s, n)
+
+    def assertClosedWith(self, s, code) :
+        opcode, payload = self.readFrame(s)
+        self.assertEqual(opcode, XWebSocket.OPCODE_CLOSE)
+        self.assertEqual(struct.unpack('!H', payload[:2])[0], code)
+        self.assertEqual(s.recv(1), b'')
+        self.assertTrue(waitUntil(lambda : self.closeCodes))
+        self.assertEqual(self.closeCodes, [ code ])
+        self.assertTrue(self.webSockets[0].IsClosed)
+
+    def test_Handshake(self) :
+        from base64  import b64encode
+        from hashlib import sha1
+        s, head = self.connect()
+        accept  = b64encode(sha1((WebSocketTests.KEY + XWebSocket._GUID).encode()).digest())
+        self.assertTrue(head.startswith(b'HTTP/1.1 101 '), head)
+        self.assertIn(b'\r\nSec-WebSocket-Accept: ' + accept + b'\r\n', head)
+        self.assertEqual(self.webSockets[0].Request.Path, '/ws')
+
+    def test_Unmask(self) :
+        mask = b'\xa1\xb2\xc3\xd4'
+        for n in (0, 1, 3, 4, 5, 8, 127, 1000) :
+            data = bytes(i % 256 for i in range(n))
+            self.assertEqual( XWebSocket._unmask(data, mask),
+                              bytes(c ^ mask[i % 4] for i, c in enumerate(data)) )
+
+    def test_Messages(self) :
+        s, head = self.connect()
+        # Small, 16 bits and 64 bits lengths, all sent in one write,
+        binary = bytes(i % 256 for i in range(70000))
+        s.sendall( self.frame(XWebSocket.OPCODE_TEXT,   'héllo'.encode()) +
+                   self.frame(XWebSocket.OPCODE_BINARY, binary[:300])     +
+                   self.frame(XWebSocket.OPCODE_BINARY, binary) )
+        self.assertEqual(self.readFrame(s), (XWebSocket.OPCODE_TEXT,   'héllo'.encode()))
+        self.assertEqual(self.readFrame(s), (XWebSocket.OPCODE_BINARY, binary[:300]))
+        self.assertEqual(self.readFrame(s), (XWebSocket.OPCODE_BINARY, binary))
+        self.assertEqual(self.messages, [ 'héllo', binary[:300], binary ])
+        self.assertEqual(self.webSockets[0].MessagesRecv, 3)
+        self.assertEqual(self.webSockets[0].MessagesSent, 3)
+
+    def test_FrameSplitAcrossReads(self) :
+        s, head = self.connect()
+        data = self.frame(XWebSocket.OPCODE_TEXT, b'split frame')
+        for i in range(len(data)) :
+            s.sendall(data[i:i+1])
+            sleep(0.002)
+        self.assertEqual(self.readFrame(s), (XWebSocket.OPCODE_TEXT, b'split frame'))
+
+    def test_FragmentedMessage(self) :
+        s, head = self.connect()
+        # A ping can be received between the fragments of a message,
+        s.sendall( self.frame(XWebSocket.OPCODE_TEXT,         b'frag', fin=False) +
+                   self.frame(XWebSocket.OPCODE_PING,         b'p1')              +
+                   self.frame(XWebSocket.OPCODE_CONTINUATION, b'men',  fin=False) +
+                   self.frame(XWebSocket.OPCODE_CONTINUATION, b'ted') )
+        self.assertEqual(self.readFrame(s), (XWebSocket.OPCODE_PONG, b'p1'))
+        self.assertEqual(self.readFrame(s), (XWebSocket.OPCODE_TEXT, b'fragmented'))
+        self.assertEqual(self.messages, [ 'fragmented' ])
+
+    def test_PingPong(self) :
+        pongs = [ ]
+        s, head = self.connect()
+        ws = self.webSockets[0]
+        ws.OnPong = lambda ws, data : pongs.append(data)
+        self.assertTrue(ws.Ping(b'srv'))
+        self.assertEqual(self.readFrame(s), (XWebSocket.OPCODE_PING, b'srv'))
+        s.sendall(self.frame(XWebSocket.OPCODE_PONG, b'srv'))
+        self.assertTrue(waitUntil(lambda : pongs))
+        self.assertEqual(pongs, [ b'srv' ])
+        with self.assertRaises(XWebSocketException) :
+            ws.Ping(b'x' * 126)
+
+    def test_CloseByPeer(self) :
+        s, head = self.connect()
+        s.sendall(self.frame(XWebSocket.OPCODE_CLOSE, struct.pack('!H', 1001) + b'bye'))
+        # The status code is echoed, then the connection is closed,
+        self.assertClosedWith(s, 1001)
+        self.assertEqual(self.webSockets[0].CloseCode, 1001)
+
+    def test_CloseByServer(self) :
+        s, head = self.connect()
+        ws = self.webSockets[0]
+        self.assertTrue(ws.Close(1000, 'done'))
+        self.assertEqual(self.readFrame(s), (XWebSocket.OPCODE_CLOSE, struct.pack('!H', 1000) + b'done'))
+        self.assertFalse(ws.SendText('late'))
+        self.assertFalse(ws.Ping())
+        self.assertFalse(ws.Close())
+        self.assertFalse(ws.IsClosed)
+        s.sendall(self.frame(XWebSocket.OPCODE_CLOSE, struct.pack('!H', 1000)))
+        self.assertEqual(s.recv(1), b'')
+        self.assertTrue(waitUntil(lambda : self.closeCodes))
+        self.assertEqual(self.closeCodes, [ 1000 ])
+
+    def test_ConnectionLost(self) :
+        s, head = self.connect()
+        s.close()
+        self.assertTrue(waitUntil(lambda : self.closeCodes))
+        self.assertEqual(self.closeCodes, [ XWebSocket.CLOSE_ABNORMAL ])
+
+    def test_ProtocolErrors(self) :
+        for name, data in ( ('unmasked',       self.frame(XWebSocket.OPCODE_TEXT, b'hi', mask=None)),
+                            ('reserved bits',  b'\xc1' + self.frame(XWebSocket.OPCODE_TEXT, b'hi')[1:]),
+                            ('bad opcode',     self.frame(0x3, b'hi')),
+                            ('continuation',   self.frame(XWebSocket.OPCODE_CONTINUATION, b'hi')),
+                            ('not continued',  self.frame(XWebSocket.OPCODE_TEXT, b'a', fin=False) +
+                                               self.frame(XWebSocket.OPCODE_TEXT, b'b')),
+                            ('fragmented ping', self.frame(XWebSocket.OPCODE_PING, b'p', fin=False)),
+                            ('long ping',      self.frame(XWebSocket.OPCODE_PING, b'p' * 126)) ) :
+            with self.subTest(name=name) :
+                del self.webSockets[:], self.closeCodes[:]
+                s, head = self.connect()
+                s.sendall(data)
+                self.assertClosedWith(s, XWebSocket.CLOSE_PROTOCOL_ERROR)
+
+    def test_InvalidUTF8(self) :
+        s, head = self.connect()
+        s.sendall(self.frame(XWebSocket.OPCODE_TEXT, b'\xff\xfe'))
+        self.assertClosedWith(s, XWebSocket.CLOSE_INVALID_DATA)
+        self.assertEqual(self.messages, [ ])
+
+    def test_MessageTooBig(self) :
+        self.maxMessageSize = 16
+        s, head = self.connect()
+        s.sendall(self.frame(XWebSocket.OPCODE_TEXT, b'x' * 16))
+        self.assertEqual(self.readFrame(s), (XWebSocket.OPCODE_TEXT, b'x' * 16))
+        # Also for the total size of a fragmented message,
+        s.sendall( self.frame(XWebSocket.OPCODE_TEXT,         b'x' * 10, fin=False) +
+                   self.frame(XWebSocket.OPCODE_CONTINUATION, b'x' * 10) )
+        self.assertClosedWith(s, XWebSocket.CLOSE_TOO_BIG)
+
+# ============================================================================
+# ===( XAsyncDNSResolver )====================================================
+# ============================================================================
+
+class DNSResolverTests(unittest.TestCase) :
+
+    def setUp(self) :
+        self.resolver = XAsyncDNSResolver(workersCount=1, cacheSize=2)
+        self.addCleanup(self.resolver.Stop)
+
+    def resolve(self, host, port, family=0) :
+        results = [ ]
+        self.resolver.Resolve(host, port, lambda r, addrs, arg : results.append((addrs, arg)), 'arg', family)
+        self.assertTrue(waitUntil(lambda : results))
+        self.assertEqual(results[0][1], 'arg')
+        return results[0][0]
+
+    def test_IsIPAddress(self) :
+        self.assertTrue(XAsyncDNSResolver.IsIPAddress('127.0.0.1'))
+        self.assertTrue(XAsyncDNSResolver.IsIPAddress('::1'))
+        for host in ('localhost', '256.0.0.1', '', None) :
+            self.assertFalse(XAsyncDNSResolver.IsIPAddress(host))
+
+    def test_IPAddressNotResolved(self) :
+        self.assertEqual( self.resolver.GetCached('127.0.0.1', 80),
+                          [ (socket.AF_INET, ('127.0.0.1', 80)) ] )
+        self.assertEqual(self.resolver.CachedCount, 0)
+
+    def test_ResolveAndCache(self) :
+        addrs = self.resolve('localhost', 80, socket.AF_INET)
+        self.assertIn((socket.AF_INET, ('127.0.0.1', 80)), addrs)
+        self.assertEqual(self.resolver.Misses, 1)
+        self.assertEqual(self.resolver.GetCached('localhost', 80, socket.AF_INET), addrs)
+        self.assertEqual(self.resolve('localhost', 80, socket.AF_INET), addrs)
+        self.assertEqual(self.resolver.Hits, 2)
+        self.resolver.ClearCache()
+        self.assertIsNone(self.resolver.GetCached('localhost', 80, socket.AF_INET))
+
+    def test_NegativeCache(self) :
+        # 'a..b' fails in the IDNA encoding, without any DNS request,
+        self.assertEqual(self.resolve('a..b', 80), [ ])
+        self.assertEqual(self.resolver.GetCached('a..b', 80), [ ])
+        self.assertEqual(self.resolver.ResolveSync('a..b', 80), [ ])
+
+    def test_LeastRecentlyUsedEviction(self) :
+        for port in (1, 2, 3) :
+            self.resolver.ResolveSync('localhost', port, socket.AF_INET)
+        self.assertEqual(self.resolver.CachedCount, 2)
+        self.assertIsNone(self.resolver.GetCached('localhost', 1, socket.AF_INET))
+        self.assertIsNotNone(self.resolver.GetCached('localhost', 3, socket.AF_INET))
+
+    def test_IncorrectArguments(self) :
+        with self.assertRaises(XAsyncDNSResolverException) :
+            XAsyncDNSResolver(cacheSize=0)
+        with self.assertRaises(XAsyncDNSResolverException) :
+            XAsyncDNSResolver(cacheTTLSec=-1)
+        with self.assertRaises(XAsyncDNSResolverException) :
+            self.resolver.Resolve('localhost', 80, None)
+
+class DNSResolverClientTests(PoolTestCase) :
+
+    def test_CreateWithResolver(self) :
+        lines = [ ]
+        self.pool.DNSResolver = XAsyncDNSResolver(workersCount=1)
+        self.addCleanup(self.pool.DNSResolver.Stop)
+        srv, srvAddr = self.createServer(onClientAccepted=lambda srv, cli : cli.AsyncSendData(b'hello\n'))
+        for i in range(2) :
+            cli = XAsyncTCPClient.Create(self.pool, ('localhost', srvAddr[1]))
+            self.assertIsNotNone(cli)
+            self.addCleanup(cli.Close)
+            cli.AsyncRecvLine(onLineRecv=lambda cli, line, arg : lines.append(line))
+            self.assertTrue(waitUntil(lambda : len(lines) == i + 1))
+        self.assertEqual(self.pool.DNSResolver.Hits, 1)
+
+# ============================================================================
+# ===( Happy Eyeballs )=======================================================
+# ============================================================================
+
+def ipv6Available() :
+    try :
+        s = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+        try :
+            s.bind(('::1', 0))
+        finally :
+            s.close()
+        return True
+    except Exception :
+        return False
+
+class ConnectRaceTests(PoolTestCase) :
+
+    def connectByName(self, addrs, port, raceDelaySec) :
+        # The resolver cache gives the addresses of a fake host name,
+        resolver = XAsyncDNSResolver(workersCount=1)
+        self.addCleanup(resolver.Stop)
+        resolver._cacheSet(('race.test', port, 0), addrs)
+        self.pool.DNSResolver = resolver
+        events = [ ]
+        cli = XAsyncTCPClient.Create(self.pool, ('race.test', port), raceDelaySec=raceDelaySec)
+        self.assertIsNotNone(cli)
+        self.addCleanup(cli.Close)
+        cli.OnConnected      = lambda cli : events.append(('connected', cli.SrvAddr))
+        cli.OnFailsToConnect = lambda cli : events.append(('fails', None))
+        self.assertTrue(waitUntil(lambda : events))
+        return cli, events
+
+    @unittest.skipUnless(ipv6Available(), 'IPv6 loopback not available')
+    def test_IPv6Client(self) :
+        lines = [ ]
+        srv = XAsyncTCPServer.Create(self.pool, ('::1', 0), bufSlots=XBufferSlots(4, 1024))
+        self.addCleanup(srv.Close)
+        srv.OnClientAccepted = lambda srv, cli : cli.AsyncSendData(b'hello\n')
+        cli = XAsyncTCPClient.Create(self.pool, ('::1', srv.GetSocketObj().getsockname()[1]))
+        self.assertIsNotNone(cli)
+        self.addCleanup(cli.Close)
+        cli.AsyncRecvLine(onLineRecv=lambda cli, line, arg : lines.append(line))
+        self.assertTrue(waitUntil(lambda : lines))
+        self.assertEqual(lines, [ 'hello' ])
+        self.assertEqual(cli.GetSocketObj().family, socket.AF_INET6)
+
+    @unittest.skipUnless(ipv6Available(), 'IPv6 loopback not available')
+    def test_RaceAfterRefusedAddress(self) :
+        # Nothing listens on IPv6, the IPv4 attempt wins,
+        srv, srvAddr = self.createServer(onClientAccepted=lambda srv, cli : None)
+        port = srvAddr[1]
+        addrs = [ (socket.AF_INET6, ('::1', port, 0, 0)),
+                  (socket.AF_INET,  ('127.0.0.1', port)) ]
+        cli, events = self.connectByName(addrs, port, 1.0)
+        self.assertEqual(events[0][0], 'connected')
+        self.assertEqual(cli.GetSocketObj().family, socket.AF_INET)
+        self.assertTrue(waitUntil(lambda : srv.ConnectionsCount == 1))
+
+    def test_RaceAllRefused(self) :
+        srv, srvAddr = self.createServer()
+        port = srvAddr[1]
+        srv.Close()
+        addrs = [ (socket.AF_INET, ('127.0.0.1', port)),
+                  (socket.AF_INET, ('127.0.0.2', port)) ]
+        cli, events = self.connectByName(addrs, port, 0.05)
+        self.assertEqual(events, [ ('fails', None) ])
+        self.assertIsNone(cli.SocketID)
+
+    def test_RaceDelayWithoutAsyncConnect(self) :
+        with self.assertRaises(XAsyncTCPClientException) :
+            XAsyncTCPClient.Create(self.pool, ('127.0.0.1', 1), connectAsync=False, raceDelaySec=0.1)
+        with self.assertRaises(XAsyncTCPClientException) :
+            XAsyncTCPClient.Create(self.pool, ('127.0.0.1', 1), raceDelaySec=-1)
+
+# ============================================================================
+# ===( Metrics )==============================================================
+# ============================================================================
+
+class MetricsTests(PoolTestCase) :
+
+    def echo(self, data) :
+        received = [ ]
+        def onDataRecv(cli, d, arg) :
+            cli.AsyncSendData(bytes(d))
+            cli.AsyncRecvData(len(data), onDataRecv)
+        def onClientAccepted(srv, cli) :
+            cli.AsyncRecvData(len(data), onDataRecv)
+        srv, srvAddr = self.createServer(onClientAccepted=onClientAccepted)
+        cli = XAsyncTCPClient.Create(self.pool, srvAddr)
+        self.assertIsNotNone(cli)
+        self.addCleanup(cli.Close)
+        cli.AsyncRecvData(len(data), lambda cli, d, arg : received.append(bytes(d)))
+        cli.AsyncSendData(data)
+        self.assertTrue(waitUntil(lambda : received))
+        return srv, cli
+
+    def test_GetMetrics(self) :
+        srv, cli = self.echo(b'0123456789')
+        metrics = self.pool.GetMetrics()
+        self.assertEqual(metrics['socketsByClass'], { 'XAsyncTCPServer' : 1, 'XAsyncTCPClient' : 2 })
+        self.assertEqual(metrics['bufSlotsCount'], 4)
+        self.assertEqual(metrics['bufSlotsUsed'], 2)
+        io = metrics['io']['XAsyncTCPClient']
+        self.assertEqual(io['bytesRecv'], 20)
+        self.assertEqual(io['bytesSent'], 20)
+        self.assertGreater(metrics['loopsCount'], 0)
+        self.assertGreater(metrics['eventsCount'], 0)
+
+    def test_ClosedSocketsIO(self) :
+        # Counters of closed sockets are kept in the "io" totals,
+        srv, cli = self.echo(b'0123456789')
+        cli.Close()
+        self.assertTrue(waitUntil(lambda : srv.ConnectionsCount == 0))
+        metrics = self.pool.GetMetrics()
+        self.assertEqual(metrics['socketsByClass'], { 'XAsyncTCPServer' : 1 })
+        self.assertEqual(metrics['bufSlotsUsed'], 0)
+        self.assertEqual(metrics['io']['XAsyncTCPClient']['bytesSent'], 20)
+
+    def test_OnMetrics(self) :
+        snapshots = [ ]
+        self.pool.MetricsIntervalSec = 0.05
+        self.pool.OnMetrics          = lambda pool, metrics : snapshots.append(metrics)
+        self.pool.CallLater(0.2, lambda arg : None)
+        self.assertTrue(waitUntil(lambda : len(snapshots) >= 2))
+        self.assertIn('loopsCount', snapshots[0])
+        with self.assertRaises(XAsyncSocketsPoolException) :
+            self.pool.MetricsIntervalSec = 0
+
+    def test_OnMetricsInAsyncioLoop(self) :
+        snapshots = [ ]
+        pool      = XAsyncSocketsPool()
+        async def run() :
+            pool.AttachAsyncioLoop()
+            pool.MetricsIntervalSec = 0.05
+            pool.OnMetrics          = lambda pool, metrics : snapshots.append(metrics)
+            pool.CallLater(0.3, lambda arg : None)
+            for i in range(300) :
+                if len(snapshots) >= 2 :
+                    break
+                await asyncio.sleep(0.01)
+            pool.StopWaitEvents()
+        asyncio.run(run())
+        self.assertGreaterEqual(len(snapshots), 2)
+
+# ============================================================================
+# ===( Callbacks profiling )==================================================
+# ============================================================================
+
+class CallbacksProfilingTests(PoolTestCase) :
+
+    def test_Profiles(self) :
+        self.pool.CallbacksProfiling = True
+        accepted = [ ]
+        srv, srvAddr = self.createServer(onClientAccepted=lambda srv, cli : accepted.append(cli))
+        peer = socket.create_connection(srvAddr)
+        self.addCleanup(peer.close)
+        self.assertTrue(waitUntil(lambda : accepted))
+        profiles = self.pool.GetCallbacksProfiles()
+        profile  = profiles['XAsyncTCPServer']['OnReadyForReading']
+        self.assertEqual(profile['count'], 1)
+        self.assertEqual(sum(profile['buckets']), 1)
+        self.assertGreaterEqual(profile['totalSec'], profile['maxSec'])
+        self.pool.ResetCallbacksProfiles()
+        self.assertEqual(self.pool.GetCallbacksProfiles(), { })
+
+    def test_NoProfilesByDefault(self) :
+        accepted = [ ]
+        srv, srvAddr = self.createServer(onClientAccepted=lambda srv, cli : accepted.append(cli))
+        peer = socket.create_connection(srvAddr)
+        self.addCleanup(peer.close)
+        self.assertTrue(waitUntil(lambda : accepted))
+        self.assertEqual(self.pool.GetCallbacksProfiles(), { })
+
+    def test_OnSlowCallback(self) :
+        slowCalls = [ ]
+        def onClientAccepted(srv, cli) :
+            sleep(0.06)
+        self.pool.CallbacksProfiling = True
+        self.pool.SlowCallbackSec    = 0.05
+        self.pool.OnSlowCallback     = lambda pool, asyncSocket, eventName, callbackName, durationSec : \
+                                       slowCalls.append((eventName, callbackName, durationSec))
+        srv, srvAddr = self.createServer(onClientAccepted=onClientAccepted)
+        peer = socket.create_connection(srvAddr)
+        self.addCleanup(peer.close)
+        self.assertTrue(waitUntil(lambda : slowCalls))
+        eventName, callbackName, durationSec = slowCalls[0]
+        self.assertEqual((eventName, callbackName), ('OnReadyForReading', 'onClientAccepted'))
+        self.assertGreaterEqual(durationSec, 0.05)
+        with self.assertRaises(XAsyncSocketsPoolException) :
+            self.pool.SlowCallbackSec = -1
+
+# ============================================================================
+# ===( Watermarks )===========================================================
+# ============================================================================
+
+class WatermarksTests(PoolTestCase) :
+
+    def acceptPeers(self, count) :
+        accepted = [ ]
+        srv, srvAddr = self.createServer(slotsCount=2 * count, onClientAccepted=lambda srv, cli : accepted.append(cli))
+        peers = [ ]
+        for i in range(count) :
+            peer = socket.socket()
+            peer.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+            peer.connect(srvAddr)
+            peer.settimeout(5)
+            self.addCleanup(peer.close)
+            peers.append(peer)
+            self.assertTrue(waitUntil(lambda : len(accepted) == i + 1))
+        return accepted, peers
+
+    def recvSize(self, peer, size) :
+        while size > 0 :
+            size -= len(peer.recv(min(size, 65536)))
+
+    def test_FullAndDrained(self) :
+        (cli, ), (peer, ) = self.acceptPeers(1)
+        events = [ ]
+        cli.OnSendBufferFull    = lambda cli : events.append('full')
+        cli.OnSendBufferDrained = lambda cli : events.append('drained')
+        cli.SetSendBufferWatermarks(1048576)
+        self.assertTrue(cli.AsyncSendData(b'x' * 8388608))
+        self.assertTrue(cli.IsSendBufferFull)
+        self.assertTrue(cli.AsyncSendData(b'y'))
+        self.assertEqual(events, [ 'full' ])
+        self.recvSize(peer, 8388609)
+        self.assertTrue(waitUntil(lambda : cli.SendBufferedLen == 0))
+        self.assertEqual(events, [ 'full', 'drained' ])
+        self.assertFalse(cli.IsSendBufferFull)
+
+    def test_RemoveWatermarks(self) :
+        (cli, ), (peer, ) = self.acceptPeers(1)
+        events = [ ]
+        cli.OnSendBufferDrained = lambda cli : events.append('drained')
+        cli.SetSendBufferWatermarks(1024)
+        cli.AsyncSendData(b'x' * 8388608)
+        self.assertTrue(cli.IsSendBufferFull)
+        cli.SetSendBufferWatermarks(None)
+        self.assertFalse(cli.IsSendBufferFull)
+        self.assertEqual(events, [ 'drained' ])
+
+    def test_PauseReadingOf(self) :
+        # A proxy : the incoming side is paused while the outgoing side is
+        # full,
+        (cliIn, cliOut), (peerIn, peerOut) = self.acceptPeers(2)
+        received = [ ]
+        cliIn.AsyncRecvData(5, lambda cli, data, arg : received.append(bytes(data)))
+        cliOut.SetSendBufferWatermarks(1048576, pauseReadingOf=cliIn)
+        cliOut.AsyncSendData(b'x' * 8388608)
+        self.assertTrue(cliIn.IsReadingPaused)
+        peerIn.sendall(b'hello')
+        sleep(0.1)
+        self.assertEqual(received, [ ])
+        self.assertEqual(cliIn.BytesRecv, 0)
+        self.recvSize(peerOut, 8388608)
+        self.assertTrue(waitUntil(lambda : received))
+        self.assertFalse(cliIn.IsReadingPaused)
+        self.assertEqual(received, [ b'hello' ])
+
+    def test_PauseAndResumeReading(self) :
+        (cli, ), (peer, ) = self.acceptPeers(1)
+        received = [ ]
+        cli.PauseReading()
+        cli.AsyncRecvData(5, lambda cli, data, arg : received.append(bytes(data)))
+        peer.sendall(b'hello')
+        sleep(0.1)
+        self.assertTrue(cli.IsReadingPaused)
+        self.assertEqual(received, [ ])
+        cli.ResumeReading()
+        self.assertTrue(waitUntil(lambda : received))
+        self.assertEqual(received, [ b'hello' ])
+
+    def test_IncorrectWatermarks(self) :
+        (cli, ), (peer, ) = self.acceptPeers(1)
+        for args in ( (0, ), (1024.0, ), (1024, 1024), (1024, -1), (1024, None, peer) ) :
+            with self.assertRaises(XAsyncTCPClientException) :
+                cli.SetSendBufferWatermarks(*args)
+
+# ============================================================================
+# ===( Admission control )====================================================
+# ============================================================================
+
+class AdmissionControlTests(PoolTestCase) :
+
+    def setUp(self) :
+        super().setUp()
+        self.accepted = [ ]
+        self.rejected = [ ]
+        self.srv, self.srvAddr = self.createServer( slotsCount       = 16,
+                                                    onClientAccepted = lambda srv, cli : self.accepted.append(cli) )
+        self.srv.OnClientRejected = lambda srv, cliAddr, reason : self.rejected.append((cliAddr[0], reason))
+
+    def connect(self) :
+        peer = socket.create_connection(self.srvAddr, timeout=5)
+        self.addCleanup(peer.close)
+        return peer
+
+    def assertRejected(self, reason, count=1) :
+        # The reset can be received by the connection itself,
+        with self.assertRaises(ConnectionResetError) :
+            self.connect().recv(1)
+        self.assertTrue(waitUntil(lambda : self.srv.RejectedCounts.get(reason) == count))
+
+    def test_MaxConnections(self) :
+        # Over the limit, clients wait in the listen backlog,
+        self.srv.SetAdmissionControl(maxConnections=1)
+        self.connect()
+        self.assertTrue(waitUntil(lambda : len(self.accepted) == 1))
+        self.connect()
+        sleep(0.1)
+        self.assertEqual(len(self.accepted), 1)
+        self.accepted[0].Close()
+        self.assertTrue(waitUntil(lambda : len(self.accepted) == 2))
+        self.assertEqual(self.rejected, [ ])
+        self.assertEqual(self.srv.RejectedCounts, { })
+
+    def test_MaxConnectionsPerIP(self) :
+        self.srv.SetAdmissionControl(maxConnectionsPerIP=2)
+        self.connect()
+        self.connect()
+        self.assertTrue(waitUntil(lambda : len(self.accepted) == 2))
+        self.assertRejected('maxConnectionsPerIP')
+        self.assertEqual(self.rejected, [ ('127.0.0.1', 'maxConnectionsPerIP') ])
+        self.accepted[0].Close()
+        self.assertTrue(waitUntil(lambda : self.srv.ConnectionsCount == 1))
+        self.connect()
+        self.assertTrue(waitUntil(lambda : len(self.accepted) == 3))
+
+    def test_OpenedConnectionsCounted(self) :
+        self.connect()
+        self.assertTrue(waitUntil(lambda : len(self.accepted) == 1))
+        self.srv.SetAdmissionControl(maxConnectionsPerIP=1)
+        self.assertRejected('maxConnectionsPerIP')
+
+    def test_RatePerIP(self) :
+        # Token bucket of 2 connections, 1 more per second,
+        self.srv.SetAdmissionControl(ratePerIP=1, burstPerIP=2)
+        self.connect()
+        self.connect()
+        self.assertTrue(waitUntil(lambda : len(self.accepted) == 2))
+        self.assertRejected('rateLimit')
+        sleep(1.1)
+        self.connect()
+        self.assertTrue(waitUntil(lambda : len(self.accepted) == 3))
+
+    def test_NoHandler(self) :
+        self.srv.OnClientAccepted = None
+        self.assertRejected('noHandler')
+        self.assertEqual(self.rejected, [ ('127.0.0.1', 'noHandler') ])
+
+    def test_IncorrectArguments(self) :
+        for kwargs in ( { 'maxConnections'      : 0     },
+                        { 'maxConnectionsPerIP' : -1    },
+                        { 'ratePerIP'           : '10'  },
+                        { 'burstPerIP'          : 0     } ) :
+            with self.assertRaises(XAsyncTCPServerException) :
+                self.srv.SetAdmissionControl(**kwargs)
+
+# ============================================================================
+# ===( XSocketOptions )=======================================================
+# ============================================================================
+
+class SocketOptionsTests(PoolTestCase) :
+
+    def getOpt(self, sock, level, opt) :
+        return sock.getsockopt(level, opt)
+
+    def test_Presets(self) :
+        opts = XSocketOptions.Preset('low-latency', keepAlive=True, tos=None).Options
+        self.assertEqual((opts['noDelay'], opts['quickAck'], opts['keepAlive'], opts['tos']), (True, True, True, None))
+        opts = XSocketOptions.Preset('bulk-throughput').Options
+        self.assertEqual((opts['noDelay'], opts['sendBufSize']), (False, 1048576))
+        with self.assertRaises(XSocketOptionsException) :
+            XSocketOptions.Preset('fastest')
+
+    def test_IncorrectOptions(self) :
+        with self.assertRaises(XSocketOptionsException) :
+            XSocketOptions(noDelay='yes')
+        with self.assertRaises(XAsyncTCPServerException) :
+            XAsyncTCPServer.Create(self.pool, ('127.0.0.1', 0), socketOptions=[ 'noDelay' ])
+
+    def test_ServerAndClientOptions(self) :
+        accepted = [ ]
+        srv = XAsyncTCPServer.Create( self.pool, ('127.0.0.1', 0),
+                                      socketOptions = { 'noDelay' : True, 'keepAlive' : True } )
+        self.addCleanup(srv.Close)
+        srv.OnClientAccepted = lambda srv, cli : accepted.append(cli)
+        self.assertIsInstance(srv.SocketOptions, XSocketOptions)
+        self.assertTrue(self.getOpt(srv.GetSocketObj(), socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+        cli = XAsyncTCPClient.Create(self.pool, srv.GetSocketObj().getsockname(), socketOptions='low-latency')
+        self.addCleanup(cli.Close)
+        self.assertTrue(waitUntil(lambda : accepted))
+        self.assertIs(accepted[0].SocketOptions, srv.SocketOptions)
+        for sock in (accepted[0].GetSocketObj(), cli.GetSocketObj()) :
+            self.assertTrue(self.getOpt(sock, socket.IPPROTO_TCP, socket.TCP_NODELAY))
+        self.assertTrue(self.getOpt(accepted[0].GetSocketObj(), socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+        self.assertEqual(self.getOpt(cli.GetSocketObj(), socket.IPPROTO_IP, socket.IP_TOS), 0x10)
+
+    def test_DefaultsKept(self) :
+        srv, srvAddr = self.createServer()
+        self.assertIsNone(srv.SocketOptions)
+        cli = XAsyncTCPClient.Create(self.pool, srvAddr, socketOptions=XSocketOptions(keepAlive=True))
+        self.addCleanup(cli.Close)
+        self.assertFalse(self.getOpt(cli.GetSocketObj(), socket.IPPROTO_TCP, socket.TCP_NODELAY))
+
+    def test_DatagramOptions(self) :
+        # Stream options are not applied to a datagram socket,
+        options = XSocketOptions(noDelay=True, recvBufSize=65536)
+        udp     = XAsyncUDPDatagram.Create(self.pool, ('127.0.0.1', 0), socketOptions=options)
+        self.addCleanup(udp.Close)
+        self.assertGreaterEqual(self.getOpt(udp.GetSocketObj(), socket.SOL_SOCKET, socket.SO_RCVBUF), 65536)
+        self.assertEqual(options.Skipped, [ ])
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets not available')
+    def test_SkippedOptions(self) :
+        # TCP options are not supported by Unix domain sockets,
+        tmpDir = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, tmpDir)
+        options = XSocketOptions(noDelay=True, sendBufSize=65536)
+        srv     = XAsyncTCPServer.Create(self.pool, os.path.join(tmpDir, 'srv.sock'), socketOptions=options)
+        srv.Close()
+        self.assertEqual(options.Skipped, [ 'noDelay' ])
+
+# ============================================================================
+# ===( Cork and gather-write )================================================
+# ============================================================================
+
+class CorkTests(PoolTestCase) :
+
+    def acceptPeer(self) :
+        accepted = [ ]
+        srv, srvAddr = self.createServer(onClientAccepted=lambda srv, cli : accepted.append(cli))
+        peer = socket.create_connection(srvAddr, timeout=5)
+        self.addCleanup(peer.close)
+        self.assertTrue(waitUntil(lambda : accepted))
+        return accepted[0], peer
+
+    def recvSize(self, peer, size) :
+        data = b''
+        while len(data) < size :
+            data += peer.recv(size - len(data))
+        return data
+
+    def sendEvents(self, trace, cli, eventType=XAsyncTrace.SEND) :
+        fd = cli.GetSocketObj().fileno()
+        return [ e[3] for e in trace.GetEvents() if e[1] == fd and e[2] == eventType ]
+
+    def test_CorkAndUncork(self) :
+        cli, peer = self.acceptPeer()
+        trace     = self.pool.StartTrace()
+        cli.Cork()
+        cli.Cork()
+        self.assertTrue(cli.IsCorked)
+        if hasattr(socket, 'TCP_CORK') :
+            self.assertTrue(cli.GetSocketObj().getsockopt(socket.IPPROTO_TCP, socket.TCP_CORK))
+        for data in (b'hello', bytearray(b' '), memoryview(b'world')) :
+            self.assertTrue(cli.AsyncSendData(data))
+        sleep(0.1)
+        self.assertEqual(cli.SendBufferedLen, 11)
+        cli.Uncork()
+        sleep(0.1)
+        self.assertEqual(cli.SendBufferedLen, 11)
+        cli.Uncork()
+        self.assertFalse(cli.IsCorked)
+        self.assertEqual(self.recvSize(peer, 11), b'hello world')
+        self.assertTrue(waitUntil(lambda : self.sendEvents(trace, cli)))
+        # Sent with one gather-write,
+        self.assertEqual(self.sendEvents(trace, cli), [ 11 ])
+        if hasattr(socket, 'TCP_CORK') :
+            self.assertFalse(cli.GetSocketObj().getsockopt(socket.IPPROTO_TCP, socket.TCP_CORK))
+
+    def test_GatherWriteOverIOVMax(self) :
+        cli, peer = self.acceptPeer()
+        trace     = self.pool.StartTrace()
+        chunks    = [ bytes([65 + i % 26]) * 10 for i in range(3 * XAsyncTCPClient._IOV_MAX) ]
+        cli.Cork()
+        for chunk in chunks :
+            cli.AsyncSendData(chunk)
+        cli.Uncork()
+        self.assertEqual(self.recvSize(peer, 10 * len(chunks)), b''.join(chunks))
+        self.assertTrue(waitUntil(lambda : cli.SendBufferedLen == 0))
+        self.assertEqual(sum(self.sendEvents(trace, cli)), 10 * len(chunks))
+        # At most "_IOV_MAX" chunks by write,
+        self.assertEqual(len(self.sendEvents(trace, cli)), 3)
+
+    def test_AutoCork(self) :
+        # Data sent by a callback is written at the end of the loop tick,
+        # without waiting for the socket to be writable,
+        cli, peer = self.acceptPeer()
+        def onLineRecv(cli, line, arg) :
+            for data in (b'a', b'b', b'c\n') :
+                cli.AsyncSendData(data)
+        self.pool.AutoCork = True
+        self.assertTrue(self.pool.AutoCork)
+        trace = self.pool.StartTrace()
+        cli.AsyncRecvLine(onLineRecv=onLineRecv)
+        peer.sendall(b'go\n')
+        self.assertEqual(self.recvSize(peer, 4), b'abc\n')
+        self.assertTrue(waitUntil(lambda : self.sendEvents(trace, cli)))
+        self.assertEqual(self.sendEvents(trace, cli), [ 4 ])
+        self.assertEqual(self.sendEvents(trace, cli, XAsyncTrace.WRITE), [ ])
+
+    def test_NoAutoCork(self) :
+        cli, peer = self.acceptPeer()
+        trace     = self.pool.StartTrace()
+        cli.AsyncRecvLine(onLineRecv=lambda cli, line, arg : cli.AsyncSendData(b'ok\n'))
+        peer.sendall(b'go\n')
+        self.assertEqual(self.recvSize(peer, 3), b'ok\n')
+        self.assertTrue(waitUntil(lambda : self.sendEvents(trace, cli, XAsyncTrace.WRITE)))
+
+# ============================================================================
+# ===( Sockets table )========================================================
+# ============================================================================
+
+class SocketsTableTests(PoolTestCase) :
+
+    def createUDP(self) :
+        udp = XAsyncUDPDatagram.Create(self.pool, ('127.0.0.1', 0))
+        self.addCleanup(udp.Close)
+        return udp
+
+    def test_GetAsyncSocketByID(self) :
+        udp = self.createUDP()
+        fd  = udp.GetSocketObj().fileno()
+        self.assertEqual(udp.SocketID & ((1 << XAsyncSocketsPool._ID_FD_BITS) - 1), fd)
+        self.assertIs(self.pool.GetAsyncSocketByID(udp.SocketID), udp)
+        self.assertIn(udp, self.pool.GetAllAsyncSockets())
+        for id in (None, 'id', udp.SocketID + 1, fd) :
+            self.assertIsNone(self.pool.GetAsyncSocketByID(id))
+
+    def test_ClosedSocketID(self) :
+        udp = self.createUDP()
+        id  = udp.SocketID
+        udp.Close()
+        self.assertIsNone(udp.SocketID)
+        self.assertIsNone(self.pool.GetAsyncSocketByID(id))
+        self.assertNotIn(udp, self.pool.GetAllAsyncSockets())
+
+    def test_ReusedFileDescriptor(self) :
+        # A new socket with the file descriptor of a closed one gets
+        # another ID,
+        udp = self.createUDP()
+        fd  = udp.GetSocketObj().fileno()
+        id  = udp.SocketID
+        udp.Close()
+        newUDP = self.createUDP()
+        self.assertEqual(newUDP.GetSocketObj().fileno(), fd)
+        self.assertNotEqual(newUDP.SocketID, id)
+        self.assertIsNone(self.pool.GetAsyncSocketByID(id))
+        self.assertIs(self.pool.GetAsyncSocketByID(newUDP.SocketID), newUDP)
+
+    def test_SocketClosedOutsideOfPool(self) :
+        # The entry of a socket closed directly is released when its file
+        # descriptor is reused,
+        udp = self.createUDP()
+        fd  = udp.GetSocketObj().fileno()
+        udp.GetSocketObj().close()
+        newUDP = self.createUDP()
+        self.assertEqual(newUDP.GetSocketObj().fileno(), fd)
+        self.assertIsNone(udp.SocketID)
+        self.assertEqual(self.pool.GetAllAsyncSockets(), [ newUDP ])
+        received = [ ]
+        newUDP.OnDataRecv = lambda udp, remoteAddr, data : received.append(bytes(data))
+        newUDP.AsyncSendDatagram(b'ping', newUDP.LocalAddr)
+        self.assertTrue(waitUntil(lambda : received))
+
+# ============================================================================
+# ===( Slots )================================================================
+# ============================================================================
+
+class SlotsTests(PoolTestCase) :
+
+    def assertSlotted(self, obj) :
+        self.assertFalse(hasattr(obj, '__dict__'), type(obj).__name__)
+        with self.assertRaises(AttributeError) :
+            obj.unknownAttribute = True
+
+    def test_PerConnectionObjects(self) :
+        accepted = [ ]
+        srv, srvAddr = self.createServer(onClientAccepted=lambda srv, cli : accepted.append(cli))
+        cli = XAsyncTCPClient.Create(self.pool, srvAddr)
+        self.addCleanup(cli.Close)
+        udp = XAsyncUDPDatagram.Create(self.pool, ('127.0.0.1', 0))
+        self.addCleanup(udp.Close)
+        self.assertTrue(waitUntil(lambda : accepted))
+        for obj in (srv, cli, accepted[0], udp, self.bufSlots.Slots[0], XFiFo()) :
+            self.assertSlotted(obj)
+        # The custom state is still available,
+        accepted[0].State = { 'user' : 'me' }
+        self.assertEqual(accepted[0].State, { 'user' : 'me' })
+
+    def test_FiFo(self) :
+        fifo = XFiFo()
+        self.assertTrue(fifo.Empty)
+        for i in range(3) :
+            fifo.Put(i)
+        self.assertEqual([ fifo.Get(), fifo.Get() ], [ 0, 1 ])
+        fifo.Put(3)
+        self.assertEqual([ fifo.Get(), fifo.Get() ], [ 2, 3 ])
+        self.assertTrue(fifo.Empty)
+        with self.assertRaises(XFiFoException) :
+            fifo.Get()
+        fifo.Put(4)
+        fifo.Clear()
+        self.assertTrue(fifo.Empty)
+
+# ============================================================================
+# ===( Unix domain sockets )==================================================
+# ============================================================================
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets not available')
+class UnixSocketsTests(PoolTestCase) :
+
+    def setUp(self) :
+        super().setUp()
+        self.tmpDir = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, self.tmpDir)
+        self.path   = os.path.join(self.tmpDir, 'srv.sock')
+
+    def echoServer(self, srvAddr) :
+        def onLineRecv(cli, line, arg) :
+            cli.AsyncSendData((line + '\n').encode())
+            cli.AsyncRecvLine(onLineRecv=onLineRecv)
+        srv = XAsyncTCPServer.Create(self.pool, srvAddr)
+        srv.OnClientAccepted = lambda srv, cli : cli.AsyncRecvLine(onLineRecv=onLineRecv)
+        return srv
+
+    def echo(self, srvAddr) :
+        lines = [ ]
+        cli   = XAsyncTCPClient.Create(self.pool, srvAddr)
+        self.assertIsNotNone(cli)
+        self.addCleanup(cli.Close)
+        cli.AsyncSendData(b'hello\n')
+        cli.AsyncRecvLine(onLineRecv=lambda cli, line, arg : lines.append(line))
+        self.assertTrue(waitUntil(lambda : lines))
+        return lines[0]
+
+    def test_PathServer(self) :
+        srv = self.echoServer(self.path)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(self.echo(self.path), 'hello')
+        srv.Close()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_StaleSocketFileReplaced(self) :
+        # Left by a dead process,
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.path)
+        sock.close()
+        self.assertTrue(os.path.exists(self.path))
+        srv = self.echoServer(self.path)
+        self.addCleanup(srv.Close)
+        self.assertEqual(self.echo(self.path), 'hello')
+
+    def test_PathInUse(self) :
+        srv = self.echoServer(self.path)
+        self.addCleanup(srv.Close)
+        with self.assertRaises(XAsyncTCPServerException) :
+            XAsyncTCPServer.Create(self.pool, self.path)
+        self.assertEqual(self.echo(self.path), 'hello')
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), 'Linux abstract namespace')
+    def test_AbstractNamespace(self) :
+        name = '\0xasyncsockets-test-%d' % os.getpid()
+        srv  = self.echoServer(name)
+        self.addCleanup(srv.Close)
+        self.assertEqual(os.listdir(self.tmpDir), [ ])
+        self.assertEqual(self.echo(name), 'hello')
+
+    def test_SendAndRecvFDs(self) :
+        accepted = [ ]
+        srv = XAsyncTCPServer.Create(self.pool, self.path)
+        self.addCleanup(srv.Close)
+        srv.OnClientAccepted = lambda srv, cli : accepted.append(cli)
+        connected = [ ]
+        cli = XAsyncTCPClient.Create(self.pool, self.path)
+        self.addCleanup(cli.Close)
+        cli.OnConnected = connected.append
+        self.assertTrue(waitUntil(lambda : accepted and connected))
+        received = [ ]
+        accepted[0].AsyncRecvFDs(2, lambda cli, fds, arg : received.append(fds))
+        rdFd, wrFd = os.pipe()
+        self.assertTrue(cli.SendFDs([ wrFd, rdFd ]))
+        os.close(wrFd)
+        os.close(rdFd)
+        self.assertTrue(waitUntil(lambda : received))
+        wrCopy, rdCopy = received[0]
+        self.assertEqual(os.write(wrCopy, b'fds'), 3)
+        self.assertEqual(os.read(rdCopy, 3), b'fds')
+        os.close(wrCopy)
+        os.close(rdCopy)
+        self.assertEqual(accepted[0].BytesRecv, 1)
+
+    def test_SendFDsErrors(self) :
+        srv, srvAddr = self.createServer(onClientAccepted=lambda srv, cli : None)
+        cli = XAsyncTCPClient.Create(self.pool, srvAddr)
+        self.addCleanup(cli.Close)
+        with self.assertRaises(XAsyncTCPClientException) :
+            cli.SendFDs([ 0 ])
+        sock, peer = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(peer.close)
+        cli = XAsyncTCPClient.CreateFromSocket(self.pool, sock)
+        self.addCleanup(cli.Close)
+        for fds in ([ ], [ 'fd' ]) :
+            with self.assertRaises(XAsyncTCPClientException) :
+                cli.SendFDs(fds)
+
+    def test_Datagrams(self) :
+        # An empty path binds the sender to an automatic abstract address,
+        # so that it can get replies,
+        replies = [ ]
+        srvUDP  = XAsyncUDPDatagram.Create(self.pool, self.path)
+        self.addCleanup(srvUDP.Close)
+        srvUDP.OnDataRecv = lambda udp, remoteAddr, data : udp.AsyncSendDatagram(bytes(data).upper(), remoteAddr)
+        cliUDP = XAsyncUDPDatagram.Create(self.pool, '' if sys.platform.startswith('linux') else \
+                                                     os.path.join(self.tmpDir, 'cli.sock'))
+        self.addCleanup(cliUDP.Close)
+        cliUDP.OnDataRecv = lambda udp, remoteAddr, data : replies.append((remoteAddr, bytes(data)))
+        self.assertTrue(cliUDP.AsyncSendDatagram(b'ping', self.path))
+        self.assertTrue(waitUntil(lambda : replies))
+        self.assertEqual(replies, [ (self.path, b'PING') ])
+        srvUDP.Close()
+        cliUDP.Close()
+        self.assertEqual(os.listdir(self.tmpDir), [ ])
+
+# ============================================================================
+# ===( UDP sessions )=========================================================
+# ============================================================================
+
+class UDPSessionsTests(PoolTestCase) :
+
+    def setUp(self) :
+        super().setUp()
+        self.created = [ ]
+        self.expired = [ ]
+        self.udp     = XAsyncUDPDatagram.Create(self.pool, ('127.0.0.1', 0))
+        self.addCleanup(self.udp.Close)
+        def onSessionCreated(udp, session) :
+            session.OnSessionExpired = lambda session, reason : self.expired.append((session.RemoteAddr, reason))
+            self.created.append(session)
+        self.udp.OnSessionCreated = onSessionCreated
+
+    def createPeer(self) :
+        peer = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(peer.close)
+        peer.bind(('127.0.0.1', 0))
+        peer.settimeout(5)
+        return peer
+
+    def test_SessionsCreatedOnce(self) :
+        datagrams = [ ]
+        received  = [ ]
+        self.udp.OnDataRecv = lambda udp, remoteAddr, data : received.append(bytes(data))
+        self.udp.SetSessions(8)
+        peerA, peerB = self.createPeer(), self.createPeer()
+        peerA.sendto(b'a1', self.udp.LocalAddr)
+        self.assertTrue(waitUntil(lambda : len(self.created) == 1 and received))
+        # Without "OnDatagram", datagrams go to "OnDataRecv",
+        self.assertEqual(received, [ b'a1' ])
+        session = self.created[0]
+        session.OnDatagram = lambda session, data : datagrams.append((session.RemoteAddr, bytes(data)))
+        session.State      = 'A'
+        peerA.sendto(b'a2', self.udp.LocalAddr)
+        peerB.sendto(b'b1', self.udp.LocalAddr)
+        self.assertTrue(waitUntil(lambda : len(self.created) == 2 and datagrams))
+        self.assertEqual(datagrams, [ (peerA.getsockname(), b'a2') ])
+        self.assertEqual(self.udp.SessionsCount, 2)
+        self.assertIs(self.udp.GetSession(peerA.getsockname()), session)
+        self.assertEqual(self.udp.GetSession(peerA.getsockname()).State, 'A')
+        self.assertIs(session.UDPDatagram, self.udp)
+        self.assertLess(session.IdleSec, 5)
+        self.assertIsNone(self.udp.GetSession(('127.0.0.1', 1)))
+
+    def test_SessionSendDatagram(self) :
+        self.udp.SetSessions(8)
+        peer = self.createPeer()
+        peer.sendto(b'ping', self.udp.LocalAddr)
+        self.assertTrue(waitUntil(lambda : self.created))
+        self.assertTrue(self.created[0].AsyncSendDatagram(b'pong'))
+        self.assertEqual(peer.recvfrom(16), (b'pong', self.udp.LocalAddr))
+
+    def test_Eviction(self) :
+        # The least recently active session is evicted,
+        self.udp.SetSessions(2)
+        peers = [ self.createPeer() for i in range(3) ]
+        for peer in (peers[0], peers[1], peers[0]) :
+            peer.sendto(b'x', self.udp.LocalAddr)
+            sleep(0.05)
+        peers[2].sendto(b'x', self.udp.LocalAddr)
+        self.assertTrue(waitUntil(lambda : self.expired))
+        self.assertEqual(self.expired, [ (peers[1].getsockname(), 'evicted') ])
+        self.assertEqual(self.udp.SessionsCount, 2)
+        self.assertIsNone(self.udp.GetSession(peers[1].getsockname()))
+
+    def test_IdleTimeout(self) :
+        self.udp.SetSessions(8, idleTimeoutSec=0.2)
+        peer = self.createPeer()
+        peer.sendto(b'x', self.udp.LocalAddr)
+        self.assertTrue(waitUntil(lambda : self.expired))
+        self.assertEqual(self.expired, [ (peer.getsockname(), 'idleTimeout') ])
+        self.assertEqual(self.udp.SessionsCount, 0)
+
+    def test_DisabledClosedAndSessionClose(self) :
+        self.udp.SetSessions(8, idleTimeoutSec=None)
+        peers = [ self.createPeer() for i in range(3) ]
+        for peer in peers :
+            peer.sendto(b'x', self.udp.LocalAddr)
+        self.assertTrue(waitUntil(lambda : self.udp.SessionsCount == 3))
+        # Without "OnSessionExpired" event,
+        self.udp.GetSession(peers[0].getsockname()).Close()
+        self.assertEqual(self.udp.SessionsCount, 2)
+        self.udp.SetSessions(None)
+        self.assertEqual(sorted(self.expired), sorted((p.getsockname(), 'disabled') for p in peers[1:]))
+        self.assertEqual(self.udp.SessionsCount, 0)
+        self.assertIsNone(self.udp.GetSession(peers[1].getsockname()))
+        del self.expired[:]
+        self.udp.SetSessions(8)
+        peers[0].sendto(b'x', self.udp.LocalAddr)
+        self.assertTrue(waitUntil(lambda : self.udp.SessionsCount == 1))
+        self.udp.Close()
+        self.assertEqual(self.expired, [ (peers[0].getsockname(), 'closed') ])
+
+    def test_IncorrectArguments(self) :
+        for args in ( (0, ), ('8', ), (8, 0), (8, -1) ) :
+            with self.assertRaises(XAsyncUDPDatagramException) :
+                self.udp.SetSessions(*args)
+
+# ============================================================================
+# ===( Tracing )==============================================================
+# ============================================================================
+
+class TraceTests(unittest.TestCase) :
+
+    def test_RingBuffer(self) :
+        trace = XAsyncTrace(capacity=4)
+        for i in range(6) :
+            trace._record(float(i), i, XAsyncTrace.RECV, i * 10, 0.5)
+        self.assertEqual((trace.Capacity, trace.Count, trace.Dropped), (4, 4, 2))
+        events = trace.GetEvents()
+        self.assertEqual([ e[1] for e in events ], [ 2, 3, 4, 5 ])
+        self.assertEqual(events[0], (2.0, 2, XAsyncTrace.RECV, 20, 0.5))
+        trace.Clear()
+        self.assertEqual((trace.Count, trace.Dropped, trace.GetEvents()), (0, 0, [ ]))
+
+    def test_IncorrectCapacity(self) :
+        for capacity in (0, -1, 1.5) :
+            with self.assertRaises(XAsyncTraceException) :
+                XAsyncTrace(capacity)
+
+    def test_Dump(self) :
+        trace = XAsyncTrace(capacity=2)
+        trace._record(1.0, -1, XAsyncTrace.POLL, 3, 0.25)
+        trace._record(2.0, 7, XAsyncTrace.SEND, 100, 0.001)
+        trace._record(3.0, 7, XAsyncTrace.EXPIRE, 0, 0.0)
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, filename)
+        self.assertEqual(trace.Dump(filename), 2)
+        with open(filename) as f :
+            lines = f.read().splitlines()
+        self.assertTrue(lines[0].startswith('# XAsyncTrace capacity=2 recorded=3 dropped=1 wallOffsetSec='))
+        self.assertEqual(lines[2:], [ '2.000000 7 send 100 0.0010000', '3.000000 7 expire 0 0.0000000' ])
+        with self.assertRaises(XAsyncTraceException) :
+            trace.Dump(os.path.join(filename, 'nodir', 'trace'))
+
+class PoolTraceTests(PoolTestCase) :
+
+    def test_TraceEvents(self) :
+        accepted = [ ]
+        srv, srvAddr = self.createServer(onClientAccepted=lambda srv, cli : accepted.append(cli))
+        peer = socket.create_connection(srvAddr, timeout=5)
+        self.addCleanup(peer.close)
+        self.assertTrue(waitUntil(lambda : accepted))
+        cli   = accepted[0]
+        fd    = cli.GetSocketObj().fileno()
+        trace = self.pool.StartTrace(capacity=1024)
+        self.assertIs(self.pool.Trace, trace)
+        cli.AsyncRecvData(5, lambda cli, data, arg : cli.AsyncSendData(b'world!'))
+        peer.sendall(b'hello')
+        self.assertEqual(peer.recv(6), b'world!')
+        self.assertTrue(waitUntil(lambda : any(e[2] == XAsyncTrace.SEND for e in trace.GetEvents())))
+        self.assertIs(self.pool.StopTrace(), trace)
+        self.assertIsNone(self.pool.Trace)
+        events = trace.GetEvents()
+        byType = { }
+        for timeSec, eventFd, eventType, size, durationSec in events :
+            byType.setdefault(eventType, [ ]).append((eventFd, size))
+        self.assertEqual(byType[XAsyncTrace.RECV], [ (fd, 5) ])
+        self.assertEqual(byType[XAsyncTrace.SEND], [ (fd, 6) ])
+        self.assertIn((fd, 0), byType[XAsyncTrace.READ])
+        self.assertTrue(all(eventFd == -1 for eventFd, size in byType[XAsyncTrace.POLL]))
+        self.assertIn(XAsyncTrace.TICK, byType)
+        # Not recorded once stopped,
+        cli.AsyncSendData(b'!')
+        self.assertEqual(peer.recv(1), b'!')
+        sleep(0.05)
+        self.assertEqual(trace.Count, len(events))
+
+    def test_TraceExpiredTimeout(self) :
+        accepted = [ ]
+        srv, srvAddr = self.createServer(onClientAccepted=lambda srv, cli : accepted.append(cli))
+        peer = socket.create_connection(srvAddr, timeout=5)
+        self.addCleanup(peer.close)
+        self.assertTrue(waitUntil(lambda : accepted))
+        trace = self.pool.StartTrace()
+        accepted[0].AsyncRecvLine(timeoutSec=0.1)
+        fd = accepted[0].GetSocketObj().fileno()
+        self.assertTrue(waitUntil(lambda : any(e[2] == XAsyncTrace.EXPIRE for e in trace.GetEvents())))
+        self.assertEqual([ e[1] for e in trace.GetEvents() if e[2] == XAsyncTrace.EXPIRE ], [ fd ])
+
+# ============================================================================
+# ===( Lazy ssl import )======================================================
+# ============================================================================
+
+class LazySSLTests(PoolTestCase) :
+
+    def test_NotImportedWithoutTLS(self) :
+        import subprocess
+        code = ( "import sys\n"
+                 "sys.path.insert(0, %r)\n"
+                 "from XAsyncSockets import *\n"
+                 "pool = XAsyncSocketsPool()\n"
+                 "srv  = XAsyncTCPServer.Create(pool, ('127.0.0.1', 0))\n"
+                 "srv.OnClientAccepted = lambda s, c : c.AsyncRecvLine(onLineRecv=lambda c, l, a : c.AsyncSendData(b'ok'))\n"
+                 "pool.AsyncWaitEvents(threadsCount=1)\n"
+                 "import socket\n"
+                 "s = socket.create_connection(srv.GetSocketObj().getsockname(), timeout=5)\n"
+                 "s.sendall(b'hello\\n')\n"
+                 "ok = (s.recv(2) == b'ok')\n"
+                 "s.close()\n"
+                 "pool.StopWaitEvents()\n"
+                 "print(ok, 'ssl' in sys.modules)\n" ) % os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+        out = subprocess.run( [ sys.executable, '-c', code ],
+                              stdout  = subprocess.PIPE,
+                              timeout = 30 ).stdout
+        self.assertEqual(out.split(), [ b'True', b'False' ])
+
+    def test_StartSSLContextIncorrect(self) :
+        srv, srvAddr = self.createServer()
+        cli = XAsyncTCPClient.Create(self.pool, srvAddr, connectAsync=False)
+        self.addCleanup(cli.Close)
+        with self.assertRaises(XAsyncTCPClientException) :
+            cli.StartSSLContext('context')
+        self.assertFalse(cli.IsSSL)
+
+    def test_StartSSLContextEcho(self) :
+        import shutil, ssl, subprocess, threading
+        if not shutil.which('openssl') :
+            self.skipTest('openssl is not available')
+        tmpDir   = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpDir)
+        certFile = os.path.join(tmpDir, 'cert.pem')
+        keyFile  = os.path.join(tmpDir, 'key.pem')
+        subprocess.run( [ 'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+                          '-subj', '/CN=localhost', '-days', '1',
+                          '-keyout', keyFile, '-out', certFile ],
+                        stdout = subprocess.DEVNULL,
+                        stderr = subprocess.DEVNULL,
+                        check  = True )
+        srvCtx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        srvCtx.load_cert_chain(certFile, keyFile)
+        accepted = [ ]
+        def startTLS(cli) :
+            cli.StartSSLContext(srvCtx, serverSide=True)
+            accepted.append(cli)
+            def onLineRecv(cli, line, arg) :
+                cli.AsyncSendData((line.upper() + '\n').encode())
+                cli.AsyncRecvLine(onLineRecv=onLineRecv)
+            cli.AsyncRecvLine(onLineRecv=onLineRecv)
+        srv, srvAddr = self.createServer( onClientAccepted = lambda srv, cli :
+                                          threading.Thread(target=startTLS, args=(cli,)).start() )
+        cliCtx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        cliCtx.check_hostname = False
+        cliCtx.verify_mode    = ssl.CERT_NONE
+        s = cliCtx.wrap_socket( socket.create_connection(srvAddr, timeout=5),
+                                server_hostname = 'localhost' )
+        self.addCleanup(s.close)
+        s.sendall(b'hello\n')
+        data = b''
+        while not data.endswith(b'\n') :
+            data += s.recv(64)
+        self.assertEqual(data, b'HELLO\n')
+        self.assertTrue(waitUntil(lambda : accepted))
+        self.assertTrue(accepted[0].IsSSL)
+        with self.assertRaises(XAsyncTCPClientException) :
+            accepted[0].StartSSLContext(srvCtx, serverSide=True)
+        self.assertTrue(sys.modules['XAsyncSockets']._XSSL.Module is ssl)
+
+# ============================================================================
+# ===( Clients recycling )====================================================
+# ============================================================================
+
+class ClientsRecyclingTests(PoolTestCase) :
+
+    def availableSlots(self) :
+        return sum(1 for slot in self.bufSlots.Slots if slot.Available)
+
+    def createEchoServer(self, maxFreeClients) :
+        accepted = [ ]
+        def onDataRecv(cli, data, arg) :
+            cli.AsyncSendData(bytes(data))
+            cli.AsyncRecvData(5, onDataRecv=onDataRecv)
+        def onClientAccepted(srv, cli) :
+            accepted.append((cli, cli.OnClosed, cli.BytesRecv))
+            cli.OnClosed = lambda cli, reason : None
+            cli.AsyncRecvData(5, onDataRecv=onDataRecv)
+        srv, srvAddr = self.createServer(onClientAccepted=onClientAccepted)
+        srv.SetClientsRecycling(maxFreeClients)
+        return srv, srvAddr, accepted
+
+    def echo(self, srvAddr) :
+        s = socket.create_connection(srvAddr, timeout=5)
+        s.sendall(b'hello')
+        self.assertEqual(s.recv(5), b'hello')
+        s.close()
+
+    def test_RecycledClient(self) :
+        srv, srvAddr, accepted = self.createEchoServer(2)
+        self.echo(srvAddr)
+        self.assertTrue(waitUntil(lambda : srv.FreeClientsCount == 1))
+        self.assertEqual(srv.RecycledCount, 0)
+        self.echo(srvAddr)
+        self.assertTrue(waitUntil(lambda : srv.FreeClientsCount == 1))
+        self.assertEqual(srv.RecycledCount, 1)
+        self.assertIs(accepted[1][0], accepted[0][0])
+        # The recycled client starts again with no handlers and counters,
+        self.assertEqual(accepted[1][1:], (None, 0))
+
+    def test_RecyclingDisabled(self) :
+        srv, srvAddr, accepted = self.createEchoServer(None)
+        available = self.availableSlots()
+        self.echo(srvAddr)
+        self.assertTrue(waitUntil(lambda : self.availableSlots() == available))
+        self.echo(srvAddr)
+        self.assertTrue(waitUntil(lambda : self.availableSlots() == available))
+        self.assertEqual(srv.FreeClientsCount, 0)
+        self.assertEqual(srv.RecycledCount, 0)
+        self.assertIsNot(accepted[1][0], accepted[0][0])
+
+    def test_FreeClientsKeepSlots(self) :
+        srv, srvAddr, accepted = self.createEchoServer(1)
+        available = self.availableSlots()
+        socks = [ socket.create_connection(srvAddr, timeout=5) for i in range(2) ]
+        self.assertTrue(waitUntil(lambda : len(accepted) == 2))
+        for s in socks :
+            s.close()
+        self.assertTrue(waitUntil(lambda : srv.ConnectionsCount == 0))
+        # Only one client is kept, with its receive and send slots,
+        self.assertEqual(srv.FreeClientsCount, 1)
+        self.assertEqual(self.availableSlots(), available - 2)
+        srv.SetClientsRecycling(0)
+        self.assertEqual(srv.FreeClientsCount, 0)
+        self.assertEqual(self.availableSlots(), available)
+
+    def test_SetClientsRecyclingIncorrect(self) :
+        srv, srvAddr = self.createServer()
+        for maxFreeClients in (-1, 1.5, '2') :
+            with self.assertRaises(XAsyncTCPServerException) :
+                srv.SetClientsRecycling(maxFreeClients)
+
+# ============================================================================
+# ===( AsyncRecvInto )========================================================
+# ============================================================================
+
+class RecvIntoTests(PoolTestCase) :
+
+    def recvInto(self, buffer, data) :
+        recv = [ ]
+        def onClientAccepted(srv, cli) :
+            cli.AsyncRecvInto(buffer, onDataRecv=lambda cli, data, arg : recv.append((data, arg)), onDataRecvArg='arg')
+        srv, srvAddr = self.createServer(onClientAccepted=onClientAccepted)
+        s = socket.create_connection(srvAddr, timeout=5)
+        self.addCleanup(s.close)
+        s.sendall(data)
+        self.assertTrue(waitUntil(lambda : recv))
+        return recv[0]
+
+    def test_BufferLargerThanSlot(self) :
+        data   = bytes(i % 251 for i in range(100000))
+        buffer = bytearray(len(data))
+        recv   = self.recvInto(buffer, data)
+        # Called with the same buffer, filled in place,
+        self.assertIs(recv[0], buffer)
+        self.assertEqual(recv[1], 'arg')
+        self.assertEqual(buffer, data)
+
+    def test_MemoryViewSlice(self) :
+        buffer = bytearray(b'..........')
+        self.recvInto(memoryview(buffer)[2:7], b'abcde')
+        self.assertEqual(buffer, b'..abcde...')
+
+    def test_ArrayOfIntegers(self) :
+        from array import array
+        values = array('I', [ 1, 2, 0xDEADBEEF ])
+        buffer = array('I', [ 0, 0, 0 ])
+        self.recvInto(buffer, values.tobytes())
+        self.assertEqual(buffer, values)
+
+    def test_IncorrectBuffer(self) :
+        srv, srvAddr = self.createServer()
+        cli = XAsyncTCPClient.Create(self.pool, srvAddr, connectAsync=False)
+        self.addCleanup(cli.Close)
+        for buffer in (b'readonly', bytearray(), memoryview(bytearray(10))[::2], 'text', None) :
+            with self.assertRaises(XAsyncTCPClientException) :
+                cli.AsyncRecvInto(buffer)
+        self.assertTrue(cli.AsyncRecvInto(bytearray(4)))
+        with self.assertRaises(XAsyncTCPClientException) :
+            cli.AsyncRecvInto(bytearray(4))
+
+# ============================================================================
+# ===( XTCPBridge )===========================================================
+# ============================================================================
+
+class TCPBridgeTests(PoolTestCase) :
+
+    def createBridge(self, zeroCopy, beforeBridge=None) :
+        # peerA <-> [ cliA == relay == cliB ] <-> peerB
+        sink = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sink.bind(('127.0.0.1', 0))
+        sink.listen(1)
+        self.addCleanup(sink.close)
+        accepted = [ ]
+        srv, srvAddr = self.createServer(onClientAccepted=lambda srv, cli : accepted.append(cli))
+        peerA = socket.create_connection(srvAddr, timeout=5)
+        self.addCleanup(peerA.close)
+        self.assertTrue(waitUntil(lambda : accepted))
+        connected = [ ]
+        cliB      = XAsyncTCPClient.Create(self.pool, sink.getsockname(), connectAsync=False)
+        cliB.OnConnected = connected.append
+        peerB, _  = sink.accept()
+        self.assertTrue(waitUntil(lambda : connected))
+        peerB.settimeout(5)
+        self.addCleanup(peerB.close)
+        if beforeBridge :
+            beforeBridge(accepted[0], cliB)
+        bridge = accepted[0].BridgeTo(cliB, zeroCopy=zeroCopy)
+        closed = [ ]
+        bridge.OnClosed = lambda bridge, reason : closed.append(reason)
+        return bridge, peerA, peerB, closed
+
+    def recvAll(self, s, size) :
+        data = b''
+        while len(data) < size :
+            chunk = s.recv(size - len(data))
+            if not chunk :
+                break
+            data += chunk
+        return data
+
+    def test_ForwardBothWays(self) :
+        import threading
+        for zeroCopy in (True, False) :
+            with self.subTest(zeroCopy=zeroCopy) :
+                bridge, peerA, peerB, closed = self.createBridge(zeroCopy)
+                self.assertEqual(bridge.IsZeroCopy, zeroCopy and hasattr(os, 'splice'))
+                data   = bytes(i % 253 for i in range(300000))
+                sender = threading.Thread(target=peerA.sendall, args=(data,))
+                sender.start()
+                self.assertEqual(self.recvAll(peerB, len(data)), data)
+                sender.join()
+                peerB.sendall(b'reply')
+                self.assertEqual(self.recvAll(peerA, 5), b'reply')
+                self.assertTrue(waitUntil(lambda : bridge.BytesBToA == 5))
+                self.assertEqual(bridge.BytesAToB, len(data))
+                self.assertEqual(bridge.PendingBytes, 0)
+                self.assertFalse(bridge.IsClosed)
+
+    def test_HalfClose(self) :
+        for zeroCopy in (True, False) :
+            with self.subTest(zeroCopy=zeroCopy) :
+                bridge, peerA, peerB, closed = self.createBridge(zeroCopy)
+                peerA.sendall(b'last')
+                peerA.shutdown(socket.SHUT_WR)
+                # The data is sent before the shutdown of the other side,
+                self.assertEqual(self.recvAll(peerB, 5), b'last')
+                peerB.sendall(b'still open')
+                self.assertEqual(self.recvAll(peerA, 10), b'still open')
+                self.assertFalse(bridge.IsClosed)
+                peerB.close()
+                self.assertTrue(waitUntil(lambda : closed))
+                self.assertEqual(closed, [ XClosedReason.ClosedByPeer ])
+                self.assertTrue(bridge.IsClosed)
+                self.assertEqual(peerA.recv(1), b'')
+
+    def test_ClosePropagation(self) :
+        for zeroCopy in (True, False) :
+            with self.subTest(zeroCopy=zeroCopy) :
+                bridge, peerA, peerB, closed = self.createBridge(zeroCopy)
+                bridge.ClientB.Close()
+                self.assertTrue(waitUntil(lambda : closed))
+                self.assertEqual(closed, [ XClosedReason.ClosedByHost ])
+                self.assertEqual(peerA.recv(1), b'')
+                self.assertEqual(peerB.recv(1), b'')
+                self.assertFalse(bridge.Close())
+
+    def test_DataSentBeforeBridge(self) :
+        bridge, peerA, peerB, closed = self.createBridge( True,
+                                                          lambda cliA, cliB : cliB.AsyncSendData(b'first:') )
+        peerA.sendall(b'bridged')
+        self.assertEqual(self.recvAll(peerB, 13), b'first:bridged')
+
+    def test_BridgeToIncorrect(self) :
+        bridge, peerA, peerB, closed = self.createBridge(False)
+        with self.assertRaises(XAsyncTCPClientException) :
+            bridge.ClientA.BridgeTo(bridge.ClientA)
+        with self.assertRaises(XAsyncTCPClientException) :
+            bridge.ClientA.BridgeTo('client')
+        srv, srvAddr = self.createServer(onClientAccepted=lambda srv, cli : None)
+        connected = [ ]
+        cli       = XAsyncTCPClient.Create(self.pool, srvAddr, connectAsync=False)
+        cli.OnConnected = connected.append
+        self.addCleanup(cli.Close)
+        with self.assertRaises(XAsyncTCPClientException) :
+            bridge.ClientB.BridgeTo(cli)
+        self.assertTrue(waitUntil(lambda : connected))
+        with self.assertRaises(XAsyncTCPClientException) :
+            cli.BridgeTo(bridge.ClientA)
+        with self.assertRaises(XAsyncTCPClientException) :
+            bridge.ClientA.AsyncRecvData(4)
+
+# ============================================================================
+# ===( Compression )==========================================================
+# ============================================================================
+
+class CompressionTests(PoolTestCase) :
+
+    def setUp(self) :
+        super().setUp()
+        self.compPool = XCompressionPool(level=6, maxFreeObjects=2)
+        self.stages   = [ ]
+        self.recv     = [ ]
+        def onDataRecv(stage, data, arg) :
+            # Echoed, each part received is sent as one block,
+            self.recv.append(len(data))
+            stage.Client.AsyncSendData(bytes(data))
+        def onClientAccepted(srv, cli) :
+            self.stages.append(cli.StartCompression(onDataRecv, compressionPool=self.compPool))
+        self.srv, self.srvAddr = self.createServer(onClientAccepted=onClientAccepted)
+
+    def deflate(self, data) :
+        import zlib
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        return (compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH))[:-4]
+
+    def inflate(self, payload) :
+        import zlib
+        return zlib.decompressobj(-15).decompress(payload + b'\x00\x00\xff\xff')
+
+    def recvBlock(self, s) :
+        header = b''
+        while len(header) < 4 :
+            header += s.recv(4 - len(header))
+        header  = struct.unpack('!I', header)[0]
+        size    = header & 0x7FFFFFFF
+        payload = b''
+        while len(payload) < size :
+            payload += s.recv(size - len(payload))
+        return bool(header & 0x80000000), payload
+
+    def connect(self) :
+        s = socket.create_connection(self.srvAddr, timeout=5)
+        self.addCleanup(s.close)
+        self.assertTrue(waitUntil(lambda : self.stages))
+        return s
+
+    def test_CompressionPool(self) :
+        self.assertIs(XCompressionPool.GetDefault(), XCompressionPool.GetDefault())
+        self.assertEqual((self.compPool.Level, self.compPool.MaxFreeObjects), (6, 2))
+        for args in ( { 'level' : 10 }, { 'level' : -2 }, { 'level' : '6' },
+                      { 'maxFreeObjects' : -1 } ) :
+            with self.assertRaises(XCompressionPoolException) :
+                XCompressionPool(**args)
+
+    def test_WireBlocks(self) :
+        s     = self.connect()
+        text  = b'compressible text, ' * 100
+        small = b'tiny'
+        noise = os.urandom(1000)
+        s.sendall( struct.pack('!I', 0x80000000 | len(self.deflate(text))) + self.deflate(text) +
+                   struct.pack('!I', len(small)) + small )
+        self.assertTrue(waitUntil(lambda : len(self.recv) == 2))
+        compressed, payload = self.recvBlock(s)
+        self.assertTrue(compressed)
+        self.assertEqual(self.inflate(payload), text)
+        # Under "minSize", the data is stored as it is,
+        self.assertEqual(self.recvBlock(s), (False, small))
+        stage = self.stages[0]
+        self.assertTrue(stage.Client.AsyncSendData(noise))
+        # Incompressible, the data is stored even over "minSize",
+        self.assertEqual(self.recvBlock(s), (False, noise))
+        self.assertEqual((stage.BlocksCompressed, stage.BlocksStored), (1, 2))
+        self.assertEqual(stage.PlainBytesRecv, len(text) + len(small))
+        self.assertEqual(stage.PlainBytesSent, len(text) + len(small) + len(noise))
+        self.assertEqual(stage.WireBytesSent, 3 * 4 + len(payload) + len(small) + len(noise))
+        self.assertLess(stage.RecvRatio, 0.2)
+        self.assertEqual(stage.SendRatio, stage.WireBytesSent / stage.PlainBytesSent)
+
+    def test_DecompressedByParts(self) :
+        s     = self.connect()
+        block = self.deflate(bytes(1000000))
+        s.sendall(struct.pack('!I', 0x80000000 | len(block)) + block)
+        self.assertTrue(waitUntil(lambda : sum(self.recv) == 1000000))
+        self.assertTrue(max(self.recv) <= 65536)
+
+    def test_SharedObjects(self) :
+        s     = self.connect()
+        text  = b'shared deflate objects ' * 50
+        block = self.deflate(text)
+        for i in range(10) :
+            s.sendall(struct.pack('!I', 0x80000000 | len(block)) + block)
+            self.assertEqual(self.inflate(self.recvBlock(s)[1]), text)
+        # A compressor and a decompressor are lent for each block,
+        self.assertEqual(self.compPool.ObjectsCreated, 2)
+        self.assertEqual(self.compPool.FreeObjectsCount, 2)
+
+    def test_RoundTripBetweenClients(self) :
+        recv      = [ ]
+        connected = [ ]
+        cli = XAsyncTCPClient.Create(self.pool, self.srvAddr, connectAsync=False)
+        cli.OnConnected = connected.append
+        self.addCleanup(cli.Close)
+        self.assertTrue(waitUntil(lambda : connected))
+        stage = cli.StartCompression(lambda stage, data, arg : recv.append(bytes(data)))
+        self.assertIs(stage.CompressionPool, XCompressionPool.GetDefault())
+        self.assertIs(cli.Compression, stage)
+        data = b''.join(b'line %d of the stream\n' % i for i in range(5000))
+        self.assertTrue(cli.AsyncSendData(data))
+        self.assertTrue(waitUntil(lambda : sum(len(b) for b in recv) == len(data)))
+        self.assertEqual(b''.join(recv), data)
+        self.assertLess(stage.SendRatio, 0.5)
+
+    def test_InvalidStreamCloses(self) :
+        for name, data in ( ('empty block',     struct.pack('!I', 0)),
+                            ('invalid deflate', struct.pack('!I', 0x80000004) + b'\xff\xff\xff\xff') ) :
+            with self.subTest(name=name) :
+                del self.stages[:]
+                s = self.connect()
+                s.sendall(data)
+                self.assertTrue(waitUntil(lambda : self.stages[0].IsClosed))
+                self.assertEqual(s.recv(1), b'')
+
+    def test_StartCompressionIncorrect(self) :
+        s   = self.connect()
+        cli = self.stages[0].Client
+        for args in ( { 'onDataRecv' : None },
+                      { 'onDataRecv' : print, 'minSize' : -1 },
+                      { 'onDataRecv' : print, 'compressionPool' : 'pool' } ) :
+            with self.assertRaises(XAsyncTCPClientException) :
+                cli.StartCompression(**args)
+
+if __name__ == '__main__' :
+    unittest.main()
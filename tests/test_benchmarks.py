@@ -0,0 +1,287 @@
+"""
+The MIT License (MIT)
+Copyright © 2019 Jean-Christophe Bos & HC² (www.hc2.fr)
+"""
+
+# Tests of the benchmark tools, with short runs on loopback only :
+#
+#   python -m unittest discover -s tests
+
+import io
+import os
+import sys
+import json
+import threading
+import tempfile
+import argparse
+import unittest
+from   contextlib import redirect_stdout
+from   time       import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import benchSuite
+import loadGen
+import traceAnalyzer
+
+from XAsyncSockets import XAsyncTrace
+
+# ============================================================================
+# ===( benchSuite )===========================================================
+# ============================================================================
+
+def suiteOpts(**kwargs) :
+    opts = argparse.Namespace( benchmarks  = [ ],
+                               threads     = [1],
+                               slots       = [1024],
+                               duration    = 0.3,
+                               clients     = 2,
+                               msgSize     = 64,
+                               wsFrameSize = 1024,
+                               timers      = 100 )
+    opts.__dict__.update(kwargs)
+    return opts
+
+class BenchSuiteTests(unittest.TestCase) :
+
+    def test_Percentile(self) :
+        values = [ 5, 1, 4, 2, 3 ]
+        self.assertIsNone(benchSuite.percentile([ ], 50))
+        self.assertEqual(benchSuite.percentile(values, 0),   1)
+        self.assertEqual(benchSuite.percentile(values, 50),  3)
+        self.assertEqual(benchSuite.percentile(values, 100), 5)
+        self.assertEqual(values, [ 5, 1, 4, 2, 3 ])
+
+    def test_IntList(self) :
+        self.assertEqual(benchSuite.intList('1,2,,4096'), [ 1, 2, 4096 ])
+
+    def test_CompareResults(self) :
+        ref = { 'bench' : 'tcpEcho', 'threadsCount' : 1, 'slotsSize' : 1024,
+                'messagesSec' : 1000.0, 'latencyP99Ms' : 2.0 }
+        fd, filename = tempfile.mkstemp(suffix='.jsonl')
+        self.addCleanup(os.remove, filename)
+        with os.fdopen(fd, 'w') as f :
+            f.write(json.dumps(ref) + '\n\n')
+        def compare(**values) :
+            result = dict(ref)
+            result.update(values)
+            return benchSuite.compareResults([ result ], filename, 0.15)
+        # Within the tolerance and better results are not regressions,
+        self.assertEqual(compare(messagesSec=900.0, latencyP99Ms=2.2), [ ])
+        self.assertEqual(compare(messagesSec=5000.0, latencyP99Ms=0.5), [ ])
+        regressions = compare(messagesSec=800.0, latencyP99Ms=2.5)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('tcpEcho threads=1 slots=1024 : messagesSec'))
+        self.assertIn('latencyP99Ms', regressions[1])
+        # Results without reference are ignored,
+        self.assertEqual(compare(slotsSize=4096, messagesSec=1.0), [ ])
+
+    def test_RunSuite(self) :
+        opts = suiteOpts(benchmarks=[ 'tcpEcho', 'wsUnmask', 'callSoon', 'timers' ])
+        out  = io.StringIO()
+        with redirect_stdout(out) :
+            results = benchSuite.runSuite(opts)
+        self.assertEqual([ r['bench'] for r in results ], opts.benchmarks)
+        self.assertEqual([ json.loads(l)['bench'] for l in out.getvalue().splitlines() ], opts.benchmarks)
+        echo, unmask, calls, timers = results
+        self.assertGreater(echo['messages'], 0)
+        self.assertEqual(echo['threadsCount'], 1)
+        self.assertEqual(echo['slotsSize'], 1024)
+        self.assertGreater(unmask['speedup'], 1)
+        self.assertTrue(calls['complete'])
+        self.assertTrue(timers['complete'])
+        self.assertEqual(timers['fired'], 50)
+
+    @unittest.skipUnless(benchSuite.tracemalloc, 'tracemalloc not available')
+    def test_IdleMemory(self) :
+        result = benchSuite.benchIdleMemory( benchSuite.XAsyncSocketsPool(), 1, 1024,
+                                             suiteOpts(idleConnections=100) )
+        self.assertTrue(result['complete'])
+        self.assertEqual(result['connections'], 100)
+        self.assertTrue(result['withinTarget'], result['bytesPerConnection'])
+
+    def test_WSFrame(self) :
+        payload = bytes(range(200))
+        mask    = benchSuite.WS_MASK
+        frame   = benchSuite.wsFrame(payload, mask)
+        self.assertEqual(frame[:4], b'\x82\xfe\x00\xc8')
+        self.assertEqual(frame[4:8], mask)
+        self.assertEqual(benchSuite.unmaskBytewise(frame[8:], mask), payload)
+        self.assertEqual(benchSuite.wsFrame(b'abc'), b'\x82\x03abc')
+
+# ============================================================================
+# ===( loadGen )==============================================================
+# ============================================================================
+
+class LatencyHistogramTests(unittest.TestCase) :
+
+    def test_Percentiles(self) :
+        histo = loadGen.LatencyHistogram()
+        self.assertIsNone(histo.PercentileMs(50))
+        for ms in range(1, 1001) :
+            histo.Record(ms / 1000.0)
+        self.assertEqual(histo.Count, 1000)
+        self.assertEqual(histo.MaxMs, 1000)
+        for pct in (50, 90, 99) :
+            # Upper bound of a bucket, within ~3%,
+            self.assertGreaterEqual(histo.PercentileMs(pct), pct * 10)
+            self.assertLessEqual(histo.PercentileMs(pct), pct * 10 * 1.04)
+        self.assertEqual(histo.PercentileMs(100), 1000)
+
+    def test_SmallValues(self) :
+        histo = loadGen.LatencyHistogram()
+        for us in (3, 3, 7, -5) :
+            histo.Record(us / 1000000.0)
+        self.assertEqual(histo.PercentileMs(50), 0.003)
+        self.assertEqual(histo.PercentileMs(100), 0.007)
+
+    def test_Merge(self) :
+        a = loadGen.LatencyHistogram()
+        b = loadGen.LatencyHistogram()
+        for _ in range(90) :
+            a.Record(0.001)
+        for _ in range(10) :
+            b.Record(0.1)
+        a.Merge(b)
+        self.assertEqual(a.Count, 100)
+        self.assertEqual(a.MaxMs, 100)
+        self.assertLessEqual(a.PercentileMs(90), 1.04)
+        self.assertGreaterEqual(a.PercentileMs(95), 97)
+        self.assertEqual(b.Count, 10)
+
+# ----------------------------------------------------------------------------
+
+class PacerTests(unittest.TestCase) :
+
+    def test_Order(self) :
+        pacer = loadGen.Pacer()
+        self.addCleanup(pacer.Stop)
+        calls = [ ]
+        done  = threading.Event()
+        def onCall(name) :
+            calls.append(name)
+            if len(calls) == 3 :
+                done.set()
+        nowSec = perf_counter()
+        pacer.At(nowSec + 0.10, onCall, 'c')
+        pacer.At(nowSec + 0.05, onCall, 'b')
+        pacer.At(nowSec - 1,    onCall, 'a')
+        self.assertTrue(done.wait(5))
+        self.assertEqual(calls, [ 'a', 'b', 'c' ])
+        self.assertGreaterEqual(perf_counter(), nowSec + 0.10)
+
+# ----------------------------------------------------------------------------
+
+def loadOpts(**kwargs) :
+    opts = argparse.Namespace( requests    = [ 'PING {conn} {seq}\\n' ],
+                               connections = 4,
+                               rate        = 200,
+                               duration    = 0.6,
+                               interval    = 0.3,
+                               response    = 'line',
+                               bufLen      = 1024 )
+    opts.__dict__.update(kwargs)
+    return opts
+
+class LoadGeneratorTests(unittest.TestCase) :
+
+    def setUp(self) :
+        self.pool = loadGen.XAsyncSocketsPool()
+        self.addCleanup(self.pool.StopWaitEvents)
+
+    def runLoad(self, opts) :
+        srvAddr = loadGen.startEchoServer(self.pool, opts)
+        self.pool.AsyncWaitEvents(threadsCount=1)
+        gen = loadGen.LoadGenerator(self.pool, srvAddr, opts)
+        out = io.StringIO()
+        with redirect_stdout(out) :
+            gen.Run()
+        return gen, [ json.loads(l) for l in out.getvalue().splitlines() ]
+
+    def test_RunLines(self) :
+        opts         = loadOpts()
+        gen, reports = self.runLoad(opts)
+        self.assertEqual([ r['type'] for r in reports ], [ 'interval', 'interval', 'total' ])
+        total = reports[-1]
+        self.assertEqual(total['errors'], 0)
+        self.assertEqual(total['requests'], sum(r['requests'] for r in reports[:-1]))
+        # The schedule is kept : about "rate" x "duration" requests,
+        self.assertGreaterEqual(total['requests'], 0.75 * opts.rate * opts.duration)
+        self.assertLessEqual(total['requests'], opts.rate * opts.duration + opts.connections)
+        self.assertIsNotNone(total['p99Ms'])
+        self.assertLessEqual(total['p50Ms'], total['maxMs'])
+
+    def test_ShortLastInterval(self) :
+        opts         = loadOpts(duration=0.5)
+        gen, reports = self.runLoad(opts)
+        self.assertEqual([ r['elapsedSec'] for r in reports ], [ 0.3, 0.5, 0.5 ])
+        self.assertEqual(reports[1]['rps'], round(reports[1]['requests'] / 0.2, 1))
+
+    def test_RunSize(self) :
+        # "PING\n" is echoed, 5 bytes per response,
+        opts         = loadOpts(requests=[ 'PING\\n' ], response='size:5')
+        gen, reports = self.runLoad(opts)
+        self.assertEqual(reports[-1]['errors'], 0)
+        self.assertGreater(reports[-1]['requests'], 0)
+
+    def test_Templates(self) :
+        opts = loadOpts(requests=[ 'A {conn} {seq}\\r\\n', 'B\\t{seq}' ])
+        gen  = loadGen.LoadGenerator(self.pool, ('127.0.0.1', 0), opts)
+        gen._pacer.Stop()
+        self.assertEqual(gen._nextRequest(3), b'B\t1')
+        self.assertEqual(gen._nextRequest(3), b'A 3 2\r\n')
+
+# ============================================================================
+# ===( traceAnalyzer )========================================================
+# ============================================================================
+
+class TraceAnalyzerTests(unittest.TestCase) :
+
+    def setUp(self) :
+        # A slow tick of 5 ms with two handlers, recorded when they end,
+        trace = XAsyncTrace(capacity=8)
+        for event in ( (10.0000, -1, XAsyncTrace.POLL,   2,  0.0010),
+                       (10.0012, 7,  XAsyncTrace.RECV,   64, 0.0001),
+                       (10.0011, 7,  XAsyncTrace.READ,   0,  0.0040),
+                       (10.0052, 9,  XAsyncTrace.SEND,   32, 0.0001),
+                       (10.0051, 9,  XAsyncTrace.WRITE,  0,  0.0005),
+                       (10.0010, -1, XAsyncTrace.TICK,   2,  0.0050),
+                       (10.0100, 9,  XAsyncTrace.EXPIRE, 0,  0.0) ) :
+            trace._record(*event)
+        fd, self.filename = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.filename)
+        trace.Dump(self.filename)
+
+    def report(self, func, *args) :
+        out = io.StringIO()
+        with redirect_stdout(out) :
+            func(*args)
+        return out.getvalue()
+
+    def test_Load(self) :
+        trace = traceAnalyzer.Trace(self.filename)
+        self.assertEqual(trace.header['capacity'], 8)
+        self.assertEqual(len(trace.events), 7)
+        self.assertEqual([ e[2] for e in trace.events[:3] ], [ 'poll', 'tick', 'read' ])
+
+    def test_Reports(self) :
+        trace   = traceAnalyzer.Trace(self.filename)
+        summary = self.report(traceAnalyzer.reportSummary, trace)
+        self.assertIn('Trace : 7 events', summary)
+        self.assertRegex(summary, r'recv +1 +64 ')
+        ticks = self.report(traceAnalyzer.reportSlowTicks, trace, 1)
+        self.assertIn('5.000 ms, 2 ready sockets', ticks)
+        self.assertRegex(ticks, r'fd 7 +read +4\.000 ms +64 bytes')
+        self.assertRegex(ticks, r'fd 9 +write +0\.500 ms +32 bytes')
+        sockets = self.report(traceAnalyzer.reportSockets, trace, 10).splitlines()
+        self.assertEqual(sockets[3].split(), [ '7', '1', '4.000', '4.000', '64', '0', '0' ])
+        self.assertEqual(sockets[4].split(), [ '9', '1', '0.500', '0.500', '0', '32', '1' ])
+        self.assertEqual(len(self.report(traceAnalyzer.reportSocket, trace, 9).splitlines()), 4)
+
+# ============================================================================
+# ============================================================================
+# ============================================================================
+
+if __name__ == '__main__' :
+    unittest.main()